@@ -0,0 +1,212 @@
+"""
+Benchmark de las consultas de GestorBaseDatos con volúmenes reales.
+
+    python benchmark_db.py                                  # todos los escenarios -> benchmark_resultados.json
+    python benchmark_db.py --escenarios 1mes_66 1anio_66 --salida hoy.json
+    python benchmark_db.py --comparar base.json             # marca regresiones contra una medición guardada
+
+Las BDs de prueba se generan una sola vez (semilla y fecha de ancla fijas) en la carpeta
+BENCHMARK_BD y se reutilizan en las siguientes corridas (--reconstruir para volver a generarlas).
+Las consultas usan como referencia el último día con viajes de la BD, no la fecha de hoy:
+una BD generada hace meses se mide igual que una nueva.
+
+- FRÍO: GestorBaseDatos recién abierto (caché de páginas de SQLite vacía) y una sola llamada.
+  La caché del sistema operativo NO se vacía (eso depende de la máquina).
+- CALIENTE: misma conexión, después de una llamada de calentamiento; se guarda la mediana.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from gestor_db import GestorBaseDatos
+
+
+# ==========================================
+# ESCENARIOS Y CONSULTAS
+# ==========================================
+# nombre: (unidades, días de historial, viajes por unidad y día)
+ESCENARIOS = {
+    "1mes_66":     (66, 30, 8),
+    "1anio_66":    (66, 365, 8),
+    "5anios_66":   (66, 5 * 365, 8),
+    "1mes_1000":   (1000, 30, 8),
+    "1anio_1000":  (1000, 365, 8),
+    "5anios_1000": (1000, 5 * 365, 8),
+}
+SEMILLA = 2026
+ANCLA = "2026-03-01"  # "Ahora" de las BDs de prueba: el historial llega hasta el 2026-02-28
+CARPETA_BD = "BENCHMARK_BD"
+
+# nombre: función(db, ctx). ctx trae 'taxi_id' (una unidad con historial) y 'fecha' (último día con datos)
+CONSULTAS = {
+    "obtener_estadisticas_unidad_mes":  lambda db, ctx: db.obtener_estadisticas_unidad(ctx['taxi_id'], "MES", ctx['fecha']),
+    "obtener_estadisticas_unidad_anio": lambda db, ctx: db.obtener_estadisticas_unidad(ctx['taxi_id'], "AÑO", ctx['fecha']),
+    "obtener_datos_tres_graficas_mes":  lambda db, ctx: db.obtener_datos_tres_graficas(ctx['taxi_id'], "MES", ctx['fecha']),
+    "obtener_datos_tres_graficas_dia":  lambda db, ctx: db.obtener_datos_tres_graficas(ctx['taxi_id'], "DIA", ctx['fecha']),
+    "obtener_top_taxis_admin_mes":      lambda db, ctx: db.obtener_top_taxis_admin("MES", ctx['fecha']),
+    "obtener_top_taxis_admin_anio":     lambda db, ctx: db.obtener_top_taxis_admin("AÑO", ctx['fecha']),
+    "obtener_datos_reporte_global_mes": lambda db, ctx: db.obtener_datos_reporte_global("MES", ctx['fecha']),
+    "obtener_datos_reporte_global_siempre": lambda db, ctx: db.obtener_datos_reporte_global("SIEMPRE", ctx['fecha']),
+    "obtener_ranking_bases_siempre":    lambda db, ctx: db.obtener_ranking_bases("SIEMPRE"),
+    "auditoria_inteligente":            lambda db, ctx: db.auditoria_inteligente(ctx['fecha']),
+    "obtener_historial_viajes_mes":     lambda db, ctx: db.obtener_historial_viajes("MES", ctx['fecha']),
+    "obtener_pagina_historial_siempre": lambda db, ctx: db.obtener_pagina_historial("SIEMPRE", limite=200),
+    "buscar_viajes":                    lambda db, ctx: db.buscar_viajes("cholula"),
+    "obtener_incidencias_pendientes":   lambda db, ctx: db.obtener_incidencias_pendientes(),
+}
+
+
+# ==========================================
+# BDs DE PRUEBA
+# ==========================================
+def ruta_escenario(nombre, carpeta=CARPETA_BD):
+    unidades, dias, viajes = ESCENARIOS[nombre]
+    # Los parámetros van en el nombre: si cambian, se genera otra BD
+    return os.path.join(carpeta, f"bench_{unidades}u_{dias}d_{viajes}v_s{SEMILLA}_a{ANCLA.replace('-', '')}.db")
+
+def preparar_escenario(nombre, carpeta=CARPETA_BD, reconstruir=False):
+    """ Devuelve la ruta de la BD del escenario, generándola si no existe """
+    from rellenar_bd_datos_prueba import popular_base_datos_completa
+    ruta = ruta_escenario(nombre, carpeta)
+    if os.path.exists(ruta) and not reconstruir:
+        return ruta
+    os.makedirs(carpeta, exist_ok=True)
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo): os.remove(ruta + sufijo)
+    unidades, dias, viajes = ESCENARIOS[nombre]
+    print(f"🏗️  Generando escenario {nombre} ({unidades} unidades, {dias} días)...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        popular_base_datos_completa(ruta, flota=unidades, dias=dias, viajes_por_dia=viajes, semilla=SEMILLA, ancla=ANCLA)
+    return ruta
+
+def _contexto(db):
+    """ Unidad y fecha de referencia para las consultas: el último día con viajes de la BD """
+    fila = db._cursor().execute("SELECT MAX(fecha_hora_inicio) FROM viajes").fetchone()
+    return {'taxi_id': db.obtener_id_por_numero("50"), 'fecha': str(fila[0])[:10]}
+
+
+# ==========================================
+# MEDICIÓN
+# ==========================================
+def _cronometrar(funcion, *args):
+    # Las consultas que imprimen (auditoría) no deben ensuciar la medición ni la consola
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        funcion(*args)
+        return (time.perf_counter() - t0) * 1000
+
+def medir_escenario(ruta, consultas=None, repeticiones=5, frio=3):
+    """ {consulta: {'frio_ms', 'caliente_ms', 'min_ms', 'repeticiones'}} para la BD 'ruta' """
+    # El contexto sale de otra conexión: en la medición en frío la consulta es lo primero que lee la BD recién abierta
+    db = GestorBaseDatos(ruta)
+    try: ctx = _contexto(db)
+    finally: db.cerrar()
+
+    resultados = {}
+    for nombre in (consultas or CONSULTAS):
+        funcion = CONSULTAS[nombre]
+
+        tiempos_frio = []
+        for _ in range(frio):
+            db = GestorBaseDatos(ruta)
+            try: tiempos_frio.append(_cronometrar(funcion, db, ctx))
+            finally: db.cerrar()
+
+        db = GestorBaseDatos(ruta)
+        try:
+            _cronometrar(funcion, db, ctx)  # Calentamiento
+            tiempos = [_cronometrar(funcion, db, ctx) for _ in range(repeticiones)]
+        finally:
+            db.cerrar()
+
+        resultados[nombre] = {
+            'frio_ms': round(statistics.median(tiempos_frio), 3),
+            'caliente_ms': round(statistics.median(tiempos), 3),
+            'min_ms': round(min(tiempos), 3),
+            'repeticiones': repeticiones,
+        }
+        print(f"   {nombre:<38} frío {resultados[nombre]['frio_ms']:>10.2f} ms   caliente {resultados[nombre]['caliente_ms']:>10.2f} ms")
+    return resultados
+
+def correr_benchmark(escenarios=None, consultas=None, repeticiones=5, frio=3, carpeta=CARPETA_BD, reconstruir=False):
+    salida = {
+        'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'maquina': {'sistema': platform.platform(), 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version},
+        'resultados': {},
+    }
+    for nombre in (escenarios or ESCENARIOS):
+        ruta = preparar_escenario(nombre, carpeta, reconstruir)
+        print(f"⏱️  {nombre}")
+        salida['resultados'][nombre] = medir_escenario(ruta, consultas, repeticiones, frio)
+    return salida
+
+
+# ==========================================
+# COMPARACIÓN CONTRA UNA BASE
+# ==========================================
+def comparar(actual, base, tolerancia=0.20, minimo_ms=2.0):
+    """
+    Compara dos corridas escenario por escenario. Es regresión si el tiempo (frío o caliente)
+    creció más de 'tolerancia' Y más de 'minimo_ms' (para no marcar ruido en consultas de 1 ms).
+    Devuelve la lista de regresiones [(escenario, consulta, medida, antes, ahora)].
+    """
+    regresiones = []
+    for escenario, consultas in actual['resultados'].items():
+        for consulta, r in consultas.items():
+            anterior = base.get('resultados', {}).get(escenario, {}).get(consulta)
+            if not anterior: continue
+            for medida in ('frio_ms', 'caliente_ms'):
+                antes, ahora = anterior[medida], r[medida]
+                cambio = (ahora - antes) / antes if antes else 0.0
+                marca = ""
+                if ahora - antes > minimo_ms and cambio > tolerancia:
+                    regresiones.append((escenario, consulta, medida, antes, ahora))
+                    marca = "  🔴 REGRESIÓN"
+                elif antes - ahora > minimo_ms and -cambio > tolerancia:
+                    marca = "  🟢 mejora"
+                print(f"   {escenario:<12} {consulta:<38} {medida:<12} {antes:>10.2f} -> {ahora:>10.2f} ms ({cambio:+.0%}){marca}")
+    return regresiones
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas de GestorBaseDatos")
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), help="Escenarios a medir (default: todos)")
+    parser.add_argument("--consultas", nargs="+", choices=list(CONSULTAS), help="Consultas a medir (default: todas)")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Llamadas en caliente por consulta")
+    parser.add_argument("--frio", type=int, default=3, help="Aperturas en frío por consulta")
+    parser.add_argument("--carpeta", default=CARPETA_BD, help="Dónde guardar las BDs de prueba")
+    parser.add_argument("--reconstruir", action="store_true", help="Volver a generar las BDs de prueba")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para buscar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="Crecimiento permitido (0.20 = 20%%)")
+    parser.add_argument("--minimo-ms", type=float, default=2.0, help="Diferencia mínima en ms para contar como regresión")
+    return parser
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    resultados = correr_benchmark(args.escenarios, args.consultas, args.repeticiones, args.frio, args.carpeta, args.reconstruir)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"🔍 Comparando contra {args.comparar} ({base.get('fecha', '?')})...")
+        regresiones = comparar(resultados, base, args.tolerancia, args.minimo_ms)
+        if regresiones:
+            print(f"❌ {len(regresiones)} regresiones.")
+            return 1
+        print("✅ Sin regresiones.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Benchmark de la interfaz SIN pantalla (Qt offscreen): sirve en un servidor Linux sin escritorio.
+
+    python benchmark_interfaz.py                                  # -> benchmark_interfaz.json
+    python benchmark_interfaz.py --escenarios 1anio_1000 --comparar base_interfaz.json
+
+Abre VentanaPrincipal contra una BD generada (las mismas de benchmark_db) y repite por guion
+refrescos del tablero, arrastres de fichas, búsquedas, tablas de administración y gráficas.
+Por operación reporta tiempo (primera llamada y mediana), memoria de Python (tracemalloc)
+y cuántos widgets/fichas quedaron vivos.
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Antes de importar Qt
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from PyQt6.QtCore import QEvent
+from PyQt6.QtWidgets import QApplication
+
+from benchmark_db import CARPETA_BD, ESCENARIOS, comparar, preparar_escenario
+
+
+# ==========================================
+# OPERACIONES (cada una recibe la ventana y el número de repetición)
+# ==========================================
+VIAJE_GUION = {'tipo_servicio': 1, 'base_salida': 1, 'destino': 'Centro', 'precio': 50.0}
+
+def _esperar_consultas(app, v):
+    """ Las consultas van en el pool de hilos: esperar a que terminen Y a que se pinte el resultado """
+    while True:
+        v.consultas.esperar()
+        app.processEvents()
+        if not v.consultas.en_curso(): return
+
+def _arrastrar(v, base_destino, i):
+    """ Lo mismo que hace el dropEvent: la ficha pasa de lista y se procesa el cambio """
+    origenes = [bid for bid, lista in v.listas_bases.items() if bid != base_destino and lista.count()]
+    if not origenes: return
+    origen = v.listas_bases[origenes[i % len(origenes)]]
+    destino = v.listas_bases[base_destino]
+    item = origen.takeItem(0)
+    destino.addItem(item)
+    v._ejecutar_actualizacion_bd(destino, destino.row(item))
+
+def _mover_fuera_de_la_ventana(v, i):
+    """ Cambios hechos por otra terminal: el refresco tiene que repintar esas fichas """
+    flota = v.db.obtener_taxis_activos()
+    for k in range(10):
+        t = flota[(i * 10 + k) % len(flota)]
+        v.db.mover_taxi(t['id'], 1 + (i + k) % 11)
+
+def _historial(app, v, filtro):
+    if v.cmb_filtro_historial.currentText() != filtro:
+        v.cmb_filtro_historial.setCurrentText(filtro)  # Ya dispara la recarga
+    else:
+        v.cargar_historial_en_tabla()
+    _esperar_consultas(app, v)
+
+def _grafico(v, i):
+    etiquetas = [f"{h:02d}" for h in range(24)]
+    v.grafico_dinero.actualizar_grafico(etiquetas, [(h * 37 + i) % 500 for h in range(24)], "dinero")
+
+OPERACIONES = {
+    "tablero_refresco_sin_cambios": lambda app, v, i: v.cargar_datos_en_tablero(),
+    "tablero_refresco_con_cambios": lambda app, v, i: (_mover_fuera_de_la_ventana(v, i), v.cargar_datos_en_tablero()),
+    "generar_bases_fisicas":        lambda app, v, i: v.generar_bases_fisicas(),
+    "drop_a_base_fisica":           lambda app, v, i: _arrastrar(v, 1 + i % 11, i),
+    "drop_a_viaje_local":           lambda app, v, i: _arrastrar(v, 93, i),
+    "drop_a_descanso":              lambda app, v, i: _arrastrar(v, 91, i),
+    "busqueda_tablero":             lambda app, v, i: (v.tabs.setCurrentIndex(0), v.busqueda_unificada(str(40 + i % 50))),
+    "busqueda_tablero_limpiar":     lambda app, v, i: (v.tabs.setCurrentIndex(0), v.busqueda_unificada("")),
+    "cargar_historial_en_tabla":    lambda app, v, i: _historial(app, v, "SIEMPRE"),
+    "historial_scroll_pagina":      lambda app, v, i: v.modelo_historial.fetchMore(),
+    "cargar_tabla_flota":           lambda app, v, i: v.cargar_tabla_flota(),
+    "cargar_tabla_deudas":          lambda app, v, i: v.cargar_tabla_deudas(),
+    "actualizar_grafico":           lambda app, v, i: _grafico(v, i),
+}
+
+
+# ==========================================
+# MEDICIÓN
+# ==========================================
+def _procesar_eventos(app):
+    """ Incluye los deleteLater pendientes: si no, los widgets borrados seguirían contando """
+    app.processEvents()
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete.value)
+
+def _fichas_tablero(v):
+    return sum(lista.count() for lista in v.listas_bases.values())
+
+def medir_operacion(app, v, funcion, repeticiones):
+    tiempos = []
+    for i in range(repeticiones + 1):
+        t0 = time.perf_counter()
+        funcion(app, v, i)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        _procesar_eventos(app)
+
+    # Memoria en una corrida aparte: tracemalloc hace lento todo lo que mide
+    widgets_antes = len(QApplication.allWidgets())
+    tracemalloc.start()
+    funcion(app, v, repeticiones + 1)
+    _procesar_eventos(app)
+    asignado, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'frio_ms': round(tiempos[0], 3),
+        'caliente_ms': round(statistics.median(tiempos[1:]), 3),
+        'min_ms': round(min(tiempos[1:]), 3),
+        'repeticiones': repeticiones,
+        'asignado_kb': round(asignado / 1024, 1),
+        'pico_kb': round(pico / 1024, 1),
+        'widgets': len(QApplication.allWidgets()),
+        'widgets_nuevos': len(QApplication.allWidgets()) - widgets_antes,
+        'fichas_tablero': _fichas_tablero(v),
+    }
+
+def medir_escenario(app, ruta, operaciones=None, repeticiones=5):
+    from interfaz import VentanaPrincipal
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        v = VentanaPrincipal(ruta)
+        arranque = (time.perf_counter() - t0) * 1000
+    # Por guion: el viaje nuevo no abre el diálogo y los timers no se meten en la medición
+    v.abrir_ventana_nuevo_viaje = lambda *args: dict(VIAJE_GUION)
+    for timer in (v.timer_semaforo, v.timer_mantenimiento, v.timer_refresco):
+        timer.stop()
+    v.show()
+    app.processEvents()
+
+    resultados = {'arranque_ventana': {'frio_ms': round(arranque, 3), 'caliente_ms': round(arranque, 3), 'min_ms': round(arranque, 3),
+                                       'repeticiones': 1, 'widgets': len(QApplication.allWidgets()), 'fichas_tablero': _fichas_tablero(v)}}
+    print(f"   {'arranque_ventana':<30} {arranque:>10.2f} ms   widgets {resultados['arranque_ventana']['widgets']}")
+    try:
+        for nombre in (operaciones or OPERACIONES):
+            with contextlib.redirect_stdout(io.StringIO()):
+                r = medir_operacion(app, v, OPERACIONES[nombre], repeticiones)
+            resultados[nombre] = r
+            print(f"   {nombre:<30} frío {r['frio_ms']:>9.2f} ms   caliente {r['caliente_ms']:>9.2f} ms   "
+                  f"pico {r['pico_kb']:>9.1f} KB   widgets {r['widgets']} ({r['widgets_nuevos']:+d})")
+    finally:
+        v.consultas.esperar(); v.trabajo_mantenimiento.wait(); v.db.cerrar()
+        v.close(); v.deleteLater(); app.processEvents()
+    return resultados
+
+def correr_benchmark(escenarios, operaciones=None, repeticiones=5, carpeta=CARPETA_BD, reconstruir=False):
+    app = QApplication.instance() or QApplication(sys.argv)
+    salida = {
+        'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'maquina': {'sistema': platform.platform(), 'python': platform.python_version(), 'qt': app.platformName()},
+        'resultados': {},
+    }
+    for nombre in escenarios:
+        # Los arrastres escriben en la BD: se trabaja sobre una copia para no alterar la del escenario
+        ruta = preparar_escenario(nombre, carpeta, reconstruir)
+        copia = os.path.join(carpeta, "_trabajo_interfaz.db")
+        shutil.copyfile(ruta, copia)
+        print(f"⏱️  {nombre}")
+        try:
+            salida['resultados'][nombre] = medir_escenario(app, copia, operaciones, repeticiones)
+        finally:
+            for sufijo in ("", "-wal", "-shm"):
+                try: os.remove(copia + sufijo)
+                except OSError: pass
+    return salida
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Benchmark de la interfaz con Qt offscreen")
+    parser.add_argument("--escenarios", nargs="+", choices=list(ESCENARIOS), default=["1mes_66", "1anio_1000"],
+                        help="BDs de prueba a usar (ver benchmark_db)")
+    parser.add_argument("--operaciones", nargs="+", choices=list(OPERACIONES), help="Operaciones a medir (default: todas)")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por operación")
+    parser.add_argument("--carpeta", default=CARPETA_BD, help="Dónde guardar las BDs de prueba")
+    parser.add_argument("--reconstruir", action="store_true", help="Volver a generar las BDs de prueba")
+    parser.add_argument("--salida", default="benchmark_interfaz.json", help="Archivo JSON con los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para buscar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="Crecimiento permitido (0.20 = 20%%)")
+    parser.add_argument("--minimo-ms", type=float, default=5.0, help="Diferencia mínima en ms para contar como regresión")
+    return parser
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    resultados = correr_benchmark(args.escenarios, args.operaciones, args.repeticiones, args.carpeta, args.reconstruir)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"🔍 Comparando contra {args.comparar} ({base.get('fecha', '?')})...")
+        regresiones = comparar(resultados, base, args.tolerancia, args.minimo_ms)
+        if regresiones:
+            print(f"❌ {len(regresiones)} regresiones.")
+            return 1
+        print("✅ Sin regresiones.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Tareas del sistema SIN interfaz gráfica (no importa PyQt6 ni matplotlib).
+Pensado para cron / tareas programadas en el servidor:
+
+    python comandos.py reporte --tipo ADMIN --periodo MES --fecha 2026-01-31 --password ****
+    python comandos.py auditoria --fecha 2026-01-30 --aplicar
+    python comandos.py cobro-piso
+    python comandos.py respaldo --carpeta /respaldos
+
+La parte numérica sale por la salida estándar en JSON (default) o CSV;
+los avisos van a la salida de error para no ensuciar los datos.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import sqlite3
+import sys
+from datetime import datetime
+
+from gestor_db import GestorBaseDatos, respaldo_diario
+
+
+# ==========================================
+# SALIDA (JSON / CSV)
+# ==========================================
+def _a_json(valor):
+    if isinstance(valor, sqlite3.Row): return dict(valor)
+    raise TypeError(f"No se puede convertir {type(valor).__name__} a JSON")
+
+def imprimir(args, datos, filas=None, columnas=None):
+    """ JSON: todo 'datos'. CSV: solo la tabla 'filas' (lista de dicts) con 'columnas' """
+    if args.formato == "csv":
+        escritor = csv.DictWriter(args.salida, fieldnames=columnas, extrasaction="ignore")
+        escritor.writeheader()
+        for fila in filas or []:
+            escritor.writerow(dict(fila))
+    else:
+        json.dump(datos, args.salida, ensure_ascii=False, indent=2, default=_a_json)
+        args.salida.write("\n")
+
+def aviso(texto):
+    print(texto, file=sys.stderr)
+
+
+# ==========================================
+# COMANDOS
+# ==========================================
+def cmd_reporte(db, args):
+    fecha = args.fecha or datetime.now().strftime("%Y-%m-%d")
+    datos_gral, datos_admin = db.obtener_datos_reporte_dual(args.tipo, args.periodo, fecha)
+
+    ruta = None
+    if not args.sin_pdf:
+        # reportlab solo hace falta si de verdad se genera el PDF
+        from reportes import GeneradorPDF
+        nombre_pdf = f"Reporte_{args.tipo}_{args.periodo}_{datetime.now().strftime('%H%M')}.pdf"
+        ruta = GeneradorPDF(nombre_pdf).generar_reporte_dual(args.tipo, args.periodo, fecha, datos_gral, datos_admin, args.password)
+        if not ruta:
+            aviso("❌ No se pudo crear el PDF.")
+            return 1
+        aviso(f"✅ Reporte generado: {ruta}")
+
+    salida = {'tipo': args.tipo, 'periodo': args.periodo, 'fecha': fecha, 'pdf': ruta,
+              'totales': datos_gral['totales'], 'servicios': datos_gral['servicios'],
+              'incidencias': datos_gral['incidencias'], 'detalle_flota': datos_gral.get('detalle_flota', [])}
+    if datos_admin:
+        salida['top_horas'] = datos_admin['top_horas']
+    imprimir(args, salida, salida['detalle_flota'], ["numero", "viajes", "dinero", "horas", "reportes"])
+    return 0
+
+def cmd_auditoria(db, args):
+    fecha = args.fecha or datetime.now().strftime("%Y-%m-%d")
+    candidatos = db.auditoria_inteligente(fecha, args.hasta)
+
+    aplicado = None
+    if args.aplicar:
+        # Mismo candado que la interfaz: una sola auditoría automática por día
+        if db.ya_se_hizo_auditoria_hoy():
+            aviso("🛑 La auditoría automática YA se aplicó hoy; no se duplican multas.")
+            return 1
+        multas, ausencias = db.aplicar_auditoria(candidatos)
+        aplicado = {'multas': multas, 'ausencias': ausencias}
+        aviso(f"✅ Aplicado: {multas} multas, {ausencias} ausencias.")
+
+    imprimir(args, {'fecha': fecha, 'hasta': args.hasta, 'candidatos': candidatos, 'aplicado': aplicado},
+             candidatos, ["fecha", "numero", "tipo", "monto", "motivo"])
+    return 0
+
+def cmd_cobro_piso(db, args):
+    # Candado: un cobro por día (igual que en la interfaz)
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    if db.obtener_fecha_ultimo_cobro() == hoy:
+        aviso("⛔ Ya se generó el cobro de PISO el día de HOY.")
+        return 1
+    cantidad, monto = db.generar_cargos_piso_masivos()
+    if cantidad <= 0:
+        aviso("⚠️ No se generaron cargos.")
+        return 1
+    aviso(f"✅ Se cargaron ${monto} a {cantidad} unidades.")
+    resultado = {'fecha': hoy, 'unidades': cantidad, 'monto': monto}
+    imprimir(args, resultado, [resultado], ["fecha", "unidades", "monto"])
+    return 0
+
+def cmd_respaldo(db, args):
+    destino = respaldo_diario(args.db, args.carpeta)
+    if destino: aviso(f"✅ Respaldo de seguridad creado: {destino}")
+    else: aviso("ℹ️ El respaldo de hoy ya existía (o no hay base de datos).")
+    resultado = {'respaldo': destino}
+    imprimir(args, resultado, [resultado], ["respaldo"])
+    return 0
+
+
+# ==========================================
+# LÍNEA DE COMANDOS
+# ==========================================
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="comandos.py", description="Tareas de Taxis El Zorro sin interfaz gráfica")
+    parser.add_argument("--db", default="taxis.db", help="Ruta de la base de datos (default: taxis.db)")
+    parser.add_argument("--formato", choices=["json", "csv"], default="json", help="Formato de la salida numérica")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("reporte", help="Reporte global en PDF (GENERAL o ADMIN)")
+    p.add_argument("--tipo", choices=["GENERAL", "ADMIN"], default="GENERAL")
+    p.add_argument("--periodo", choices=["DIA", "MES", "AÑO", "SIEMPRE"], default="MES")
+    p.add_argument("--fecha", help="Fecha de referencia AAAA-MM-DD (default: hoy)")
+    p.add_argument("--password", help="Contraseña para encriptar el PDF")
+    p.add_argument("--sin-pdf", action="store_true", help="Solo imprimir los números")
+    p.set_defaults(funcion=cmd_reporte)
+
+    p = sub.add_parser("auditoria", help="Auditoría de horas (multas y ausencias)")
+    p.add_argument("--fecha", help="Día a revisar AAAA-MM-DD (default: hoy)")
+    p.add_argument("--hasta", help="Último día de la ventana, si se revisan varios")
+    p.add_argument("--aplicar", action="store_true", help="Registrar las multas y ausencias encontradas")
+    p.set_defaults(funcion=cmd_auditoria)
+
+    p = sub.add_parser("cobro-piso", help="Cargo de derecho de piso a todas las unidades activas")
+    p.set_defaults(funcion=cmd_cobro_piso)
+
+    p = sub.add_parser("respaldo", help="Respaldo del día con la API de SQLite")
+    p.add_argument("--carpeta", default="RESPALDOS_AUTO")
+    p.set_defaults(funcion=cmd_respaldo)
+    return parser
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    args.salida = sys.stdout
+    # Los print() de GestorBaseDatos (migraciones, auditoría) van a stderr;
+    # por stdout solo sale el JSON/CSV
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.comando == "respaldo":
+            # No abre la BD con GestorBaseDatos: no debe migrar ni crear nada
+            return args.funcion(None, args)
+        db = GestorBaseDatos(args.db)
+        try:
+            return args.funcion(db, args)
+        finally:
+            db.cerrar()
+
+if __name__ == "__main__":
+    sys.exit(main())
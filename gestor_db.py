@@ -1,213 +1,809 @@
 import sqlite3
 import os
+import re
 import ctypes
+import threading
+from array import array
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
 
+from instrumentacion import ConexionInstrumentada, InstrumentacionSQL, METODOS_EXCLUIDOS, instrumentacion_activada
+from trazas import trazar
+
+
+# ==========================================
+# FILTROS DE PERIODO (RANGOS SEMIABIERTOS)
+# ==========================================
+def rango_periodo(periodo, fecha_ref=None):
+    """
+    Convierte DIA/HOY/MES/AÑO en un rango [inicio, fin) de textos 'YYYY-MM-DD'.
+    Retorna None para SIEMPRE (sin filtro).
+    Ej: ("MES", "2026-10-18") -> ("2026-10-01", "2026-11-01")
+    """
+    if not fecha_ref: fecha_ref = datetime.now().strftime("%Y-%m-%d")
+    f = datetime.strptime(fecha_ref[:10], "%Y-%m-%d")
+
+    if periodo in ["DIA", "HOY"]:
+        inicio = f
+        fin = f + timedelta(days=1)
+    elif periodo == "MES":
+        inicio = f.replace(day=1)
+        fin = inicio.replace(year=inicio.year + 1, month=1) if inicio.month == 12 else inicio.replace(month=inicio.month + 1)
+    elif periodo == "AÑO":
+        inicio = f.replace(month=1, day=1)
+        fin = inicio.replace(year=inicio.year + 1)
+    else:
+        return None
+    return inicio.strftime("%Y-%m-%d"), fin.strftime("%Y-%m-%d")
+
+
+def _marca_auditoria(fecha):
+    """ Prefijo de la descripción de un cargo de auditoría: "[Auditoría 2026-01-30]" (22 caracteres) """
+    return f"[Auditoría {str(fecha)[:10]}]"
+
+def _filtro_periodo(columna, periodo, fecha_ref=None):
+    """
+    Fragmento SQL + parámetros para filtrar 'columna' por periodo.
+    Usa >= y < (en vez de LIKE 'fecha%' o date()) para que SQLite recorra el índice.
+    """
+    rango = rango_periodo(periodo, fecha_ref)
+    if rango is None: return "", []
+    return f" AND {columna} >= ? AND {columna} < ?", list(rango)
+
+
+def _filtro_fechas(columna, fecha_inicio, fecha_fin):
+    """ Igual que _filtro_periodo pero entre dos días completos (ambos incluidos) """
+    dia_siguiente = (datetime.strptime(fecha_fin[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    return f" AND {columna} >= ? AND {columna} < ?", [fecha_inicio[:10], dia_siguiente]
+
+
+# ==========================================
+# REPARTO DE TURNOS POR DÍA Y HORA
+# ==========================================
+def repartir_turno(inicio, fin):
+    """
+    Barre el intervalo [inicio, fin) cortando en cada cambio de hora del reloj.
+    Retorna [(fecha 'YYYY-MM-DD', hora 0-23, segundos), ...]
+    Así un turno de 22:30 a 02:15 queda repartido entre los dos días que tocó.
+    """
+    rebanadas = []
+    actual = inicio
+    while actual < fin:
+        siguiente_hora = actual.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        corte = min(siguiente_hora, fin)
+        rebanadas.append((actual.strftime("%Y-%m-%d"), actual.hour, (corte - actual).total_seconds()))
+        actual = corte
+    return rebanadas
+
+
+# ==========================================
+# BÚSQUEDA DE TEXTO (FTS5 / LIKE)
+# ==========================================
+def _palabras_busqueda(texto):
+    return re.findall(r"\w+", texto or "")
+
+def _consulta_fts(texto):
+    """ 'tepea cen' -> '"tepea"* "cen"*' : todas las palabras, por prefijo, sin sintaxis FTS del usuario """
+    return " ".join(f'"{p}"*' for p in _palabras_busqueda(texto))
+
+def _filtro_like(columnas, texto):
+    """ Respaldo sin FTS5: cada palabra debe aparecer en alguna de las columnas """
+    condicion, params = "", []
+    for p in _palabras_busqueda(texto):
+        condicion += " AND (" + " OR ".join(f"{col} LIKE ?" for col in columnas) + ")"
+        params += [f"%{p}%"] * len(columnas)
+    return condicion, params
+
+def _fts5_disponible(conn):
+    return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+# ==========================================
+# PERFILES DE ALMACENAMIENTO (PRAGMAS)
+# ==========================================
+# Todos trabajan en modo WAL: los lectores (reportes) ya no bloquean al despachador.
+# - synchronous: FULL = fsync en cada commit, NORMAL = fsync solo en checkpoint (en WAL
+#   no corrompe la BD, a lo mucho se pierde el último commit si se va la luz), OFF = sin fsync.
+# - cache_size negativo = KiB de caché por conexión.
+# - mmap_size en bytes (0 = sin mmap).
+# - temp_store: 0 = por defecto, 2 = tablas temporales en memoria.
+# - wal_autocheckpoint: páginas del WAL antes de pasarlas a la BD principal.
+PERFILES_ALMACENAMIENTO = {
+    "SEGURO":     {"synchronous": "FULL",   "cache_size": -8000,  "mmap_size": 0,           "temp_store": 0, "wal_autocheckpoint": 1000},
+    "BALANCEADO": {"synchronous": "NORMAL", "cache_size": -32000, "mmap_size": 67108864,    "temp_store": 2, "wal_autocheckpoint": 1000},
+    "RAPIDO":     {"synchronous": "OFF",    "cache_size": -64000, "mmap_size": 268435456,   "temp_store": 2, "wal_autocheckpoint": 4000},
+}
+PERFIL_POR_DEFECTO = "BALANCEADO"
+
+
+# ==========================================
+# CONEXIONES PERSISTENTES (ESCRITOR + LECTORES)
+# ==========================================
+def aplicar_perfil(conn, perfil):
+    """ Activa WAL y aplica los pragmas del perfil a una conexión recién abierta """
+    p = PERFILES_ALMACENAMIENTO[perfil]
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass # Otra conexión tiene la BD ocupada; el modo WAL es persistente y ya lo pondrá el escritor
+    conn.execute(f"PRAGMA synchronous={p['synchronous']}")
+    conn.execute(f"PRAGMA cache_size={int(p['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size={int(p['mmap_size'])}")
+    conn.execute(f"PRAGMA temp_store={int(p['temp_store'])}")
+    conn.execute(f"PRAGMA wal_autocheckpoint={int(p['wal_autocheckpoint'])}")
+
+
+class GestorConexiones:
+    """
+    Mantiene abiertas las conexiones a SQLite en lugar de abrir y cerrar una por consulta.
+    - Un solo ESCRITOR compartido (protegido con candado) para todas las escrituras.
+    - Un LECTOR por hilo, así los hilos de reportes no pelean por la misma conexión.
+    Cada conexión conserva su caché de sentencias preparadas entre llamadas.
+    Con 'instrumentacion' (ver instrumentacion.py) cada conexión nueva queda medida.
+    """
+    def __init__(self, ruta, cache_sentencias=256, perfil=PERFIL_POR_DEFECTO, instrumentacion=None):
+        self.ruta = ruta
+        self.instrumentacion = instrumentacion
+        self.cache_sentencias = cache_sentencias
+        if perfil not in PERFILES_ALMACENAMIENTO:
+            print(f"⚠️ Perfil de almacenamiento desconocido '{perfil}', se usa {PERFIL_POR_DEFECTO}")
+            perfil = PERFIL_POR_DEFECTO
+        self.perfil = perfil
+        self._candado = threading.RLock()
+        self._escritor = None
+        self._profundidad = 0
+        self._al_confirmar = []  # Funciones a correr cuando la transacción más externa haga COMMIT
+        self._vigia = None       # Conexión de lectura solo para PRAGMA data_version (ver version_datos)
+        self._candado_vigia = threading.Lock()
+        self._lectores = {}      # threading.get_ident() -> conexión de lectura de ese hilo
+        self._todas = []
+
+    def _abrir(self):
+        # isolation_level=None: nosotros decidimos cuándo empieza y termina cada transacción
+        fabrica = ConexionInstrumentada if self.instrumentacion else sqlite3.Connection
+        conn = sqlite3.connect(self.ruta, timeout=10, check_same_thread=False, factory=fabrica,
+                               isolation_level=None, cached_statements=self.cache_sentencias)
+        conn.row_factory = sqlite3.Row
+        aplicar_perfil(conn, self.perfil)
+        if self.instrumentacion: self.instrumentacion.conectar(conn)
+        with self._candado:
+            self._todas.append(conn)
+        return conn
+
+    def lector(self):
+        """
+        Conexión de lectura del hilo actual (se crea la primera vez).
+        Va por el id del hilo del sistema y no en threading.local: las tareas de un QThreadPool
+        estrenan estado de Python en cada corrida y abrirían una conexión por tarea.
+        """
+        hilo = threading.get_ident()
+        conn = self._lectores.get(hilo)
+        if conn is None:
+            conn = self._abrir()
+            with self._candado:
+                self._lectores[hilo] = conn
+        return conn
+
+    def escritor(self):
+        with self._candado:
+            if self._escritor is None:
+                self._escritor = self._abrir()
+            return self._escritor
+
+    @contextmanager
+    def transaccion(self):
+        """
+        Todo lo que se ejecute dentro del bloque se confirma junto (un solo COMMIT).
+        Se puede anidar: solo la transacción más externa hace COMMIT/ROLLBACK.
+        """
+        with self._candado:
+            conn = self.escritor()
+            if self._profundidad == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            self._profundidad += 1
+            try:
+                yield conn.cursor()
+            except BaseException:
+                self._profundidad -= 1
+                if self._profundidad == 0:
+                    conn.rollback()
+                    self._al_confirmar = []
+                raise
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                conn.commit()
+                pendientes, self._al_confirmar = self._al_confirmar, []
+                for funcion in pendientes: funcion()
+
+    def despues_de_confirmar(self, funcion):
+        """ Corre 'funcion' cuando la transacción en curso haga COMMIT (ya, si no hay transacción). Con ROLLBACK se descarta. """
+        with self._candado:
+            if self._profundidad == 0:
+                funcion()
+            else:
+                self._al_confirmar.append(funcion)
+
+    def version_datos(self):
+        """
+        PRAGMA data_version visto desde una conexión de lectura aparte: cambia con cada COMMIT de
+        cualquier otra conexión (nuestro escritor incluido, u otro programa). No espera al escritor.
+        """
+        with self._candado_vigia:
+            if self._vigia is None:
+                self._vigia = self._abrir()
+            return self._vigia.execute("PRAGMA data_version").fetchone()[0]
+
+    def cerrar(self):
+        with self._candado:
+            # Pasamos el WAL a la BD principal para dejar el archivo .db completo
+            if self._escritor is not None:
+                try: self._escritor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except Exception: pass
+            for conn in self._todas:
+                try: conn.close()
+                except Exception: pass
+            self._todas = []
+            self._escritor = None
+            self._vigia = None
+            self._lectores = {}
+
+
+# ==========================================
+# MIGRACIONES DE ESQUEMA (PRAGMA user_version)
+# ==========================================
+# Cada paso recibe (db, cursor) y corre dentro de UNA transacción junto con el
+# cambio de user_version: o se aplica completo o no se aplica.
+# REGLA: nunca modificar un paso ya publicado; los cambios nuevos van al final.
+
+def _migracion_esquema_base(db, c):
+    """ Tablas principales, catálogos y flota inicial (idempotente: sirve para BDs viejas) """
+    c.execute("CREATE TABLE IF NOT EXISTS cat_tipos_servicio (id INTEGER PRIMARY KEY AUTOINCREMENT, descripcion TEXT UNIQUE NOT NULL)")
+    c.execute("CREATE TABLE IF NOT EXISTS cat_bases (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre_base TEXT UNIQUE NOT NULL)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS taxis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            numero_economico TEXT NOT NULL UNIQUE, 
+            estado_sistema TEXT DEFAULT 'ACTIVO', 
+            fecha_alta TEXT, 
+            fecha_baja TEXT, 
+            base_actual_id INTEGER DEFAULT 12, 
+            fecha_movimiento TEXT,
+            FOREIGN KEY(base_actual_id) REFERENCES cat_bases(id)
+        )
+    """)
+    c.execute("CREATE TABLE IF NOT EXISTS viajes (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER NOT NULL, tipo_servicio_id INTEGER NOT NULL, base_salida_id INTEGER, destino TEXT, precio REAL DEFAULT 0.0, fecha_hora_inicio TEXT, fecha_hora_fin TEXT, FOREIGN KEY(taxi_id) REFERENCES taxis(id))")
+    c.execute("CREATE TABLE IF NOT EXISTS incidencias (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER, tipo TEXT, descripcion TEXT, monto REAL DEFAULT 0.0, fecha_registro TEXT, resuelto TEXT DEFAULT 'PENDIENTE', operador_id TEXT DEFAULT 'SISTEMA')")
+    c.execute("CREATE TABLE IF NOT EXISTS turnos (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER, fecha_inicio TEXT, fecha_fin TEXT)")
+
+    # Columnas que no existían en versiones viejas de taxis
+    c.execute("PRAGMA table_info(taxis)")
+    columnas = [row['name'] for row in c.fetchall()]
+    for columna in ("fecha_alta", "fecha_baja", "fecha_movimiento"):
+        if columna not in columnas:
+            print(f"🔧 Actualizando BD: Agregando columna {columna}...")
+            c.execute(f"ALTER TABLE taxis ADD COLUMN {columna} TEXT")
+
+    # Catálogos
+    c.executemany("INSERT OR IGNORE INTO cat_tipos_servicio (id, descripcion) VALUES (?, ?)", [(1,'Viaje en base'),(2,'Telefono base'),(3,'Telefono unidad'),(4,'Viaje aereo')])
+    c.executemany("INSERT OR IGNORE INTO cat_bases (id, nombre_base) VALUES (?, ?)", [(1,'Cessa'),(2,'Licuor'),(3,'Santiagito'),(4,'Aurrera'),(5,'Mercado'),(6,'Caros'),(7,'Survi'),(8,'Capulin'),(9,'Zocalo'),(10,'16 de septiembre'),(11,'Parada principal'),(12,'Fuera de Servicio'),(13,'En Viaje'), (90, 'Taller'), (91, 'Descanso'), (92, 'Foráneo'), (93, 'Local')])
+
+    # Flota inicial (35 al 100) solo si la BD no tiene taxis
+    c.execute("SELECT COUNT(*) FROM taxis")
+    if c.fetchone()[0] == 0:
+        fecha_hoy = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.executemany("""
+            INSERT OR IGNORE INTO taxis (numero_economico, estado_sistema, base_actual_id, fecha_alta, fecha_movimiento)
+            VALUES (?, 'ACTIVO', 12, ?, ?)
+        """, [(str(i), fecha_hoy, fecha_hoy) for i in range(35, 101)])
+
+
+def _migracion_indices(db, c):
+    """ Índices para que los filtros por unidad y fecha no recorran tablas completas """
+    # Cubre SUM(precio)/COUNT(*) por taxi y periodo sin tocar la tabla
+    c.execute("CREATE INDEX IF NOT EXISTS idx_viajes_taxi_fecha ON viajes(taxi_id, fecha_hora_inicio, precio)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_viajes_fecha ON viajes(fecha_hora_inicio)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_turnos_taxi_fecha ON turnos(taxi_id, fecha_inicio)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_incidencias_taxi_fecha ON incidencias(taxi_id, fecha_registro)")
+    # Solo los turnos abiertos (se consultan en vivo en cada reporte)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_turnos_abiertos ON turnos(taxi_id) WHERE fecha_fin IS NULL")
+
+
+def _migracion_horas_trabajadas(db, c):
+    """ Segundos trabajados por taxi, día y hora del reloj (turnos cerrados, ya repartidos) """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS horas_trabajadas (
+            taxi_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            hora INTEGER NOT NULL,
+            segundos INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (taxi_id, fecha, hora)
+        ) WITHOUT ROWID
+    """)
+    db.reconstruir_horas_trabajadas()
+
+
+def _migracion_resumen_diario(db, c):
+    """
+    Acumulados por día/taxi/base/servicio para que los reportes no re-sumen viajes y turnos.
+    Los segundos trabajados van en el renglón con base 0 y servicio 0.
+    """
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_diario (
+            fecha TEXT NOT NULL,
+            taxi_id INTEGER NOT NULL,
+            base_salida_id INTEGER NOT NULL DEFAULT 0,
+            tipo_servicio_id INTEGER NOT NULL DEFAULT 0,
+            viajes INTEGER NOT NULL DEFAULT 0,
+            ingresos REAL NOT NULL DEFAULT 0.0,
+            segundos_trabajados INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (taxi_id, fecha, base_salida_id, tipo_servicio_id)
+        ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_resumen_fecha ON resumen_diario(fecha)")
+    db.reconstruir_resumen_diario()
+
+
+def _migracion_configuracion_bitacora(db, c):
+    """ Tablas de ajustes (clave/valor) y de notas pendientes """
+    c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS bitacora (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT,
+            mensaje TEXT,
+            estado TEXT,
+            prioridad TEXT
+        )
+    ''')
+
+
+def _migracion_indice_tablero(db, c):
+    """ Taxis por base y antigüedad: descansos vencidos y semáforo sin recorrer toda la flota """
+    c.execute("CREATE INDEX IF NOT EXISTS idx_taxis_base_movimiento ON taxis(base_actual_id, fecha_movimiento)")
+
+
+def _migracion_busqueda_texto(db, c):
+    """
+    Índices FTS5 (contenido externo) sobre viajes.destino e incidencias.tipo/descripcion/operador_id,
+    sincronizados por triggers. Si este SQLite no trae FTS5 se omite y las búsquedas usan LIKE.
+    """
+    try:
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS viajes_fts USING fts5(
+                destino, content='viajes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ FTS5 no disponible ({e}): la búsqueda usará LIKE.")
+        return
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS incidencias_fts USING fts5(
+            tipo, descripcion, operador_id, content='incidencias', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    for sql in (
+        # Viajes: solo importa el destino (cerrar un viaje no toca el índice)
+        """CREATE TRIGGER IF NOT EXISTS viajes_fts_ai AFTER INSERT ON viajes BEGIN
+               INSERT INTO viajes_fts(rowid, destino) VALUES (new.id, new.destino);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS viajes_fts_ad AFTER DELETE ON viajes BEGIN
+               INSERT INTO viajes_fts(viajes_fts, rowid, destino) VALUES ('delete', old.id, old.destino);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS viajes_fts_au AFTER UPDATE OF destino ON viajes BEGIN
+               INSERT INTO viajes_fts(viajes_fts, rowid, destino) VALUES ('delete', old.id, old.destino);
+               INSERT INTO viajes_fts(rowid, destino) VALUES (new.id, new.destino);
+           END""",
+        # Incidencias: pagar/resolver no toca el índice
+        """CREATE TRIGGER IF NOT EXISTS incidencias_fts_ai AFTER INSERT ON incidencias BEGIN
+               INSERT INTO incidencias_fts(rowid, tipo, descripcion, operador_id)
+               VALUES (new.id, new.tipo, new.descripcion, new.operador_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS incidencias_fts_ad AFTER DELETE ON incidencias BEGIN
+               INSERT INTO incidencias_fts(incidencias_fts, rowid, tipo, descripcion, operador_id)
+               VALUES ('delete', old.id, old.tipo, old.descripcion, old.operador_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS incidencias_fts_au AFTER UPDATE OF tipo, descripcion, operador_id ON incidencias BEGIN
+               INSERT INTO incidencias_fts(incidencias_fts, rowid, tipo, descripcion, operador_id)
+               VALUES ('delete', old.id, old.tipo, old.descripcion, old.operador_id);
+               INSERT INTO incidencias_fts(rowid, tipo, descripcion, operador_id)
+               VALUES (new.id, new.tipo, new.descripcion, new.operador_id);
+           END""",
+    ):
+        c.execute(sql)
+    # Indexar lo que ya existe
+    c.execute("INSERT INTO viajes_fts(viajes_fts) VALUES ('rebuild')")
+    c.execute("INSERT INTO incidencias_fts(incidencias_fts) VALUES ('rebuild')")
+
+
+# (version, descripción, paso) EN ORDEN
+MIGRACIONES = [
+    (1, "Esquema base", _migracion_esquema_base),
+    (2, "Índices por taxi y fecha", _migracion_indices),
+    (3, "Horas trabajadas por hora", _migracion_horas_trabajadas),
+    (4, "Resumen diario", _migracion_resumen_diario),
+    (5, "Configuración y bitácora", _migracion_configuracion_bitacora),
+    (6, "Índice de taxis por base", _migracion_indice_tablero),
+    (7, "Búsqueda de texto (FTS5)", _migracion_busqueda_texto),
+]
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
 class GestorBaseDatos:
-    def __init__(self, nombre_base_datos="taxis.db"):
+    def __init__(self, nombre_base_datos="taxis.db", perfil=PERFIL_POR_DEFECTO, vigilar_config=True, instrumentar=None):
         self.nombre_base_datos = nombre_base_datos
+        existia = os.path.exists(self.nombre_base_datos)
+
+        # Caché de la tabla configuracion (ver obtener_config)
+        # vigilar_config: revisa PRAGMA data_version para ver cambios hechos por otro programa u otra conexión
+        self.vigilar_config = vigilar_config
+        self._cache_config = None
+        self._version_config = None
+        self._candado_config = threading.Lock()
+
+        # Medición de consultas (opcional): instrumentar=None -> variable TAXIS_SQL_INSTRUMENTAR
+        if instrumentar is None: instrumentar = instrumentacion_activada()
+        self.instrumentacion = InstrumentacionSQL.desde_entorno() if instrumentar else None
+        if self.instrumentacion: self._envolver_metodos()
+
+        # Conexiones vivas durante toda la sesión (ver GestorConexiones)
+        self.conexiones = GestorConexiones(self.nombre_base_datos, perfil=perfil, instrumentacion=self.instrumentacion)
         
         # INICIO AUTOMÁTICO:
-        # Si no existe el archivo, se crea la estructura completa V3
-        if not os.path.exists(self.nombre_base_datos):
+        # Si no existe el archivo se crea completo; si ya existe solo se aplican las migraciones pendientes
+        if not existia:
             print("⚠️ Base de datos no encontrada. Creando sistema nuevo...")
-            self.crear_nueva_bd_v3()
-        else:
-            self._verificar_estructura()
-
-        self.crear_tabla_bitacora()
-
-    def _conectar(self):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        conn.row_factory = sqlite3.Row
-        return conn, conn.cursor()
-
-    def crear_nueva_bd_v3(self):
-        """ CREACIÓN LIMPIA CON NOMBRES CORRECTOS """
-        try:
-            conn = sqlite3.connect(self.nombre_base_datos)
-            cursor = conn.cursor()
-            cursor.execute("PRAGMA foreign_keys = ON;")
+        self.migrar()
+        self.busqueda_fts = self._asegurar_busqueda_texto()
+        if not existia:
+            # Ocultar archivo en Windows (Opcional)
+            try: ctypes.windll.kernel32.SetFileAttributesW(self.nombre_base_datos, 0x80)
+            except: pass
+            print("✅ Base de Datos creada correctamente.")
 
-            # 1. CATÁLOGOS
-            cursor.execute("CREATE TABLE IF NOT EXISTS cat_tipos_servicio (id INTEGER PRIMARY KEY AUTOINCREMENT, descripcion TEXT UNIQUE)")
-            cursor.execute("CREATE TABLE IF NOT EXISTS cat_bases (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre_base TEXT UNIQUE)")
-            
-            # 2. TAXIS (Con fecha_movimiento para la alerta naranja)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS taxis (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                    numero_economico TEXT NOT NULL UNIQUE, 
-                    estado_sistema TEXT DEFAULT 'ACTIVO', 
-                    base_actual_id INTEGER DEFAULT 12,
-                    fecha_movimiento TEXT,
-                    FOREIGN KEY(base_actual_id) REFERENCES cat_bases(id)
-                )
-            """)
+    def _cursor(self):
+        """ Cursor de lectura del hilo actual. NO se cierra: la conexión se reutiliza. """
+        return self.conexiones.lector().cursor()
 
-            # 3. TURNOS (Para cálculo real de horas trabajadas)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS turnos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    taxi_id INTEGER,
-                    fecha_inicio TEXT,
-                    fecha_fin TEXT
-                )
-            """)
+    def transaccion(self):
+        return self.conexiones.transaccion()
 
-            # 4. VIAJES
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS viajes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                    taxi_id INTEGER, 
-                    tipo_servicio_id INTEGER, 
-                    base_salida_id INTEGER, 
-                    destino TEXT, 
-                    precio REAL DEFAULT 0.0, 
-                    fecha_hora_inicio TEXT, 
-                    fecha_hora_fin TEXT
-                )
-            """)
+    def cerrar(self):
+        self.conexiones.cerrar()
+        if self.instrumentacion:
+            ruta = self.instrumentacion.guardar_resumen()
+            if ruta: print(f"📊 Resumen de consultas guardado en {ruta}")
+            self.instrumentacion.cerrar()
 
-            # 5. INCIDENCIAS
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS incidencias (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    taxi_id INTEGER,
-                    tipo TEXT,
-                    descripcion TEXT,
-                    monto REAL DEFAULT 0.0,
-                    fecha_registro TEXT,
-                    resuelto TEXT DEFAULT 'PENDIENTE',
-                    operador_id TEXT DEFAULT 'SISTEMA'
-                )
-            """)
+    # ==========================================
+    # INSTRUMENTACIÓN (ver instrumentacion.py)
+    # ==========================================
+    def _envolver_metodos(self):
+        """ Cronometra cada método público de ESTA instancia y marca sus consultas con el nombre """
+        for nombre, funcion in vars(type(self)).items():
+            if nombre.startswith("_") or nombre in METODOS_EXCLUIDOS or not callable(funcion): continue
+            setattr(self, nombre, self.instrumentacion.envolver(nombre, getattr(self, nombre)))
 
-            # DATOS INICIALES (BASES Y SERVICIOS)
-            bases_iniciales = [
-                (1,'Cessa'), (2,'Licuor'), (3,'Santiaguito'), (4,'Aurrera'), (5,'Mercado'),
-                (6,'Caros'), (7,'Survi'), (8,'Capulin'), (9,'Zocalo'), (10,'16 de Sept'),
-                (11,'Parada'), (12,'Fuera de Servicio'), (13,'En Viaje'),
-                (90, 'Taller 🛠️'), (91, 'Permiso/Descanso 📅'), (92, 'Foráneo'), (93, 'Local')
-            ]
-            cursor.executemany("INSERT OR IGNORE INTO cat_bases (id, nombre_base) VALUES (?,?)", bases_iniciales)
-            
-            servicios_iniciales = [(1,'Base'), (2,'Tel Base'), (3,'Tel Unidad'), (4,'Aéreo')]
-            cursor.executemany("INSERT OR IGNORE INTO cat_tipos_servicio (id, descripcion) VALUES (?,?)", servicios_iniciales)
+    def accion(self, nombre):
+        """ Agrupa las consultas de una acción de la interfaz; sin instrumentación no hace nada """
+        return self.instrumentacion.accion(nombre) if self.instrumentacion else nullcontext()
 
-            # CREAR FLOTA INICIAL (35 al 100)
-            for numero in range(35, 101):
-                cursor.execute("INSERT OR IGNORE INTO taxis (numero_economico, base_actual_id) VALUES (?, 12)", (str(numero),))
+    def version_esquema(self):
+        return self.conexiones.escritor().execute("PRAGMA user_version").fetchone()[0]
 
-            conn.commit()
-            conn.close()
-            
-            # Ocultar archivo en Windows (Opcional)
-            try: ctypes.windll.kernel32.SetFileAttributesW(self.nombre_base_datos, 0x80)
-            except: pass
-            
-            print("✅ Base de Datos creada correctamente.")
-            
-        except Exception as error: 
-            print(f"Error fatal creando BD: {error}")
+    def _asegurar_busqueda_texto(self):
+        """
+        ¿Hay índices FTS5? La migración 7 queda registrada aunque el SQLite de ese momento no trajera FTS5;
+        si ahora sí lo trae se crean e indexan aquí. Sin FTS5 se busca con LIKE.
+        """
+        existe = lambda: self._cursor().execute("SELECT 1 FROM sqlite_master WHERE name = 'viajes_fts'").fetchone() is not None
+        if existe(): return True
+        if not _fts5_disponible(self.conexiones.escritor()): return False
+        print("🔧 Creando índices de búsqueda (FTS5)...")
+        with self.transaccion() as c:
+            _migracion_busqueda_texto(self, c)
+        return existe()
+
+    def migrar(self):
+        """ Aplica en orden las migraciones pendientes. Si la BD está al día es una sola lectura. """
+        version = self.version_esquema()
+        if version >= VERSION_ESQUEMA: return
+        for numero, descripcion, paso in MIGRACIONES:
+            if numero <= version: continue
+            print(f"🔧 Migración {numero}: {descripcion}...")
+            with self.transaccion() as c:
+                paso(self, c)
+                c.execute(f"PRAGMA user_version = {int(numero)}")
 
-    def _verificar_estructura(self):
-        """ Asegura compatibilidad si la BD ya existe """
-        try:
-            conn, cursor = self._conectar()
-            
-            # Verificar tabla turnos
-            cursor.execute("CREATE TABLE IF NOT EXISTS turnos (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER, fecha_inicio TEXT, fecha_fin TEXT)")
-            
-            # Verificar columnas nuevas
-            cursor.execute("PRAGMA table_info(taxis)")
-            columnas_taxis = [row['name'] for row in cursor.fetchall()]
-            if 'fecha_movimiento' not in columnas_taxis: 
-                cursor.execute("ALTER TABLE taxis ADD COLUMN fecha_movimiento TEXT")
+    # ==========================================
+    # CONFIGURACIÓN (CACHÉ EN MEMORIA)
+    # ==========================================
+    def obtener_config(self):
+        """
+        Toda la tabla configuracion como {clave: valor_texto}, leída UNA vez y servida desde memoria.
+        Si alguien confirmó cambios en la BD (PRAGMA data_version) se vuelve a cargar.
+        La versión se lee ANTES que los datos: lo guardado nunca es más viejo que su versión.
+        """
+        with self._candado_config:
+            version = self.conexiones.version_datos() if self.vigilar_config else None
+            if self._cache_config is None or version != self._version_config:
+                c = self._cursor()
+                c.execute("SELECT clave, valor FROM configuracion")
+                self._cache_config = {fila['clave']: fila['valor'] for fila in c.fetchall()}
+                self._version_config = version
+            return self._cache_config
+
+    def config_texto(self, clave, defecto=None):
+        valor = self.obtener_config().get(clave)
+        return defecto if valor is None else valor
+
+    def config_entero(self, clave, defecto=0):
+        try: return int(self.obtener_config()[clave])
+        except (KeyError, TypeError, ValueError): return defecto
+
+    def config_decimal(self, clave, defecto=0.0):
+        try: return float(self.obtener_config()[clave])
+        except (KeyError, TypeError, ValueError): return defecto
+
+    def guardar_config(self, valores, cursor=None):
+        """
+        Escribe {clave: valor} en la BD. Con 'cursor' se usa la transacción en curso del que llama.
+        La caché se invalida DESPUÉS del COMMIT: si se invalidara antes, otro hilo podría volver
+        a cargar los valores viejos mientras la transacción sigue abierta.
+        """
+        valores = {clave: str(valor) for clave, valor in valores.items()}
+        if cursor is not None:
+            cursor.executemany("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)", list(valores.items()))
+        else:
+            with self.transaccion() as c:
+                c.executemany("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES (?, ?)", list(valores.items()))
+        self.conexiones.despues_de_confirmar(self._invalidar_config)
 
-            conn.commit()
-            conn.close()
-        except: pass 
+    def _invalidar_config(self):
+        with self._candado_config: self._cache_config = None
 
     # ==========================================
     # LÓGICA DE TURNOS (RELOJ CHECADOR)
     # ==========================================
     def abrir_turno(self, taxi_id):
-        conn, cursor = self._conectar()
         ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaccion() as cursor:
+            self._abrir_turno(cursor, taxi_id, ahora)
+
+    def _abrir_turno(self, cursor, taxi_id, ahora):
         # Cerrar turno previo si quedó colgado
-        cursor.execute("UPDATE turnos SET fecha_fin = ? WHERE taxi_id = ? AND fecha_fin IS NULL", (ahora, taxi_id))
+        self._cerrar_turnos_abiertos(cursor, taxi_id, ahora)
         # Abrir nuevo
         cursor.execute("INSERT INTO turnos (taxi_id, fecha_inicio) VALUES (?, ?)", (taxi_id, ahora))
-        conn.commit()
-        conn.close()
 
     def cerrar_turno(self, taxi_id):
-        conn, cursor = self._conectar()
         ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaccion() as cursor:
+            self._cerrar_turnos_abiertos(cursor, taxi_id, ahora)
+
+    def _cerrar_turnos_abiertos(self, cursor, taxi_id, ahora):
+        """ Cierra los turnos abiertos del taxi y reparte su duración en horas_trabajadas y el resumen (misma transacción) """
+        cursor.execute("SELECT fecha_inicio FROM turnos WHERE taxi_id = ? AND fecha_fin IS NULL", (taxi_id,))
+        abiertos = cursor.fetchall()
+        if not abiertos: return
         cursor.execute("UPDATE turnos SET fecha_fin = ? WHERE taxi_id = ? AND fecha_fin IS NULL", (ahora, taxi_id))
-        conn.commit()
-        conn.close()
+        for turno in abiertos:
+            self._sumar_turno(cursor, taxi_id, turno['fecha_inicio'], ahora)
+
+    def _sumar_turno(self, cursor, taxi_id, fecha_inicio, fecha_fin):
+        """ Reparte un turno cerrado por hora (horas_trabajadas) y por día (resumen_diario) """
+        try:
+            inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d %H:%M:%S")
+            fin = datetime.strptime(fecha_fin, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            return
+        por_dia = {}
+        for fecha, hora, segundos in repartir_turno(inicio, fin):
+            cursor.execute("""
+                INSERT INTO horas_trabajadas (taxi_id, fecha, hora, segundos) VALUES (?, ?, ?, ?)
+                ON CONFLICT (taxi_id, fecha, hora) DO UPDATE SET segundos = segundos + excluded.segundos
+            """, (taxi_id, fecha, hora, int(segundos)))
+            por_dia[fecha] = por_dia.get(fecha, 0) + int(segundos)
+        for fecha, segundos in por_dia.items():
+            self._sumar_resumen(cursor, fecha, taxi_id, 0, 0, segundos=segundos)
+
+    def _rebanadas_turnos_abiertos(self, cursor, taxi_id=None):
+        """
+        Turnos que siguen abiertos, repartidos en vivo hasta ahorita (no están en las tablas de acumulados).
+        Retorna [(taxi_id, fecha, hora, segundos), ...]
+        """
+        ahora_dt = datetime.now()
+        if taxi_id is None:
+            cursor.execute("SELECT taxi_id, fecha_inicio FROM turnos WHERE fecha_fin IS NULL")
+        else:
+            cursor.execute("SELECT taxi_id, fecha_inicio FROM turnos WHERE taxi_id = ? AND fecha_fin IS NULL", (taxi_id,))
+        rebanadas = []
+        for turno in cursor.fetchall():
+            try: inicio = datetime.strptime(turno['fecha_inicio'], "%Y-%m-%d %H:%M:%S")
+            except: continue
+            for fecha, hora, segundos in repartir_turno(inicio, ahora_dt):
+                rebanadas.append((turno['taxi_id'], fecha, hora, segundos))
+        return rebanadas
+
+    def reconstruir_horas_trabajadas(self, lote=50_000):
+        """
+        Recalcula horas_trabajadas repartiendo TODOS los turnos cerrados (luego conviene reconstruir el resumen).
+        Lee los turnos por bloques y suma en la BD cada 'lote' renglones: la memoria no crece con el historial.
+        """
+        insertar = """
+            INSERT INTO horas_trabajadas (taxi_id, fecha, hora, segundos) VALUES (?, ?, ?, ?)
+            ON CONFLICT (taxi_id, fecha, hora) DO UPDATE SET segundos = segundos + excluded.segundos
+        """
+        with self.transaccion() as c:
+            c.execute("DELETE FROM horas_trabajadas")
+            lectura = c.connection.cursor()  # Cursor aparte: 'c' escribe mientras este recorre los turnos
+            lectura.execute("SELECT taxi_id, fecha_inicio, fecha_fin FROM turnos WHERE fecha_fin IS NOT NULL AND taxi_id IS NOT NULL")
+            acumulado = {}
+            while True:
+                turnos = lectura.fetchmany(5000)
+                if not turnos: break
+                for turno in turnos:
+                    try:
+                        inicio = datetime.strptime(turno['fecha_inicio'], "%Y-%m-%d %H:%M:%S")
+                        fin = datetime.strptime(turno['fecha_fin'], "%Y-%m-%d %H:%M:%S")
+                    except (TypeError, ValueError):
+                        continue
+                    for fecha, hora, segundos in repartir_turno(inicio, fin):
+                        llave = (turno['taxi_id'], fecha, hora)
+                        acumulado[llave] = acumulado.get(llave, 0) + int(segundos)
+                if len(acumulado) >= lote:
+                    c.executemany(insertar, [(t, f, h, seg) for (t, f, h), seg in acumulado.items()])
+                    acumulado.clear()
+            if acumulado:
+                c.executemany(insertar, [(t, f, h, seg) for (t, f, h), seg in acumulado.items()])
+        print("✅ Horas trabajadas reconstruidas.")
+
+    # ==========================================
+    # RESUMEN DIARIO (ROLLUP)
+    # ==========================================
+    def _sumar_resumen(self, cursor, fecha, taxi_id, base_salida_id, tipo_servicio_id, viajes=0, ingresos=0.0, segundos=0):
+        """ Suma (o resta, con valores negativos) al renglón del día. Se llama DENTRO de la transacción del cambio. """
+        cursor.execute("""
+            INSERT INTO resumen_diario (fecha, taxi_id, base_salida_id, tipo_servicio_id, viajes, ingresos, segundos_trabajados)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (taxi_id, fecha, base_salida_id, tipo_servicio_id) DO UPDATE SET
+                viajes = viajes + excluded.viajes,
+                ingresos = ingresos + excluded.ingresos,
+                segundos_trabajados = segundos_trabajados + excluded.segundos_trabajados
+        """, (str(fecha)[:10], taxi_id, base_salida_id or 0, tipo_servicio_id or 0, viajes, ingresos, segundos))
+
+    def _sumar_viaje_resumen(self, cursor, viaje, signo=1):
+        """ Aplica (signo=1) o quita (signo=-1) un renglón de viajes al resumen """
+        self._sumar_resumen(cursor, viaje['fecha_hora_inicio'], viaje['taxi_id'], viaje['base_salida_id'],
+                            viaje['tipo_servicio_id'], viajes=signo, ingresos=signo * (viaje['precio'] or 0.0))
+
+    def reconstruir_resumen_diario(self):
+        """ Recalcula TODO el resumen desde viajes y turnos (para datos viejos o cargas externas) """
+        with self.transaccion() as c:
+            c.execute("DELETE FROM resumen_diario")
+            c.execute("""
+                INSERT INTO resumen_diario (fecha, taxi_id, base_salida_id, tipo_servicio_id, viajes, ingresos)
+                SELECT substr(fecha_hora_inicio, 1, 10), taxi_id, COALESCE(base_salida_id, 0), COALESCE(tipo_servicio_id, 0),
+                       COUNT(*), COALESCE(SUM(precio), 0.0)
+                FROM viajes
+                WHERE fecha_hora_inicio IS NOT NULL AND taxi_id IS NOT NULL
+                GROUP BY 1, 2, 3, 4
+            """)
+            # Los segundos salen de horas_trabajadas (turnos ya repartidos por día)
+            c.execute("""
+                INSERT INTO resumen_diario (fecha, taxi_id, base_salida_id, tipo_servicio_id, segundos_trabajados)
+                SELECT fecha, taxi_id, 0, 0, SUM(segundos)
+                FROM horas_trabajadas
+                GROUP BY 1, 2
+                ON CONFLICT (taxi_id, fecha, base_salida_id, tipo_servicio_id) DO UPDATE SET
+                    segundos_trabajados = segundos_trabajados + excluded.segundos_trabajados
+            """)
+        print("✅ Resumen diario reconstruido.")
 
     def actualizar_taxi_base(self, taxi_id, nueva_base_id):
-        conn, cursor = self._conectar()
         ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Actualiza ubicación y hora (para la alerta naranja)
-        cursor.execute("UPDATE taxis SET base_actual_id = ?, fecha_movimiento = ? WHERE id = ?", (nueva_base_id, ahora, taxi_id))
-        conn.commit()
-        conn.close()
+        with self.transaccion() as cursor:
+            # Actualiza ubicación y hora (para la alerta naranja)
+            cursor.execute("UPDATE taxis SET base_actual_id = ?, fecha_movimiento = ? WHERE id = ?", (nueva_base_id, ahora, taxi_id))
+
+    @trazar("bd")
+    def cerrar_descansos_vencidos(self, minutos=180):
+        """
+        Manda a Fuera de Servicio (12) a los taxis ACTIVOS con más de 'minutos' en Descanso (91),
+        cerrando su turno. Una consulta indexada y UNA transacción. Devuelve los ids movidos.
+        """
+        ahora_dt = datetime.now()
+        ahora = ahora_dt.strftime("%Y-%m-%d %H:%M:%S")
+        limite = (ahora_dt - timedelta(minutes=minutos)).strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.transaccion() as cursor:
+            cursor.execute("""
+                SELECT id FROM taxis
+                WHERE base_actual_id = 91 AND fecha_movimiento < ? AND estado_sistema = 'ACTIVO'
+            """, (limite,))
+            vencidos = [fila['id'] for fila in cursor.fetchall()]
+            for taxi_id in vencidos:
+                self._cerrar_turnos_abiertos(cursor, taxi_id, ahora)
+            cursor.executemany("UPDATE taxis SET base_actual_id = 12, fecha_movimiento = ? WHERE id = ?",
+                               [(ahora, taxi_id) for taxi_id in vencidos])
+        return vencidos
+
+    @trazar("bd")
+    def mover_taxi(self, taxi_id, base_destino, datos_viaje=None):
+        """
+        Movimiento completo de una ficha del tablero en UNA transacción (un solo commit):
+        turno (abrir/cerrar), viaje (registrar/terminar) y base actual.
+        datos_viaje: {'tipo_servicio', 'base_salida', 'destino', 'precio'} si se suelta en Foráneo/Local.
+        Devuelve el nuevo estado del taxi (dict con 'base_anterior') o None si no existe.
+        """
+        inactivas = (12, 90, 91)   # Fuera, Taller, Descanso
+        de_viaje = (92, 93)        # Foráneo, Local
+        ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        with self.transaccion() as cursor:
+            cursor.execute("SELECT base_actual_id FROM taxis WHERE id = ?", (taxi_id,))
+            fila = cursor.fetchone()
+            if not fila: return None
+            base_anterior = fila['base_actual_id']
+
+            # 1. Reloj checador
+            if base_anterior in inactivas and base_destino not in inactivas:
+                self._abrir_turno(cursor, taxi_id, ahora)
+            elif base_anterior not in inactivas and base_destino in inactivas:
+                self._cerrar_turnos_abiertos(cursor, taxi_id, ahora)
+                self._terminar_viaje(cursor, taxi_id, ahora)
+
+            # 2. Viajes
+            if base_destino in de_viaje:
+                if datos_viaje:
+                    self._insertar_viaje(cursor, taxi_id, datos_viaje['tipo_servicio'], datos_viaje['base_salida'],
+                                         datos_viaje['destino'], datos_viaje['precio'], ahora)
+            elif base_anterior in de_viaje:
+                self._terminar_viaje(cursor, taxi_id, ahora)
+
+            # 3. Ubicación
+            cursor.execute("UPDATE taxis SET base_actual_id = ?, fecha_movimiento = ? WHERE id = ?", (base_destino, ahora, taxi_id))
+            cursor.execute("SELECT * FROM taxis WHERE id = ?", (taxi_id,))
+            estado = dict(cursor.fetchone())
+
+        estado['base_anterior'] = base_anterior
+        return estado
 
     # ==========================================
     # ESTADÍSTICAS Y REPORTES (NOMBRES COMPLETOS)
     # ==========================================
 
+    @trazar("bd")
     def obtener_estadisticas_unidad(self, taxi_id, periodo, fecha_ref=None):
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         if not fecha_ref: fecha_ref = datetime.now().strftime("%Y-%m-%d")
         
-        # 1. Ganancias y Viajes
-        filtro_viajes = ""
-        if periodo in ["DIA", "HOY"]: filtro_viajes = f"AND fecha_hora_inicio LIKE '{fecha_ref}%'"
-        elif periodo == "MES": filtro_viajes = f"AND fecha_hora_inicio LIKE '{fecha_ref[:7]}%'"
-        elif periodo == "AÑO": filtro_viajes = f"AND fecha_hora_inicio LIKE '{fecha_ref[:4]}%'"
+        # 1. Ganancias, Viajes y Horas (turnos cerrados) desde el resumen diario:
+        #    un MES/AÑO son a lo mucho unos cientos de renglones por taxi
+        filtro, params = _filtro_periodo("fecha", periodo, fecha_ref)
 
-        cursor.execute(f"SELECT SUM(precio), COUNT(*) FROM viajes WHERE taxi_id = ? {filtro_viajes}", (taxi_id,))
+        cursor.execute(f"""
+            SELECT SUM(ingresos), SUM(viajes), SUM(segundos_trabajados)
+            FROM resumen_diario WHERE taxi_id = ? {filtro}
+        """, [taxi_id] + params)
         resultado = cursor.fetchone()
         ganancia = resultado[0] if resultado[0] else 0.0
         viajes = resultado[1] if resultado[1] else 0
+        segundos_totales = resultado[2] or 0
 
-        # 2. Horas (Calculadas sumando turnos reales)
-        segundos_totales = 0
-        filtro_turnos = ""
-        
-        # Filtro para traer los turnos que iniciaron en ese periodo
-        if periodo in ["DIA", "HOY"]: filtro_turnos = f"AND fecha_inicio LIKE '{fecha_ref}%'"
-        elif periodo == "MES": filtro_turnos = f"AND fecha_inicio LIKE '{fecha_ref[:7]}%'"
-        
-        cursor.execute(f"SELECT fecha_inicio, fecha_fin FROM turnos WHERE taxi_id = ? {filtro_turnos}", (taxi_id,))
-        lista_turnos = cursor.fetchall()
-        
-        ahora_dt = datetime.now()
-        
-        for turno in lista_turnos:
-            try:
-                inicio = datetime.strptime(turno['fecha_inicio'], "%Y-%m-%d %H:%M:%S")
-                if turno['fecha_fin']:
-                    fin = datetime.strptime(turno['fecha_fin'], "%Y-%m-%d %H:%M:%S")
-                    segundos_totales += (fin - inicio).total_seconds()
-                elif periodo == "HOY" or fecha_ref == ahora_dt.strftime("%Y-%m-%d"):
-                    # Si el turno sigue abierto hoy, sumar tiempo hasta ahorita
-                    segundos_totales += (ahora_dt - inicio).total_seconds()
-            except: pass
+        # 2. Si hay un turno abierto, sumar lo que cae dentro del periodo hasta ahorita
+        rango = rango_periodo(periodo, fecha_ref)
+        for _, fecha, _, segundos in self._rebanadas_turnos_abiertos(cursor, taxi_id):
+            if rango is None or rango[0] <= fecha < rango[1]:
+                segundos_totales += segundos
             
         horas_reales = segundos_totales / 3600.0
-        conn.close()
         
         return {"ganancia": ganancia, "viajes": viajes, "horas": horas_reales}
 
+    @trazar("bd")
     def obtener_datos_tres_graficas(self, taxi_id, periodo, fecha_ref=None):
         """ Genera datos para las gráficas. Acepta 'fecha_ref' explícitamente. """
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         if not fecha_ref: fecha_ref = datetime.now().strftime("%Y-%m-%d")
         
         etiquetas, dinero, viajes, horas = [], [], [], []
@@ -218,8 +814,8 @@ class GestorBaseDatos:
                 datos_temp = {f"{h:02d}": {"dinero": 0.0, "viajes": 0} for h in range(24)}
                 cursor.execute("""
                     SELECT strftime('%H', fecha_hora_inicio) as hora, SUM(precio), COUNT(*)
-                    FROM viajes WHERE taxi_id = ? AND fecha_hora_inicio LIKE ? GROUP BY hora
-                """, (taxi_id, f"{fecha_ref}%"))
+                    FROM viajes WHERE taxi_id = ? AND fecha_hora_inicio >= ? AND fecha_hora_inicio < ? GROUP BY hora
+                """, [taxi_id] + list(rango_periodo("DIA", fecha_ref)))
                 
                 for fila in cursor.fetchall():
                     h = fila['hora']
@@ -227,20 +823,28 @@ class GestorBaseDatos:
                         datos_temp[h]["dinero"] = fila[1]
                         datos_temp[h]["viajes"] = fila[2]
                 
+                # Horas reales trabajadas en cada hora del reloj (0 a 1 por casilla)
+                segundos_hora = [0.0] * 24
+                cursor.execute("SELECT hora, segundos FROM horas_trabajadas WHERE taxi_id = ? AND fecha = ?", (taxi_id, fecha_ref))
+                for fila in cursor.fetchall():
+                    if 0 <= fila['hora'] < 24: segundos_hora[fila['hora']] += fila['segundos']
+                for _, fecha, hora, segundos in self._rebanadas_turnos_abiertos(cursor, taxi_id):
+                    if fecha == fecha_ref: segundos_hora[hora] += segundos
+                
                 llaves = sorted(datos_temp.keys())
                 etiquetas = [f"{h}h" for h in llaves]
                 dinero = [datos_temp[h]["dinero"] for h in llaves]
                 viajes = [datos_temp[h]["viajes"] for h in llaves]
-                horas = [v * 0.5 for v in viajes] # Estimación visual
+                horas = [segundos_hora[int(h)] / 3600.0 for h in llaves]
 
             # MODO MES (Por Días)
             elif periodo == "MES":
-                mes_str = fecha_ref[:7]
-                datos_temp = {f"{d:02d}": {"dinero": 0.0, "viajes": 0} for d in range(1, 32)}
+                datos_temp = {f"{d:02d}": {"dinero": 0.0, "viajes": 0, "segundos": 0.0} for d in range(1, 32)}
+                rango_mes = rango_periodo("MES", fecha_ref)
                 cursor.execute("""
-                    SELECT strftime('%d', fecha_hora_inicio) as dia, SUM(precio), COUNT(*)
-                    FROM viajes WHERE taxi_id = ? AND fecha_hora_inicio LIKE ? GROUP BY dia
-                """, (taxi_id, f"{mes_str}%"))
+                    SELECT substr(fecha, 9, 2) as dia, SUM(ingresos), SUM(viajes), SUM(segundos_trabajados)
+                    FROM resumen_diario WHERE taxi_id = ? AND fecha >= ? AND fecha < ? GROUP BY dia
+                """, [taxi_id] + list(rango_mes))
                 
                 dias_con_datos = []
                 for fila in cursor.fetchall():
@@ -248,7 +852,12 @@ class GestorBaseDatos:
                     if d in datos_temp:
                         datos_temp[d]["dinero"] = fila[1]
                         datos_temp[d]["viajes"] = fila[2]
-                        dias_con_datos.append(d)
+                        datos_temp[d]["segundos"] += fila[3] or 0
+                        if fila[2] or fila[3]: dias_con_datos.append(d)
+                for _, fecha, _, segundos in self._rebanadas_turnos_abiertos(cursor, taxi_id):
+                    if rango_mes[0] <= fecha < rango_mes[1]:
+                        datos_temp[fecha[8:10]]["segundos"] += segundos
+                        dias_con_datos.append(fecha[8:10])
                 
                 limite = int(max(dias_con_datos)) if dias_con_datos else 31
                 rango_dias = [f"{d:02d}" for d in range(1, limite + 1)]
@@ -256,23 +865,21 @@ class GestorBaseDatos:
                 etiquetas = rango_dias
                 dinero = [datos_temp[d]["dinero"] for d in rango_dias]
                 viajes = [datos_temp[d]["viajes"] for d in rango_dias]
-                horas = [v * 0.8 for v in viajes] # Estimación visual
+                horas = [datos_temp[d]["segundos"] / 3600.0 for d in rango_dias]
 
         except Exception as e: print(f"Error gráficas: {e}")
-        conn.close()
         return {"etiquetas": etiquetas, "dinero": dinero, "viajes": viajes, "horas": horas}
 
     def obtener_viajes_por_unidad_y_periodo(self, taxi_id, periodo, fecha_ref=None):
         """ Para el reporte PDF. Acepta 'fecha_ref' explícitamente. """
-        conn, cursor = self._conectar()
-        filtro = ""
-        if periodo in ["DIA", "HOY"]: filtro = f" AND v.fecha_hora_inicio LIKE '{fecha_ref}%'"
+        cursor = self._cursor()
+        filtro, params = _filtro_periodo("v.fecha_hora_inicio", periodo, fecha_ref)
         
         cursor.execute(f"""
             SELECT v.fecha_hora_inicio as fecha, v.destino, v.precio, b.nombre_base 
             FROM viajes v LEFT JOIN cat_bases b ON v.base_salida_id=b.id 
             WHERE v.taxi_id=? {filtro} ORDER BY v.fecha_hora_inicio ASC
-        """, (taxi_id,))
+        """, [taxi_id] + params)
         
         datos = []
         for fila in cursor.fetchall():
@@ -282,44 +889,54 @@ class GestorBaseDatos:
                 "destino": fila['destino'], 
                 "precio": fila['precio']
             })
-        conn.close()
         return datos
 
+    @trazar("bd")
     def obtener_ranking_bases(self, periodo):
         """ Para la gráfica de pastel de Bases """
-        conn, cursor = self._conectar()
-        fecha_ref = datetime.now().strftime("%Y-%m-%d")
-        filtro = ""
-        if periodo == "DIA": filtro = f" AND v.fecha_hora_inicio LIKE '{fecha_ref}%'"
-        elif periodo == "MES": filtro = f" AND v.fecha_hora_inicio LIKE '{fecha_ref[:7]}%'"
-        elif periodo == "AÑO": filtro = f" AND v.fecha_hora_inicio LIKE '{fecha_ref[:4]}%'"
+        cursor = self._cursor()
+        filtro, params = _filtro_periodo("r.fecha", periodo)
 
         cursor.execute(f"""
-            SELECT b.nombre_base, COUNT(*) as conteo
-            FROM viajes v JOIN cat_bases b ON v.base_salida_id = b.id
-            WHERE 1=1 {filtro} GROUP BY b.nombre_base ORDER BY conteo DESC LIMIT 5
-        """)
+            SELECT b.nombre_base, SUM(r.viajes) as conteo
+            FROM resumen_diario r JOIN cat_bases b ON r.base_salida_id = b.id
+            WHERE 1=1 {filtro} GROUP BY b.nombre_base HAVING conteo > 0 ORDER BY conteo DESC LIMIT 5
+        """, params)
         filas = cursor.fetchall()
-        conn.close()
         
         if not filas: return ["Sin Datos"], [0]
         return [f['nombre_base'] for f in filas], [f['conteo'] for f in filas]
 
     # REEMPLAZAR EN gestor_db.py
     
+    @trazar("bd")
+    def obtener_datos_reporte_dual(self, tipo, periodo, fecha_str):
+        """
+        Todo lo que necesita GeneradorPDF.generar_reporte_dual: (datos_generales, datos_admin).
+        datos_admin solo se llena para tipo "ADMIN". Lo usan la interfaz y comandos.py.
+        """
+        datos_gral = self.obtener_datos_reporte_global(periodo, fecha_str)
+        # Obtenemos la lista real de la base de datos para la sábana
+        datos_gral['incidencias_lista'] = self.obtener_incidencias_globales_periodo(fecha_str, fecha_str)
+        # Reusamos 'obtener_top_taxis_admin' porque esa ya calcula viajes y dinero de todos
+        datos_todos = self.obtener_top_taxis_admin(periodo, fecha_str)
+        if datos_todos:
+            # Usamos la lista 'top_viajes' que trae a todos los taxis ordenados
+            datos_gral['detalle_flota'] = datos_todos['top_viajes']
+        datos_admin = datos_todos if tipo == "ADMIN" else None
+        return datos_gral, datos_admin
+
+    @trazar("bd")
     def obtener_datos_reporte_global(self, periodo, fecha_str):
         """
         Retorna un paquete completo de estadísticas para el reporte profesional.
         """
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         
-        filtro = ""
-        if periodo == "DIA": filtro = f" AND fecha_hora_inicio LIKE '{fecha_str}%'"
-        elif periodo == "MES": filtro = f" AND fecha_hora_inicio LIKE '{fecha_str[:7]}%'"
-        elif periodo == "AÑO": filtro = f" AND fecha_hora_inicio LIKE '{fecha_str[:4]}%'"
+        filtro, params = _filtro_periodo("fecha", periodo, fecha_str)
         
-        # 1. TOTALES GENERALES (Dinero y Viajes)
-        cursor.execute(f"SELECT SUM(precio), COUNT(*) FROM viajes WHERE 1=1 {filtro}")
+        # 1. TOTALES GENERALES (Dinero y Viajes) desde el resumen diario
+        cursor.execute(f"SELECT SUM(ingresos), SUM(viajes) FROM resumen_diario WHERE 1=1 {filtro}", params)
         res = cursor.fetchone()
         ganancia_total = res[0] or 0.0
         viajes_totales = res[1] or 0
@@ -327,9 +944,9 @@ class GestorBaseDatos:
         # 2. DESGLOSE POR TIPO DE SERVICIO (Para ver qué se vende más)
         # 1=Base, 2=Tel Base, 3=Tel Unidad, 4=Aéreo
         cursor.execute(f"""
-            SELECT tipo_servicio_id, COUNT(*) 
-            FROM viajes WHERE 1=1 {filtro} GROUP BY tipo_servicio_id
-        """)
+            SELECT tipo_servicio_id, SUM(viajes) 
+            FROM resumen_diario WHERE tipo_servicio_id > 0 {filtro} GROUP BY tipo_servicio_id
+        """, params)
         raw_servicios = cursor.fetchall()
         servicios = {1:0, 2:0, 3:0, 4:0}
         for s_id, count in raw_servicios:
@@ -337,14 +954,14 @@ class GestorBaseDatos:
 
         # 3. INCIDENCIAS (Multas y Ausencias del periodo)
         # Filtramos por fecha de registro de la incidencia
-        filtro_inc = filtro.replace("fecha_hora_inicio", "fecha_registro")
+        filtro_inc, params_inc = _filtro_periodo("fecha_registro", periodo, fecha_str)
         
         cursor.execute(f"""
             SELECT tipo, COUNT(*), SUM(monto) 
             FROM incidencias 
             WHERE 1=1 {filtro_inc}
             GROUP BY tipo
-        """)
+        """, params_inc)
         raw_inc = cursor.fetchall()
         
         # Procesamos incidencias
@@ -358,7 +975,6 @@ class GestorBaseDatos:
             incidencias["total_multas_dinero"] += (lana or 0.0)
             incidencias["desglose"].append((tipo, cant, lana or 0.0))
             
-        conn.close()
         
         return {
             "totales": {
@@ -371,29 +987,74 @@ class GestorBaseDatos:
         }
     
     
-    def auditoria_inteligente(self, fecha_analisis):
+    def _horas_por_dia(self, desde, dias):
+        """
+        Matriz de horas trabajadas: {taxi_id: array('d') con una casilla por día}
+        desde 'desde' (YYYY-MM-DD) durante 'dias' días. UNA sola consulta al resumen diario
+        para toda la flota; los turnos que cruzan la medianoche ya vienen repartidos por día
+        y los que siguen abiertos se suman en vivo.
+        """
+        inicio = datetime.strptime(desde, "%Y-%m-%d")
+        fin = (inicio + timedelta(days=dias)).strftime("%Y-%m-%d")
+
+        cursor = self._cursor()
+        cursor.execute("""
+            SELECT taxi_id, fecha, SUM(segundos_trabajados) AS segundos
+            FROM resumen_diario
+            WHERE fecha >= ? AND fecha < ?
+            GROUP BY taxi_id, fecha
+            HAVING SUM(segundos_trabajados) != 0
+        """, (desde, fin))
+        filas = [(fila['taxi_id'], fila['fecha'], fila['segundos']) for fila in cursor.fetchall()]
+        filas += [(t, fecha, segundos) for t, fecha, _, segundos in self._rebanadas_turnos_abiertos(cursor)]
+
+        matriz = {}
+        for taxi_id, fecha, segundos in filas:
+            try:
+                idx = (datetime.strptime(fecha, "%Y-%m-%d") - inicio).days
+            except ValueError:
+                continue
+            if not 0 <= idx < dias: continue
+            if taxi_id not in matriz:
+                matriz[taxi_id] = array('d', bytes(8 * dias))
+            matriz[taxi_id][idx] += segundos / 3600.0
+        return matriz
+
+    @trazar("bd")
+    def auditoria_inteligente(self, fecha_analisis, fecha_fin=None):
         """
-        AUDITORÍA V9 (Lógica Corregida con FECHA DE INICIO):
+        AUDITORÍA V10 (por lotes):
+        Revisa uno o varios días (fecha_analisis .. fecha_fin) con UNA consulta de turnos.
+        Cada candidato trae la "fecha" auditada para poder re-auditar días atrasados.
         """
+        if not fecha_fin: fecha_fin = fecha_analisis
+
         # --- NUEVO: CANDADO DE FECHA DE INICIO ---
         # Si la fecha que intentan revisar es ANTES del 28 de Enero de 2026, no hacemos nada.
-        if fecha_analisis < "2026-01-28":
+        if fecha_fin < "2026-01-28":
             print(f"--- Auditoría omitida por fecha de inicio ({fecha_analisis}) ---")
             return [] # Retornamos lista vacía: Nadie debe nada, nadie faltó.
+        if fecha_analisis < "2026-01-28": fecha_analisis = "2026-01-28"
 
-        conn, cursor = self._conectar()
         taxis = self.obtener_toda_la_flota()
         candidatos = []
         
-        print(f"--- INICIANDO AUDITORÍA V9 ({fecha_analisis}) ---")
-        
-        # ... (El resto del código sigue igual) ...
+        print(f"--- INICIANDO AUDITORÍA V10 ({fecha_analisis} a {fecha_fin}) ---")
 
         # Objeto fecha para revisar el pasado
         try:
             fecha_obj = datetime.strptime(fecha_analisis, "%Y-%m-%d")
+            fecha_fin_obj = datetime.strptime(fecha_fin, "%Y-%m-%d")
         except:
-            fecha_obj = datetime.now()
+            fecha_obj = fecha_fin_obj = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # Ventana: 7 días antes del primer día (para la racha) + los días auditados
+        dias_auditados = (fecha_fin_obj - fecha_obj).days + 1
+        if dias_auditados < 1: return []
+        ventana = 7 + dias_auditados
+        desde = (fecha_obj - timedelta(days=7)).strftime("%Y-%m-%d")
+        matriz = self._horas_por_dia(desde, ventana)
+        sin_turnos = array('d', bytes(8 * ventana))
 
         for taxi in taxis:
             num = taxi['numero_economico']
@@ -402,75 +1063,113 @@ class GestorBaseDatos:
             if taxi['estado_sistema'] != 'ACTIVO': continue
             if taxi['base_actual_id'] == 90: continue # Taller perdonado
 
-            # Calcular horas trabajadas
-            stats = self.obtener_estadisticas_unidad(taxi['id'], "DIA", fecha_analisis)
-            horas = stats['horas']
-
-            # --- ESCENARIO 1: AUSENCIA TOTAL (0 Horas) ---
-            if horas == 0:
-                # Calcular Racha (Ahora miramos 7 días atrás)
-                dias_consecutivos = 1
-                for i in range(1, 8): # Del 1 al 7
-                    dia_previo = (fecha_obj - timedelta(days=i)).strftime("%Y-%m-%d")
-                    stats_prev = self.obtener_estadisticas_unidad(taxi['id'], "DIA", dia_previo)
-                    
-                    if stats_prev['horas'] == 0:
-                        dias_consecutivos += 1
+            horas_dia = matriz.get(taxi['id'], sin_turnos)
+
+            # Racha: días seguidos en cero hasta cada día (tope 8 = el día + 7 atrás)
+            racha = 0
+            for idx in range(ventana):
+                horas = horas_dia[idx]
+                racha = min(racha + 1, 8) if horas == 0 else 0
+                if idx < 7: continue # Días de contexto, no se auditan
+
+                fecha = (fecha_obj + timedelta(days=idx - 7)).strftime("%Y-%m-%d")
+
+                # --- ESCENARIO 1: AUSENCIA TOTAL (0 Horas) ---
+                if horas == 0:
+                    dias_consecutivos = racha
+
+                    # DEFINICIÓN DEL REPORTE (SIN DINERO)
+                    # No importa si faltó 1 día o 10, el monto es 0 porque es Ausencia.
+                    monto = 0.0
+                    tipo = "AUSENCIA"
+
+                    if dias_consecutivos == 1:
+                        motivo = "Falta injustificada (1er día)"
+                    elif dias_consecutivos < 3:
+                        motivo = f"Ausencia ({dias_consecutivos} días seguidos)"
                     else:
-                        break 
-                
-                # DEFINICIÓN DEL REPORTE (SIN DINERO)
-                # No importa si faltó 1 día o 10, el monto es 0 porque es Ausencia.
-                monto = 0.0
-                tipo = "AUSENCIA"
-                
-                if dias_consecutivos == 1:
-                    motivo = "Falta injustificada (1er día)"
-                elif dias_consecutivos < 3:
-                    motivo = f"Ausencia ({dias_consecutivos} días seguidos)"
-                else:
-                    # Si son 3 o más días, le ponemos la etiqueta fea para que la operadora se asuste
-                    motivo = f"¡POSIBLE ABANDONO! ({dias_consecutivos} días sin trabajar)"
-                
-                # Contexto extra
-                if taxi['base_actual_id'] == 12: motivo += " [En Fuera de Servicio]"
-                if taxi['base_actual_id'] == 91: motivo += " [En Descanso]"
-
-                candidatos.append({
-                    "taxi_id": taxi['id'], 
-                    "numero": num, 
-                    "tipo": tipo,
-                    "motivo": motivo,
-                    "monto": monto 
-                })
-
-            # --- ESCENARIO 2: VAGO (< 10 Horas) ---
-            elif horas < 10.0:
-                # AQUÍ SÍ HAY DINERO DE POR MEDIO
-                faltantes = 10.0 - horas
-                multa = faltantes * 50.0 # $50 por hora faltante
-                candidatos.append({
-                    "taxi_id": taxi['id'], 
-                    "numero": num, 
-                    "tipo": "MULTA", # Esto activará el botón de cobrar
-                    "motivo": f"Incumplimiento Horas ({horas:.1f} hrs trabajadas)", 
-                    "monto": round(multa, 2)
-                })
+                        # Si son 3 o más días, le ponemos la etiqueta fea para que la operadora se asuste
+                        motivo = f"¡POSIBLE ABANDONO! ({dias_consecutivos} días sin trabajar)"
+
+                    # Contexto extra
+                    if taxi['base_actual_id'] == 12: motivo += " [En Fuera de Servicio]"
+                    if taxi['base_actual_id'] == 91: motivo += " [En Descanso]"
+
+                    candidatos.append({
+                        "taxi_id": taxi['id'], 
+                        "numero": num, 
+                        "tipo": tipo,
+                        "motivo": motivo,
+                        "monto": monto,
+                        "fecha": fecha
+                    })
+
+                # --- ESCENARIO 2: VAGO (< 10 Horas) ---
+                elif horas < 10.0:
+                    # AQUÍ SÍ HAY DINERO DE POR MEDIO
+                    faltantes = 10.0 - horas
+                    multa = faltantes * 50.0 # $50 por hora faltante
+                    candidatos.append({
+                        "taxi_id": taxi['id'], 
+                        "numero": num, 
+                        "tipo": "MULTA", # Esto activará el botón de cobrar
+                        "motivo": f"Incumplimiento Horas ({horas:.1f} hrs trabajadas)", 
+                        "monto": round(multa, 2),
+                        "fecha": fecha
+                    })
         
         print(f"--- FIN AUDITORÍA: {len(candidatos)} REGISTROS ---")      
-        conn.close()
         return candidatos
 
 
+    @trazar("bd")
+    def aplicar_auditoria(self, candidatos, operador="SISTEMA"):
+        """
+        Registra lo que devolvió auditoria_inteligente en UNA transacción:
+        MULTA -> cargo pendiente, AUSENCIA -> reporte informativo. Devuelve (multas, ausencias).
+        La descripción empieza con "[Auditoría AAAA-MM-DD]" (el día auditado): así un cargo se
+        rastrea a su día y un mismo taxi/día no se registra dos veces aunque se re-audite.
+        """
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        multas = ausencias = omitidos = 0
+        with self.transaccion() as cursor:
+            marcas = {_marca_auditoria(c.get('fecha') or fecha[:10]) for c in candidatos}
+            ya_aplicados = set()
+            if marcas:
+                cursor.execute(f"""
+                    SELECT taxi_id, substr(descripcion, 1, 22) FROM incidencias
+                    WHERE substr(descripcion, 1, 22) IN ({",".join("?" * len(marcas))})
+                """, list(marcas))
+                ya_aplicados = {(fila[0], fila[1]) for fila in cursor.fetchall()}
+
+            for c in candidatos:
+                if c['tipo'] == 'MULTA':
+                    tipo, monto = "🛑 Multa Horas", c['monto']
+                elif c['tipo'] == 'AUSENCIA':
+                    tipo, monto = "🚫 Ausencia", 0.0
+                else: continue
+                marca = _marca_auditoria(c.get('fecha') or fecha[:10])
+                if (c['taxi_id'], marca) in ya_aplicados:
+                    omitidos += 1; continue
+                ya_aplicados.add((c['taxi_id'], marca))
+                if c['tipo'] == 'MULTA': multas += 1
+                else: ausencias += 1
+                cursor.execute("""
+                    INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (c['taxi_id'], tipo, f"{marca} {c['motivo']}", monto, fecha, 'PENDIENTE' if monto > 0 else 'INFORMATIVO', operador))
+        if omitidos: print(f"⚠️ {omitidos} registros de auditoría ya existían (mismo taxi y día): no se duplicaron.")
+        return multas, ausencias
+
     def ya_se_hizo_auditoria_hoy(self):
         """ Devuelve True si el sistema ya generó reportes automáticos HOY """
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         hoy = datetime.now().strftime("%Y-%m-%d")
         
         # Buscamos si hay algo registrado por 'SISTEMA' con la fecha de hoy
-        cursor.execute(f"SELECT COUNT(*) FROM incidencias WHERE operador_id = 'SISTEMA' AND fecha_registro LIKE '{hoy}%'")
+        filtro, params = _filtro_periodo("fecha_registro", "DIA", hoy)
+        cursor.execute(f"SELECT COUNT(*) FROM incidencias WHERE operador_id = 'SISTEMA' {filtro}", params)
         conteo = cursor.fetchone()[0]
-        conn.close()
         
         return conteo > 0
     # ==========================================
@@ -478,31 +1177,32 @@ class GestorBaseDatos:
     # ==========================================
     
     def registrar_viaje(self, taxi_id, tipo_servicio, base_salida, destino, precio):
-        conn, cursor = self._conectar()
         ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaccion() as cursor:
+            self._insertar_viaje(cursor, taxi_id, tipo_servicio, base_salida, destino, precio, ahora)
+
+    def _insertar_viaje(self, cursor, taxi_id, tipo_servicio, base_salida, destino, precio, ahora):
         cursor.execute("""
             INSERT INTO viajes (taxi_id, tipo_servicio_id, base_salida_id, destino, precio, fecha_hora_inicio) 
             VALUES (?, ?, ?, ?, ?, ?)
         """, (taxi_id, tipo_servicio, base_salida, destino, precio, ahora))
-        conn.commit()
-        conn.close()
+        self._sumar_resumen(cursor, ahora, taxi_id, base_salida, tipo_servicio, viajes=1, ingresos=precio or 0.0)
     
     def registrar_fin_viaje(self, taxi_id):
-        conn, cursor = self._conectar()
         ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaccion() as cursor:
+            self._terminar_viaje(cursor, taxi_id, ahora)
+
+    def _terminar_viaje(self, cursor, taxi_id, ahora):
         cursor.execute("UPDATE viajes SET fecha_hora_fin = ? WHERE id = (SELECT MAX(id) FROM viajes WHERE taxi_id = ?)", (ahora, taxi_id))
-        conn.commit()
-        conn.close()
 
-    def obtener_historial_viajes(self, filtro="HOY"):
+    @trazar("bd")
+    def obtener_historial_viajes(self, filtro="HOY", fecha_ref=None):
         """ CORREGIDO: Incluye tipo_servicio_id para evitar IndexError en la tabla """
-        conn, cursor = self._conectar()
-        fecha_hoy = datetime.now().strftime("%Y-%m-%d")
+        cursor = self._cursor()
+        if not fecha_ref: fecha_ref = datetime.now().strftime("%Y-%m-%d")
         
-        condicion = ""
-        if filtro == "HOY": condicion = f" WHERE v.fecha_hora_inicio LIKE '{fecha_hoy}%'"
-        elif filtro == "MES": condicion = f" WHERE v.fecha_hora_inicio LIKE '{fecha_hoy[:7]}%'"
-        elif filtro == "AÑO": condicion = f" WHERE v.fecha_hora_inicio LIKE '{fecha_hoy[:4]}%'"
+        condicion, params = _filtro_periodo("v.fecha_hora_inicio", filtro, fecha_ref)
         
         cursor.execute(f"""
             SELECT v.id, v.fecha_hora_inicio, t.numero_economico, 
@@ -512,35 +1212,160 @@ class GestorBaseDatos:
             JOIN taxis t ON v.taxi_id = t.id
             LEFT JOIN cat_bases b ON v.base_salida_id = b.id
             LEFT JOIN cat_tipos_servicio s ON v.tipo_servicio_id = s.id
-            {condicion} ORDER BY v.id DESC
-        """)
+            WHERE 1=1 {condicion} ORDER BY v.id DESC
+        """, params)
         datos = cursor.fetchall()
-        conn.close()
         return datos
 
+    # Columnas por las que se puede ordenar el historial (nombre -> expresión SQL sin NULLs)
+    ORDEN_HISTORIAL = {
+        "id": "v.id",
+        "fecha": "v.fecha_hora_inicio",
+        "hora": "substr(v.fecha_hora_inicio, 12)",
+        "unidad": "CAST(t.numero_economico AS INTEGER)",
+        "concepto": "COALESCE(v.tipo_servicio_id, 0)",
+        "base": "COALESCE(b.nombre_base, '')",
+        "destino": "COALESCE(v.destino, '')",
+        "precio": "COALESCE(v.precio, 0)",
+    }
+
+    @trazar("bd")
+    def obtener_pagina_historial(self, filtro="HOY", despues_de=None, limite=200, orden="id", descendente=True, busqueda=None):
+        """
+        Una página del historial con paginación por llave (keyset): nunca se usa OFFSET.
+        despues_de: (clave_orden, id) del último renglón de la página anterior, o None para la primera.
+        busqueda: número exacto de unidad o palabras del destino (índice FTS).
+        Cada renglón trae 'clave_orden' para pedir la siguiente página.
+        """
+        expr = self.ORDEN_HISTORIAL.get(orden, "v.id")
+        sentido = "DESC" if descendente else "ASC"
+        comparador = "<" if descendente else ">"
+        cursor = self._cursor()
+        fecha_hoy = datetime.now().strftime("%Y-%m-%d")
+
+        condicion, params = _filtro_periodo("v.fecha_hora_inicio", filtro, fecha_hoy)
+        if busqueda and busqueda.strip():
+            cond_b, params_b = self._filtro_busqueda_viajes(busqueda)
+            condicion += cond_b; params = params + params_b
+        if despues_de is not None:
+            condicion += f" AND ({expr}, v.id) {comparador} (?, ?)"
+            params = params + list(despues_de)
+
+        cursor.execute(f"""
+            SELECT {expr} AS clave_orden,
+                   v.id, v.fecha_hora_inicio, t.numero_economico, 
+                   v.destino, v.precio, v.tipo_servicio_id,
+                   b.nombre_base, s.descripcion as nombre_servicio
+            FROM viajes v
+            JOIN taxis t ON v.taxi_id = t.id
+            LEFT JOIN cat_bases b ON v.base_salida_id = b.id
+            LEFT JOIN cat_tipos_servicio s ON v.tipo_servicio_id = s.id
+            WHERE 1=1 {condicion} ORDER BY {expr} {sentido}, v.id {sentido} LIMIT ?
+        """, params + [int(limite)])
+        return cursor.fetchall()
+
+    # ==========================================
+    # BÚSQUEDA DE TEXTO (viajes e incidencias)
+    # ==========================================
+    def _filtro_busqueda_viajes(self, texto):
+        """ Condición para 'viajes v JOIN taxis t': unidad exacta o destino por palabras """
+        texto = texto.strip()
+        if self.busqueda_fts:
+            return (" AND (t.numero_economico = ? OR v.id IN (SELECT rowid FROM viajes_fts WHERE viajes_fts MATCH ?))",
+                    [texto, _consulta_fts(texto) or '""'])
+        cond, params = _filtro_like(["v.destino"], texto)
+        return f" AND (t.numero_economico = ? OR (1=1 {cond}))", [texto] + params
+
+    def obtener_destinos_recientes(self, limite=300):
+        """ Destinos distintos de los últimos 'limite' viajes, el más reciente primero """
+        cursor = self._cursor()
+        cursor.execute("SELECT destino FROM viajes WHERE destino IS NOT NULL AND destino != '' ORDER BY id DESC LIMIT ?", (int(limite),))
+        return list(dict.fromkeys(fila['destino'] for fila in cursor.fetchall()))
+
+    @trazar("bd")
+    def buscar_viajes(self, texto, periodo="SIEMPRE", fecha_ref=None, limite=50, pagina=0):
+        """ Viajes cuyo destino coincide con 'texto', los más relevantes primero (bm25). Paginado. """
+        if not _palabras_busqueda(texto): return []
+        filtro, params = _filtro_periodo("v.fecha_hora_inicio", periodo, fecha_ref)
+        cursor = self._cursor()
+        if self.busqueda_fts:
+            cursor.execute(f"""
+                SELECT v.id, v.fecha_hora_inicio, t.numero_economico, v.destino, v.precio, v.tipo_servicio_id,
+                       f.rank AS relevancia
+                FROM viajes_fts f
+                JOIN viajes v ON v.id = f.rowid
+                JOIN taxis t ON t.id = v.taxi_id
+                WHERE viajes_fts MATCH ? {filtro}
+                ORDER BY f.rank, v.id DESC LIMIT ? OFFSET ?
+            """, [_consulta_fts(texto)] + params + [int(limite), int(pagina) * int(limite)])
+        else:
+            cond, params_l = _filtro_like(["v.destino"], texto)
+            cursor.execute(f"""
+                SELECT v.id, v.fecha_hora_inicio, t.numero_economico, v.destino, v.precio, v.tipo_servicio_id,
+                       0 AS relevancia
+                FROM viajes v JOIN taxis t ON t.id = v.taxi_id
+                WHERE 1=1 {cond} {filtro}
+                ORDER BY v.id DESC LIMIT ? OFFSET ?
+            """, params_l + params + [int(limite), int(pagina) * int(limite)])
+        return cursor.fetchall()
+
+    @trazar("bd")
+    def buscar_incidencias(self, texto, solo_historial=False, limite=50, pagina=0):
+        """
+        Incidencias por tipo, descripción u operadora (o número exacto de unidad), más relevantes primero.
+        solo_historial: excluye las PENDIENTES. Paginado.
+        """
+        texto = (texto or "").strip()
+        if not texto: return []
+        estado = " AND i.resuelto != 'PENDIENTE'" if solo_historial else ""
+        cursor = self._cursor()
+        columnas = "i.id, t.numero_economico, i.tipo, i.descripcion, i.monto, i.fecha_registro, i.resuelto, i.operador_id"
+        if self.busqueda_fts and _palabras_busqueda(texto):
+            # Unidad exacta primero; luego por relevancia (el tipo pesa el doble)
+            cursor.execute(f"""
+                SELECT {columnas}, relevancia FROM (
+                    SELECT i.id AS id_inc, -1e9 AS relevancia FROM incidencias i JOIN taxis t ON t.id = i.taxi_id
+                    WHERE t.numero_economico = ?
+                    UNION ALL
+                    SELECT rowid, bm25(incidencias_fts, 2.0, 1.0, 1.0) FROM incidencias_fts WHERE incidencias_fts MATCH ?
+                ) m
+                JOIN incidencias i ON i.id = m.id_inc
+                JOIN taxis t ON t.id = i.taxi_id
+                WHERE 1=1 {estado}
+                GROUP BY i.id
+                ORDER BY MIN(relevancia), i.fecha_registro DESC LIMIT ? OFFSET ?
+            """, [texto, _consulta_fts(texto), int(limite), int(pagina) * int(limite)])
+        else:
+            cond, params = _filtro_like(["i.tipo", "i.descripcion", "i.operador_id"], texto)
+            cursor.execute(f"""
+                SELECT {columnas}, 0 AS relevancia
+                FROM incidencias i JOIN taxis t ON t.id = i.taxi_id
+                WHERE (t.numero_economico = ? OR (1=1 {cond})) {estado}
+                ORDER BY i.fecha_registro DESC LIMIT ? OFFSET ?
+            """, [texto] + params + [int(limite), int(pagina) * int(limite)])
+        return cursor.fetchall()
+
     def registrar_incidencia(self, taxi_id, tipo, descripcion, monto, operador_id):
             try:
-                conn, cursor = self._conectar()
                 fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 estado = 'PENDIENTE' if monto > 0 else 'INFORMATIVO'
                 
-                cursor.execute("""
-                    INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (taxi_id, tipo, descripcion, monto, fecha, estado, operador_id))
-                
-                conn.commit()
-                conn.close()
+                with self.transaccion() as cursor:
+                    cursor.execute("""
+                        INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id) 
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (taxi_id, tipo, descripcion, monto, fecha, estado, operador_id))
                 return True
             except Exception as e:
                 return False
     
+    @trazar("bd")
     def obtener_incidencias_pendientes(self):
         """ 
         VERSIÓN CORREGIDA: Trae TODO (Monto > 0 y Monto = 0).
         Quitamos el filtro 'solo_deudores' para que la interfaz reciba las ausencias.
         """
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         
         # Simplemente traemos todo lo que esté PENDIENTE
         query = """
@@ -552,57 +1377,83 @@ class GestorBaseDatos:
         """
         cursor.execute(query)
         datos = cursor.fetchall()
-        conn.close()
         return datos
 
         
     def marcar_incidencia_pagada(self, incidencia_id):
         try:
-            conn, cursor = self._conectar()
-            cursor.execute("UPDATE incidencias SET resuelto='PAGADO' WHERE id=?", (incidencia_id,))
-            conn.commit()
-            conn.close()
+            with self.transaccion() as cursor:
+                cursor.execute("UPDATE incidencias SET resuelto='PAGADO' WHERE id=?", (incidencia_id,))
             return True
         except: return False
 
     def obtener_taxis_activos(self):
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         cursor.execute("SELECT * FROM taxis WHERE estado_sistema = 'ACTIVO'")
         res = cursor.fetchall()
-        conn.close()
         return res
 
+    @trazar("bd")
     def obtener_toda_la_flota(self):
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         cursor.execute("SELECT * FROM taxis")
         res = cursor.fetchall()
-        conn.close()
         return res
 
     def obtener_bases_fisicas(self):
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         cursor.execute("SELECT id, nombre_base FROM cat_bases WHERE id <= 13")
         res = cursor.fetchall()
-        conn.close()
         return res
         
     def obtener_id_por_numero(self, numero):
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         cursor.execute("SELECT id FROM taxis WHERE numero_economico = ?", (numero,))
         res = cursor.fetchone()
-        conn.close()
         return res['id'] if res else None
+
+    def obtener_taxi(self, taxi_id):
+        """ Fila completa del taxi (o None) """
+        cursor = self._cursor()
+        cursor.execute("SELECT * FROM taxis WHERE id = ?", (taxi_id,))
+        return cursor.fetchone()
     
     def eliminar_viaje(self, viaje_id):
-        conn, cursor = self._conectar()
-        cursor.execute("DELETE FROM viajes WHERE id=?", (viaje_id,))
-        conn.commit()
-        conn.close()
+        try:
+            with self.transaccion() as cursor:
+                cursor.execute("SELECT * FROM viajes WHERE id=?", (viaje_id,))
+                viaje = cursor.fetchone()
+                if not viaje: return False
+                cursor.execute("DELETE FROM viajes WHERE id=?", (viaje_id,))
+                self._sumar_viaje_resumen(cursor, viaje, signo=-1)
+            return True
+        except Exception as e:
+            print(f"Error al eliminar viaje: {e}")
+            return False
+
+    def actualizar_viaje(self, viaje_id, columna, valor):
+        """ Edición desde el historial (destino o precio). El resumen se ajusta en la misma transacción. """
+        columnas_editables = {"destino": str, "precio": float, "tipo_servicio_id": int, "base_salida_id": int}
+        if columna not in columnas_editables: return False
+        try:
+            valor = columnas_editables[columna](valor)
+            with self.transaccion() as cursor:
+                cursor.execute("SELECT * FROM viajes WHERE id=?", (viaje_id,))
+                viejo = cursor.fetchone()
+                if not viejo: return False
+                cursor.execute(f"UPDATE viajes SET {columna} = ? WHERE id = ?", (valor, viaje_id))
+                if columna != "destino":
+                    cursor.execute("SELECT * FROM viajes WHERE id=?", (viaje_id,))
+                    nuevo = cursor.fetchone()
+                    self._sumar_viaje_resumen(cursor, viejo, signo=-1)
+                    self._sumar_viaje_resumen(cursor, nuevo, signo=1)
+            return True
+        except Exception as e:
+            print(f"Error al actualizar viaje: {e}")
+            return False
 
     def calcular_banderola_del_dia(self):
-        conn, cursor = self._conectar()
         taxis = self.obtener_taxis_activos()
-        conn.close()
         taxis.sort(key=lambda x: int(x['numero_economico']))
         if not taxis: return "---"
         return taxis[(int(datetime.now().strftime("%j")) - 1) % len(taxis)]['numero_economico']
@@ -610,26 +1461,22 @@ class GestorBaseDatos:
     # Métodos de compatibilidad
     def registrar_nuevo_taxi(self, numero_economico, id_base_inicial=12):
         try:
-            conn, cursor = self._conectar()
-            
-            # === EL SEGURO ANTI-DUPLICADOS ===
-            cursor.execute("SELECT id FROM taxis WHERE numero_economico = ?", (numero_economico,))
-            if cursor.fetchone():
-                print(f"ALERTA: El taxi {numero_economico} ya existe. No se duplicará.")
-                conn.close()
-                return False # Devuelve Falso para avisar que no se pudo
-            # =================================
-
-            # Si no existe, procedemos a crearlo
-            fecha_alta = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            cursor.execute("""
-                INSERT INTO taxis (numero_economico, estado_sistema, fecha_alta, base_actual_id, fecha_movimiento)
-                VALUES (?, 'ACTIVO', ?, ?, ?)
-            """, (numero_economico, fecha_alta, id_base_inicial, fecha_alta))
-            
-            conn.commit()
-            conn.close()
+            with self.transaccion() as cursor:
+                # === EL SEGURO ANTI-DUPLICADOS ===
+                cursor.execute("SELECT id FROM taxis WHERE numero_economico = ?", (numero_economico,))
+                if cursor.fetchone():
+                    print(f"ALERTA: El taxi {numero_economico} ya existe. No se duplicará.")
+                    return False # Devuelve Falso para avisar que no se pudo
+                # =================================
+
+                # Si no existe, procedemos a crearlo
+                fecha_alta = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+                cursor.execute("""
+                    INSERT INTO taxis (numero_economico, estado_sistema, fecha_alta, base_actual_id, fecha_movimiento)
+                    VALUES (?, 'ACTIVO', ?, ?, ?)
+                """, (numero_economico, fecha_alta, id_base_inicial, fecha_alta))
+
             print(f"Taxi {numero_economico} registrado correctamente.")
             return True
             
@@ -640,86 +1487,55 @@ class GestorBaseDatos:
 
     def eliminar_taxi(self, taxi_id):
         try: 
-            conn, cursor = self._conectar()
-            cursor.execute("DELETE FROM taxis WHERE id=?", (taxi_id,))
-            conn.commit(); conn.close()
+            with self.transaccion() as cursor:
+                cursor.execute("DELETE FROM taxis WHERE id=?", (taxi_id,))
             return True
         except: return False
 
 
+    @trazar("bd")
     def obtener_top_taxis_admin(self, periodo, fecha_ref):
         """ 
         Genera los TOPS separados (Viajes y Horas) y cruza con historial de REPORTE.
         También prepara datos para gráficas.
         """
-        conn, cursor = self._conectar()
+        cursor = self._cursor()
         
         # Filtros de fecha
-        filtro_v = "" # Para viajes
-        filtro_i = "" # Para incidencias (fecha_registro)
-        filtro_t = "" # Para turnos (fecha_inicio)
-        
-        if periodo == "DIA": 
-            filtro_v = f"AND fecha_hora_inicio LIKE '{fecha_ref}%'"
-            filtro_i = f"AND fecha_registro LIKE '{fecha_ref}%'"
-            filtro_t = f"AND fecha_inicio LIKE '{fecha_ref}%'"
-        elif periodo == "MES": 
-            filtro_v = f"AND fecha_hora_inicio LIKE '{fecha_ref[:7]}%'"
-            filtro_i = f"AND fecha_registro LIKE '{fecha_ref[:7]}%'"
-            filtro_t = f"AND fecha_inicio LIKE '{fecha_ref[:7]}%'"
-        elif periodo == "AÑO": 
-            filtro_v = f"AND fecha_hora_inicio LIKE '{fecha_ref[:4]}%'"
-            filtro_i = f"AND fecha_registro LIKE '{fecha_ref[:4]}%'"
-            filtro_t = f"AND fecha_inicio LIKE '{fecha_ref[:4]}%'"
+        filtro_r, params_r = _filtro_periodo("fecha", periodo, fecha_ref)          # Para resumen diario
+        filtro_i, params_i = _filtro_periodo("fecha_registro", periodo, fecha_ref) # Para incidencias
 
         # 1. TOTAL GANADO (Dato global)
-        cursor.execute(f"SELECT SUM(precio) FROM viajes WHERE 1=1 {filtro_v}")
+        cursor.execute(f"SELECT SUM(ingresos) FROM resumen_diario WHERE 1=1 {filtro_r}", params_r)
         total_empresa = cursor.fetchone()[0] or 0.0
 
         # 2. PROCESAMIENTO POR UNIDAD (Para sacar los Tops)
-        # Obtenemos toda la flota activa para analizarla uno por uno
-        cursor.execute("SELECT id, numero_economico FROM taxis")
-        flota = cursor.fetchall()
-        
-        lista_rendimiento = []
-        
-        for taxi in flota:
-            tid = taxi['id']
-            num = taxi['numero_economico']
-            
-            # A) Conteo de Viajes y Dinero
-            cursor.execute(f"SELECT COUNT(*), SUM(precio) FROM viajes WHERE taxi_id=? {filtro_v}", (tid,))
-            res_v = cursor.fetchone()
-            viajes = res_v[0] or 0
-            dinero = res_v[1] or 0.0
-            
-            # B) Conteo de Reportes (Conducta) - ¡CRUCIAL!
-            cursor.execute(f"SELECT COUNT(*) FROM incidencias WHERE taxi_id=? {filtro_i}", (tid,))
-            reportes = cursor.fetchone()[0] or 0
-            
-            # C) Cálculo de Horas (Usamos la lógica existente)
-            # (Simplificada aquí para velocidad, idealmente reusar obtener_estadisticas_unidad)
-            horas = 0.0
-            cursor.execute(f"SELECT fecha_inicio, fecha_fin FROM turnos WHERE taxi_id=? {filtro_t}", (tid,))
-            turnos = cursor.fetchall()
-            for t in turnos:
-                try:
-                    ini = datetime.strptime(t['fecha_inicio'], "%Y-%m-%d %H:%M:%S")
-                    fin_str = t['fecha_fin']
-                    if fin_str:
-                        fin = datetime.strptime(fin_str, "%Y-%m-%d %H:%M:%S")
-                        horas += (fin - ini).total_seconds() / 3600
-                except: pass
-            
-            # Solo agregamos si trabajó algo (viajes u horas)
-            if viajes > 0 or horas > 0:
-                lista_rendimiento.append({
-                    "numero": num,
-                    "viajes": viajes,
-                    "dinero": dinero,
-                    "horas": horas,
-                    "reportes": reportes # <--- EL DATO DEL REGALO DE NAVIDAD
-                })
+        # Una sola consulta para toda la flota: viajes, dinero y horas (turnos cerrados)
+        # salen del resumen diario y los reportes de incidencias; todo se cruza contra taxis.
+        cursor.execute(f"""
+            WITH r AS (
+                SELECT taxi_id, SUM(viajes) AS viajes, SUM(ingresos) AS dinero,
+                       SUM(segundos_trabajados) / 3600.0 AS horas
+                FROM resumen_diario WHERE 1=1 {filtro_r} GROUP BY taxi_id
+            ),
+            i AS (
+                SELECT taxi_id, COUNT(*) AS reportes
+                FROM incidencias WHERE 1=1 {filtro_i} GROUP BY taxi_id
+            )
+            SELECT t.numero_economico AS numero,
+                   COALESCE(r.viajes, 0) AS viajes,
+                   COALESCE(r.dinero, 0.0) AS dinero,
+                   COALESCE(r.horas, 0.0) AS horas,
+                   COALESCE(i.reportes, 0) AS reportes
+            FROM taxis t
+            LEFT JOIN r ON r.taxi_id = t.id
+            LEFT JOIN i ON i.taxi_id = t.id
+            WHERE COALESCE(r.viajes, 0) > 0 OR COALESCE(r.horas, 0.0) > 0
+            ORDER BY t.id
+        """, params_r + params_i)
+
+        # Solo vienen los que trabajaron algo (viajes u horas)
+        lista_rendimiento = [dict(fila) for fila in cursor.fetchall()]
         
         # 3. GENERAR LOS TOPS
         # Top Viajes (Los más rápidos)
@@ -730,13 +1546,12 @@ class GestorBaseDatos:
 
         # 4. DATOS PARA GRÁFICA (Distribución de Servicios)
         cursor.execute(f"""
-            SELECT s.descripcion, COUNT(*) 
-            FROM viajes v JOIN cat_tipos_servicio s ON v.tipo_servicio_id = s.id 
-            WHERE 1=1 {filtro_v} GROUP BY s.descripcion
-        """)
+            SELECT s.descripcion, SUM(r.viajes) 
+            FROM resumen_diario r JOIN cat_tipos_servicio s ON r.tipo_servicio_id = s.id 
+            WHERE 1=1 {filtro_r} GROUP BY s.descripcion HAVING SUM(r.viajes) > 0
+        """, params_r)
         datos_grafica = cursor.fetchall() # [(Base, 10), (Telefono, 5)...]
 
-        conn.close()
         
         return {
             "total_empresa": total_empresa, 
@@ -747,12 +1562,8 @@ class GestorBaseDatos:
     
     def cambiar_estado_taxi(self, taxi_id, nuevo_estado):
         try:
-            # CORRECCIÓN: Recibimos conn Y cursor separados por coma
-            conn, cursor = self._conectar() 
-            
-            cursor.execute("UPDATE taxis SET estado_sistema = ? WHERE id = ?", (nuevo_estado, taxi_id))
-            conn.commit()
-            conn.close()
+            with self.transaccion() as cursor:
+                cursor.execute("UPDATE taxis SET estado_sistema = ? WHERE id = ?", (nuevo_estado, taxi_id))
             return True
         except Exception as e:
             print(f"Error al cambiar estado taxi: {e}")
@@ -762,16 +1573,17 @@ class GestorBaseDatos:
     # --- NUEVAS FUNCIONES PARA DERECHO DE PISO Y REPORTE UNIDAD ---
     def obtener_incidencias_globales_periodo(self, fecha_inicio, fecha_fin):
         try:
-            conn, c = self._conectar()
-            query = """
+            c = self._cursor()
+            filtro, params = _filtro_fechas("i.fecha_registro", fecha_inicio, fecha_fin)
+            query = f"""
                 SELECT t.numero_economico as unidad, i.tipo, i.descripcion, i.operador_id as operador, i.monto
                 FROM incidencias i
                 JOIN taxis t ON i.taxi_id = t.id
-                WHERE date(i.fecha_registro) BETWEEN ? AND ?
+                WHERE 1=1 {filtro}
                 AND i.resuelto NOT IN ('RESUELTO', 'PAGADO')
                 ORDER BY i.fecha_registro ASC
             """
-            c.execute(query, (fecha_inicio, fecha_fin))
+            c.execute(query, params)
             return [dict(row) for row in c.fetchall()]
         except Exception as e:
             print(f"Error al obtener incidencias globales: {e}")
@@ -780,7 +1592,7 @@ class GestorBaseDatos:
     def obtener_incidencias_por_unidad(self, taxi_id, periodo="SIEMPRE", fecha_ref=None):
         # Esta función busca multas, reportes y cuotas de un solo taxi
         try:
-            conn, c = self._conectar()
+            c = self._cursor()
             query = """
                 SELECT tipo, descripcion, monto, fecha_registro, resuelto 
                 FROM incidencias 
@@ -790,18 +1602,14 @@ class GestorBaseDatos:
             params = [taxi_id]
             
             # Filtro de fecha (igual que en los viajes)
-            if periodo == "DIA":
-                query += " AND date(fecha_registro) = ?"
-                params.append(fecha_ref)
-            elif periodo == "MES":
-                query += " AND strftime('%Y-%m', fecha_registro) = ?"
-                params.append(fecha_ref[:7]) # YYYY-MM
+            filtro, params_f = _filtro_periodo("fecha_registro", periodo, fecha_ref)
+            query += filtro
+            params += params_f
                 
             query += " ORDER BY fecha_registro DESC"
             
             c.execute(query, params)
             datos = c.fetchall()
-            conn.close()
             return datos
         except Exception as e:
             print(f"Error obteniendo incidencias unidad: {e}")
@@ -814,74 +1622,52 @@ class GestorBaseDatos:
     
     def obtener_config_piso(self):
         try:
-            conn, c = self._conectar()
-            # Creamos tabla si no existe al vuelo (por si acaso)
-            c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-            
-            c.execute("SELECT valor FROM configuracion WHERE clave='costo_piso'")
-            res = c.fetchone()
-            
-            if res:
-                return float(res['valor'])
-            else:
-                # Valor por defecto
-                c.execute("INSERT INTO configuracion (clave, valor) VALUES ('costo_piso', '150.0')")
-                conn.commit()
-                return 150.0
-            conn.close()
+            monto = self.config_decimal('costo_piso', None)
+            if monto is not None: return monto
+            # Valor por defecto
+            self.guardar_config({'costo_piso': '150.0'})
+            return 150.0
         except:
             return 150.0
 
     def guardar_config_piso(self, nuevo_monto):
         try:
-            conn, c = self._conectar()
-            c.execute("REPLACE INTO configuracion (clave, valor) VALUES ('costo_piso', ?)", (str(nuevo_monto),))
-            conn.commit(); conn.close()
+            self.guardar_config({'costo_piso': nuevo_monto})
             return True
         except: return False
 
     def obtener_fecha_ultimo_cobro(self):
         # Esta función lee la "memoria" para saber cuándo fue el último cobro
-        try:
-            conn, c = self._conectar()
-            # Aseguramos que la tabla exista
-            c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-            
-            c.execute("SELECT valor FROM configuracion WHERE clave='fecha_ultimo_piso'")
-            res = c.fetchone()
-            conn.close()
-            if res: return res['valor'] # Devuelve la fecha "2026-01-25"
-            return None # Nunca se ha cobrado
+        # Devuelve la fecha "2026-01-25" o None si nunca se ha cobrado
+        try: return self.config_texto('fecha_ultimo_piso')
         except: return None
 
+    @trazar("bd")
     def generar_cargos_piso_masivos(self):
         monto = self.obtener_config_piso() # Obtiene el precio (ej: 150)
         try:
-            conn, c = self._conectar()
-            
-            # 1. Obtenemos taxis activos
-            c.execute("SELECT id FROM taxis WHERE estado_sistema = 'ACTIVO'")
-            taxis = c.fetchall()
-            
-            ahora = datetime.now()
-            fecha_hora = ahora.strftime("%Y-%m-%d %H:%M:%S")
-            fecha_corta = ahora.strftime("%Y-%m-%d") # Solo fecha para el candado
-            
-            count = 0
-            # 2. Generamos la deuda a cada uno
-            for t in taxis:
-                c.execute("""
-                    INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id)
-                    VALUES (?, '💰 Derecho de Piso', 'Cuota operativa', ?, ?, 'PENDIENTE', 'SISTEMA')
-                """, (t['id'], monto, fecha_hora))
-                count += 1
-            
-            # 3. === AQUÍ ESTÁ LA MAGIA (MEMORIA) ===
-            # Guardamos que "hoy" se hizo el cobro
-            c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('fecha_ultimo_piso', ?)", (fecha_corta,))
-            # =======================================
-            
-            conn.commit(); conn.close()
+            with self.transaccion() as c:
+                # 1. Obtenemos taxis activos
+                c.execute("SELECT id FROM taxis WHERE estado_sistema = 'ACTIVO'")
+                taxis = c.fetchall()
+
+                ahora = datetime.now()
+                fecha_hora = ahora.strftime("%Y-%m-%d %H:%M:%S")
+                fecha_corta = ahora.strftime("%Y-%m-%d") # Solo fecha para el candado
+
+                count = 0
+                # 2. Generamos la deuda a cada uno
+                for t in taxis:
+                    c.execute("""
+                        INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id)
+                        VALUES (?, '💰 Derecho de Piso', 'Cuota operativa', ?, ?, 'PENDIENTE', 'SISTEMA')
+                    """, (t['id'], monto, fecha_hora))
+                    count += 1
+
+                # 3. === AQUÍ ESTÁ LA MAGIA (MEMORIA) ===
+                # Guardamos que "hoy" se hizo el cobro
+                self.guardar_config({'fecha_ultimo_piso': fecha_corta}, cursor=c)
+                # =======================================
             return count, monto
         except Exception as e:
             print(f"Error: {e}")
@@ -891,17 +1677,17 @@ class GestorBaseDatos:
     def marcar_incidencia_resuelta(self, id_incidencia):
         # Sirve para PAGAR o para REVISAR (Archivar)
         try:
-            conn, c = self._conectar()
-            # Cambiamos estado a RESUELTO (sirve para ambos casos)
-            c.execute("UPDATE incidencias SET resuelto = 'RESUELTO' WHERE id = ?", (id_incidencia,))
-            conn.commit(); conn.close()
+            with self.transaccion() as c:
+                # Cambiamos estado a RESUELTO (sirve para ambos casos)
+                c.execute("UPDATE incidencias SET resuelto = 'RESUELTO' WHERE id = ?", (id_incidencia,))
             return True
         except: return False
 
+    @trazar("bd")
     def obtener_historial_incidencias_filtro(self, texto="", fecha=None):
         # Búsqueda en el historial (YA NO PENDIENTES)
         try:
-            conn, c = self._conectar()
+            c = self._cursor()
             query = """
                 SELECT i.id, t.numero_economico, i.tipo, i.descripcion, i.monto, i.fecha_registro, i.resuelto, i.operador_id
                 FROM incidencias i
@@ -911,10 +1697,16 @@ class GestorBaseDatos:
             params = []
             
             if fecha:
-                query += " AND date(i.fecha_registro) = ?"
-                params.append(fecha)
+                filtro, params_f = _filtro_periodo("i.fecha_registro", "DIA", fecha)
+                query += filtro
+                params += params_f
             
-            if texto:
+            if texto and self.busqueda_fts and _palabras_busqueda(texto):
+                # Número de unidad (tabla chica) o el índice FTS de tipo/descripción/operadora
+                query += " AND (t.numero_economico LIKE ? OR i.id IN (SELECT rowid FROM incidencias_fts WHERE incidencias_fts MATCH ?))"
+                params.append(f"%{texto}%")
+                params.append(_consulta_fts(texto))
+            elif texto:
                 query += " AND (t.numero_economico LIKE ? OR i.tipo LIKE ?)"
                 params.append(f"%{texto}%")
                 params.append(f"%{texto}%")
@@ -923,26 +1715,17 @@ class GestorBaseDatos:
             
             c.execute(query, params)
             datos = c.fetchall()
-            conn.close()
             return datos
         except Exception as e:
             print(e); return []
         
     def obtener_costo_banderola(self):
-        try:
-            conn, c = self._conectar()
-            c.execute("SELECT valor FROM configuracion WHERE clave='costo_banderola'")
-            res = c.fetchone()
-            conn.close()
-            if res: return float(res['valor'])
-            return 50.0 # Valor por defecto si no existe
+        try: return self.config_decimal('costo_banderola', 50.0) # 50 por defecto si no existe
         except: return 50.0
 
     def guardar_costo_banderola(self, nuevo_monto):
         try:
-            conn, c = self._conectar()
-            c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('costo_banderola', ?)", (str(nuevo_monto),))
-            conn.commit(); conn.close()
+            self.guardar_config({'costo_banderola': nuevo_monto})
             return True
         except: return False
 
@@ -950,48 +1733,23 @@ class GestorBaseDatos:
     # ==========================================
     # SISTEMA DE BITÁCORA (PENDIENTES)
     # ==========================================
-    def crear_tabla_bitacora(self):
-        try:
-            conn = sqlite3.connect(self.nombre_base_datos)
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bitacora (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fecha TEXT,
-                    mensaje TEXT,
-                    estado TEXT,
-                    prioridad TEXT
-                )
-            ''')
-            conn.commit()
-            conn.close()
-        except: pass
-
     def agregar_nota_bitacora(self, mensaje, es_urgente=False):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        cursor = conn.cursor()
         prioridad = "URGENTE" if es_urgente else "NORMAL"
         fecha = datetime.now().strftime("%Y-%m-%d %H:%M")
-        cursor.execute("INSERT INTO bitacora (fecha, mensaje, estado, prioridad) VALUES (?, ?, ?, ?)",
-                       (fecha, mensaje, "PENDIENTE", prioridad))
-        conn.commit()
-        conn.close()
+        with self.transaccion() as cursor:
+            cursor.execute("INSERT INTO bitacora (fecha, mensaje, estado, prioridad) VALUES (?, ?, ?, ?)",
+                           (fecha, mensaje, "PENDIENTE", prioridad))
 
     def obtener_notas_pendientes(self):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        cursor = conn.cursor()
+        cursor = self._cursor()
         # Ordenamos: Primero las URGENTES, luego las más nuevas
         cursor.execute("SELECT id, fecha, mensaje, prioridad FROM bitacora WHERE estado = 'PENDIENTE' ORDER BY prioridad DESC, id DESC")
         notas = cursor.fetchall()
-        conn.close()
         return notas
 
     def completar_nota(self, id_nota):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE bitacora SET estado = 'HECHO' WHERE id = ?", (id_nota,))
-        conn.commit()
-        conn.close()
+        with self.transaccion() as cursor:
+            cursor.execute("UPDATE bitacora SET estado = 'HECHO' WHERE id = ?", (id_nota,))
 
 
     # ==========================================
@@ -999,82 +1757,59 @@ class GestorBaseDatos:
     # ==========================================
     def obtener_encargado_banderolas(self):
         """Retorna el número del taxi que toca hoy. Si cambia el día, avanza."""
-        conn = sqlite3.connect(self.nombre_base_datos)
-        c = conn.cursor()
-        
-        # 1. Asegurar tabla de config
-        c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-        
-        # 2. Obtener último guardado
-        c.execute("SELECT valor FROM configuracion WHERE clave='banderola_taxi'")
-        res_taxi = c.fetchone()
-        taxi_actual = int(res_taxi[0]) if res_taxi else 1 
-        
-        c.execute("SELECT valor FROM configuracion WHERE clave='banderola_fecha'")
-        res_fecha = c.fetchone()
-        fecha_guardada = res_fecha[0] if res_fecha else ""
-        
         fecha_hoy = datetime.now().strftime("%Y-%m-%d")
-        
-        # 3. Lógica de cambio de día
-        if fecha_guardada != fecha_hoy:
-            try:
-                # Usamos 'estado_sistema' que es la columna REAL de tu base de datos
-                c.execute("SELECT numero_economico FROM taxis WHERE estado_sistema='ACTIVO' ORDER BY CAST(numero_economico AS INTEGER)")
-                taxis = [int(row[0]) for row in c.fetchall() if row[0].isdigit()]
-            except:
-                taxis = []
-            
-            if not taxis: 
-                conn.close(); return 0 
-            
-            if taxi_actual in taxis:
-                idx = taxis.index(taxi_actual)
-                nuevo_idx = (idx + 1) % len(taxis)
-                nuevo_taxi = taxis[nuevo_idx]
-            else:
-                nuevo_taxi = taxis[0]
-                for t in taxis:
-                    if t > taxi_actual:
-                        nuevo_taxi = t
-                        break
-            
-            c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_taxi', ?)", (str(nuevo_taxi),))
-            c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_fecha', ?)", (fecha_hoy,))
-            conn.commit()
-            taxi_actual = nuevo_taxi
-            
-        conn.close()
-        return taxi_actual
 
-    def forzar_cambio_banderola(self, nuevo_numero):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        c = conn.cursor()
-        c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-        fecha_hoy = datetime.now().strftime("%Y-%m-%d")
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_taxi', ?)", (str(nuevo_numero),))
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_fecha', ?)", (fecha_hoy,))
-        conn.commit()
-        conn.close()
+        # Camino rápido: mismo día, se responde desde la caché
+        if self.config_texto('banderola_fecha', "") == fecha_hoy:
+            return self.config_entero('banderola_taxi', 1)
+
+        with self.transaccion() as c:
+            # 1. Obtener último guardado (dentro de la transacción, por si otro proceso ya avanzó)
+            c.execute("SELECT valor FROM configuracion WHERE clave='banderola_taxi'")
+            res_taxi = c.fetchone()
+            taxi_actual = int(res_taxi[0]) if res_taxi else 1 
 
+            c.execute("SELECT valor FROM configuracion WHERE clave='banderola_fecha'")
+            res_fecha = c.fetchone()
+            fecha_guardada = res_fecha[0] if res_fecha else ""
+
+            # 2. Lógica de cambio de día
+            if fecha_guardada != fecha_hoy:
+                try:
+                    # Usamos 'estado_sistema' que es la columna REAL de tu base de datos
+                    c.execute("SELECT numero_economico FROM taxis WHERE estado_sistema='ACTIVO' ORDER BY CAST(numero_economico AS INTEGER)")
+                    taxis = [int(row[0]) for row in c.fetchall() if row[0].isdigit()]
+                except:
+                    taxis = []
+
+                if not taxis: 
+                    return 0 
+
+                if taxi_actual in taxis:
+                    idx = taxis.index(taxi_actual)
+                    nuevo_idx = (idx + 1) % len(taxis)
+                    nuevo_taxi = taxis[nuevo_idx]
+                else:
+                    nuevo_taxi = taxis[0]
+                    for t in taxis:
+                        if t > taxi_actual:
+                            nuevo_taxi = t
+                            break
+
+                self.guardar_config({'banderola_taxi': nuevo_taxi, 'banderola_fecha': fecha_hoy}, cursor=c)
+                taxi_actual = nuevo_taxi
+
+        return taxi_actual
 
     def forzar_cambio_banderola(self, nuevo_numero):
         """Para corregir manualmente (ej. poner al 74 mañana)"""
-        conn = sqlite3.connect(self.nombre_base_datos)
-        c = conn.cursor()
-        c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
         fecha_hoy = datetime.now().strftime("%Y-%m-%d")
-        
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_taxi', ?)", (str(nuevo_numero),))
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('banderola_fecha', ?)", (fecha_hoy,))
-        conn.commit()
-        conn.close()
+        self.guardar_config({'banderola_taxi': nuevo_numero, 'banderola_fecha': fecha_hoy})
 
 
+    @trazar("bd")
     def obtener_resumen_periodo(self, tipo_periodo, fecha_inicio, fecha_fin=None):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        c = self._cursor()
         
         if not fecha_fin: fecha_fin = fecha_inicio
 
@@ -1167,7 +1902,6 @@ class GestorBaseDatos:
         c.execute("SELECT cb.nombre_base, COUNT(*) FROM viajes v JOIN cat_bases cb ON v.origen_base_id = cb.id WHERE date(v.fecha) BETWEEN ? AND ? GROUP BY cb.nombre_base", (fecha_inicio, fecha_fin))
         res['grafica_bases'] = c.fetchall()
 
-        conn.close()
         return res
     
 
@@ -1175,27 +1909,101 @@ class GestorBaseDatos:
     # TIEMPOS DE ESPERA BASES (SEMAFORO)
     # ==========================================
     def obtener_tiempos_limite(self):
-        """Devuelve diccionario con minutos límite. Default: Local=15, Foraneo=30"""
-        conn = sqlite3.connect(self.nombre_base_datos)
-        c = conn.cursor()
-        c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-        
-        c.execute("SELECT valor FROM configuracion WHERE clave='tiempo_local'")
-        r_local = c.fetchone()
-        t_local = int(r_local[0]) if r_local else 20 # Default 20 min
-        
-        c.execute("SELECT valor FROM configuracion WHERE clave='tiempo_foraneo'")
-        r_foraneo = c.fetchone()
-        t_foraneo = int(r_foraneo[0]) if r_foraneo else 45 # Default 45 min
-        
-        conn.close()
+        """Devuelve diccionario con minutos límite. Default: Local=20, Foraneo=45 (desde la caché)"""
+        t_local = self.config_entero('tiempo_local', 20)
+        t_foraneo = self.config_entero('tiempo_foraneo', 45)
         return {'local': t_local, 'foraneo': t_foraneo}
 
     def guardar_tiempos_limite(self, t_local, t_foraneo):
-        conn = sqlite3.connect(self.nombre_base_datos)
-        c = conn.cursor()
-        c.execute("CREATE TABLE IF NOT EXISTS configuracion (clave TEXT PRIMARY KEY, valor TEXT)")
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('tiempo_local', ?)", (str(t_local),))
-        c.execute("INSERT OR REPLACE INTO configuracion (clave, valor) VALUES ('tiempo_foraneo', ?)", (str(t_foraneo),))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        self.guardar_config({'tiempo_local': t_local, 'tiempo_foraneo': t_foraneo})
+
+# ==========================================
+# RESPALDO EN CALIENTE
+# ==========================================
+def respaldar_bd(origen, destino):
+    """
+    Copia consistente de la BD con la API de respaldo de SQLite.
+    En modo WAL los últimos cambios pueden vivir en el archivo -wal,
+    por eso ya NO sirve copiar el .db a mano.
+    """
+    src = sqlite3.connect(origen, timeout=10)
+    dst = sqlite3.connect(destino)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def respaldo_diario(ruta_db="taxis.db", carpeta="RESPALDOS_AUTO"):
+    """
+    Un respaldo por día: carpeta/taxis_backup_AAAA-MM-DD.db.
+    Devuelve la ruta creada, o None si no hay BD o el de hoy ya existe.
+    """
+    if not os.path.exists(ruta_db): return None
+    if not os.path.exists(carpeta):
+        os.makedirs(carpeta)
+        # Ocultar carpeta en Windows para que no la borren por error
+        try: ctypes.windll.kernel32.SetFileAttributesW(carpeta, 0x02) 
+        except: pass
+
+    # Nombre del archivo con fecha: taxis_backup_2026-01-25.db
+    fecha = datetime.now().strftime("%Y-%m-%d")
+    destino = os.path.join(carpeta, f"taxis_backup_{fecha}.db")
+    if os.path.exists(destino): return None
+    respaldar_bd(ruta_db, destino)
+    return destino
+
+
+# ==========================================
+# BENCHMARK DE PERFILES (python gestor_db.py)
+# ==========================================
+def medir_perfiles_almacenamiento(ruta_db="taxis.db", commits=200, lecturas=2000, perfiles=None):
+    """
+    Mide en ESTA máquina cuánto tarda un commit y cuántas lecturas por segundo
+    aguanta cada perfil. Usa una BD de prueba junto a ruta_db (mismo disco) y la borra al final.
+    Retorna {perfil: {"commit_ms": ..., "lecturas_s": ...}}
+    """
+    import time
+    carpeta = os.path.dirname(os.path.abspath(ruta_db))
+    resultados = {}
+
+    for perfil in (perfiles or PERFILES_ALMACENAMIENTO):
+        ruta = os.path.join(carpeta, f"_benchmark_{perfil.lower()}.db")
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(ruta + sufijo): os.remove(ruta + sufijo)
+
+        gc = GestorConexiones(ruta, perfil=perfil)
+        try:
+            with gc.transaccion() as c:
+                c.execute("CREATE TABLE viajes (id INTEGER PRIMARY KEY, taxi_id INTEGER, destino TEXT, precio REAL, fecha_hora_inicio TEXT)")
+
+            # 1. Latencia de commit (un viaje por transacción, como el despachador)
+            t0 = time.perf_counter()
+            for i in range(commits):
+                with gc.transaccion() as c:
+                    c.execute("INSERT INTO viajes (taxi_id, destino, precio, fecha_hora_inicio) VALUES (?, ?, ?, ?)",
+                              (i % 66 + 1, "Centro", 50.0, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            commit_ms = (time.perf_counter() - t0) * 1000 / commits
+
+            # 2. Lecturas por segundo (consulta corta tipo tablero)
+            lector = gc.lector()
+            t0 = time.perf_counter()
+            for i in range(lecturas):
+                lector.execute("SELECT COUNT(*), SUM(precio) FROM viajes WHERE taxi_id = ?", (i % 66 + 1,)).fetchone()
+            lecturas_s = lecturas / max(time.perf_counter() - t0, 1e-9)
+
+            resultados[perfil] = {"commit_ms": round(commit_ms, 3), "lecturas_s": round(lecturas_s, 1)}
+        finally:
+            gc.cerrar()
+            for sufijo in ("", "-wal", "-shm"):
+                try: os.remove(ruta + sufijo)
+                except OSError: pass
+
+    return resultados
+
+
+if __name__ == "__main__":
+    print("⏱️ Midiendo perfiles de almacenamiento...")
+    for nombre, r in medir_perfiles_almacenamiento().items():
+        print(f"  {nombre:<11} commit: {r['commit_ms']:>8.3f} ms   lecturas: {r['lecturas_s']:>10.1f} /s")
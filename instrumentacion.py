@@ -0,0 +1,313 @@
+"""
+Instrumentación de SQL para GestorBaseDatos (APAGADA por defecto, sin costo si no se usa).
+
+Se enciende con la variable de entorno TAXIS_SQL_INSTRUMENTAR=1 (umbral de lentas en
+TAXIS_SQL_LENTO_MS, default 200) o con GestorBaseDatos(..., instrumentar=True).
+
+- Cada sentencia queda en un buffer circular: texto (con parámetros, vía set_trace_callback),
+  duración, renglones devueltos, método público que la lanzó y acción de la interfaz.
+- Las que pasan del umbral van a DIAGNOSTICO/consultas_lentas.log (rotativo) con su EXPLAIN QUERY PLAN.
+- Conteo de consultas por acción y por método: un N+1 (un SELECT por taxi) se ve como
+  "60 consultas por vez" y la sentencia repetida aparece arriba en 'repetidas'.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+
+CARPETA_DIAGNOSTICO = "DIAGNOSTICO"
+
+# Métodos de GestorBaseDatos que no se envuelven (infraestructura, no consultas de negocio)
+METODOS_EXCLUIDOS = {"transaccion", "cerrar", "accion"}
+
+
+def instrumentacion_activada():
+    return os.environ.get("TAXIS_SQL_INSTRUMENTAR", "").strip().lower() in ("1", "si", "sí", "true")
+
+
+# ==========================================
+# CONEXIÓN Y CURSOR MEDIDOS
+# ==========================================
+class ConexionInstrumentada(sqlite3.Connection):
+    """ Conexión cuyos cursores se miden. conn.execute() de sqlite3 no pasa por cursor(): se redirige aquí. """
+    instrumentacion = None
+
+    def cursor(self, factory=None):
+        # Antes de conectar() (pragmas del perfil) los cursores son normales
+        return super().cursor(factory or (CursorInstrumentado if self.instrumentacion else sqlite3.Cursor))
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+
+class CursorInstrumentado(sqlite3.Cursor):
+    _registro = None
+
+    def execute(self, sql, parametros=()):
+        inst = self.connection.instrumentacion
+        inst._terminar(self)
+        inst._antes_de_ejecutar()
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            # rowcount: renglones tocados por INSERT/UPDATE/DELETE (-1 en SELECT)
+            inst._despues_de_ejecutar(self, sql, parametros, time.perf_counter() - t0, filas=max(self.rowcount, 0))
+
+    def executemany(self, sql, parametros):
+        inst = self.connection.instrumentacion
+        inst._terminar(self)
+        inst._antes_de_ejecutar()
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            inst._despues_de_ejecutar(self, sql, None, time.perf_counter() - t0, filas=max(self.rowcount, 0))
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        fila = super().fetchone()
+        self.connection.instrumentacion._leidas(self, 0 if fila is None else 1, time.perf_counter() - t0, fila is None)
+        return fila
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self.connection.instrumentacion._leidas(self, len(filas), time.perf_counter() - t0, not filas)
+        return filas
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        filas = super().fetchall()
+        self.connection.instrumentacion._leidas(self, len(filas), time.perf_counter() - t0, True)
+        return filas
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            self.connection.instrumentacion._leidas(self, 0, time.perf_counter() - t0, True)
+            raise
+        self.connection.instrumentacion._leidas(self, 1, time.perf_counter() - t0, False)
+        return fila
+
+    def __del__(self):
+        # Cursor abandonado a medio leer: igual se revisa si fue lento
+        try:
+            inst = self.connection.instrumentacion if self._registro else None
+            if inst: inst._terminar(self)
+        except Exception:
+            pass
+
+
+# ==========================================
+# INSTRUMENTACIÓN
+# ==========================================
+class InstrumentacionSQL:
+    def __init__(self, capacidad=2000, umbral_lento_ms=200.0, carpeta=CARPETA_DIAGNOSTICO,
+                 max_bytes=1_000_000, respaldos=3):
+        self.umbral_lento_ms = float(umbral_lento_ms)
+        self.carpeta = carpeta
+        self.registros = deque(maxlen=capacidad)
+        self._candado = threading.Lock()
+        self._local = threading.local()   # texto trazado, pila de métodos, acción actual
+        self.acciones = {}   # acción -> {'veces', 'consultas', 'ms', 'repetidas': Counter}
+        self.metodos = {}    # método -> {'llamadas', 'consultas', 'ms', 'max_ms'}
+        self.lentas = 0
+
+        # Log rotativo propio (no se mezcla con el logging de nadie más)
+        self.log_lentas = logging.getLogger(f"taxis.consultas_lentas.{id(self)}")
+        self.log_lentas.propagate = False
+        self.log_lentas.setLevel(logging.WARNING)
+        self._ruta_log = os.path.join(carpeta, "consultas_lentas.log")
+        self._max_bytes, self._respaldos = max_bytes, respaldos
+
+    @classmethod
+    def desde_entorno(cls):
+        try: umbral = float(os.environ.get("TAXIS_SQL_LENTO_MS", 200))
+        except ValueError: umbral = 200.0
+        return cls(umbral_lento_ms=umbral)
+
+    # --- Conexiones ---
+    def conectar(self, conn):
+        conn.instrumentacion = self
+        conn.set_trace_callback(self._trazar)
+
+    def _trazar(self, sql):
+        # Se llama dentro de execute, en el mismo hilo: nos quedamos con la primera sentencia
+        # (las de los triggers vienen con '--' adelante)
+        loc = self._local
+        if getattr(loc, "explicando", False) or sql.startswith("--"): return
+        if getattr(loc, "texto", None) is None: loc.texto = sql
+
+    # --- Contexto: método y acción ---
+    def _pila(self):
+        pila = getattr(self._local, "metodos", None)
+        if pila is None: pila = self._local.metodos = []
+        return pila
+
+    def envolver(self, nombre, metodo):
+        """ Decora un método público: lo cronometra y marca sus consultas con su nombre """
+        @wraps(metodo)
+        def medido(*args, **kwargs):
+            pila = self._pila()
+            pila.append([nombre, 0])
+            t0 = time.perf_counter()
+            try:
+                return metodo(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - t0) * 1000
+                _, consultas = pila.pop()
+                if pila: pila[-1][1] += consultas  # El que llamó también las cuenta
+                with self._candado:
+                    m = self.metodos.setdefault(nombre, {'llamadas': 0, 'consultas': 0, 'ms': 0.0, 'max_ms': 0.0})
+                    m['llamadas'] += 1; m['consultas'] += consultas; m['ms'] += ms
+                    m['max_ms'] = max(m['max_ms'], ms)
+        return medido
+
+    @contextmanager
+    def accion(self, nombre):
+        """ Agrupa las consultas de una acción de la interfaz (clic, refresco, arrastre...) """
+        anterior = getattr(self._local, "accion", None)
+        if anterior is not None:  # Acción dentro de acción: cuenta para la de afuera
+            yield; return
+        self._local.accion = nombre
+        with self._candado:
+            a = self.acciones.setdefault(nombre, {'veces': 0, 'consultas': 0, 'ms': 0.0, 'max_consultas': 0, 'repetidas': Counter()})
+            a['veces'] += 1
+        self._local.consultas_accion = 0
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            with self._candado:
+                a['ms'] += ms
+                a['max_consultas'] = max(a['max_consultas'], self._local.consultas_accion)
+            self._local.accion = None
+
+    # --- Registro de cada sentencia ---
+    def _antes_de_ejecutar(self):
+        self._local.texto = None
+
+    def _despues_de_ejecutar(self, cursor, sql, parametros, segundos, filas=0):
+        loc = self._local
+        pila = self._pila()
+        if pila: pila[-1][1] += 1
+        accion = getattr(loc, "accion", None)
+        registro = {
+            'momento': datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            'sql': " ".join((getattr(loc, "texto", None) or sql).split()),
+            'ms': segundos * 1000,
+            'filas': filas,
+            'metodo': pila[-1][0] if pila else None,
+            'accion': accion,
+            'hilo': threading.current_thread().name,
+        }
+        with self._candado:
+            self.registros.append(registro)
+            if accion is not None:
+                a = self.acciones[accion]
+                a['consultas'] += 1
+                a['repetidas'][" ".join(sql.split())[:200]] += 1
+        if accion is not None: loc.consultas_accion = getattr(loc, "consultas_accion", 0) + 1
+        cursor._registro = registro
+        cursor._sql_original, cursor._parametros = sql, parametros
+
+    def _leidas(self, cursor, filas, segundos, fin):
+        registro = cursor._registro
+        if registro is None: return
+        registro['filas'] += filas
+        registro['ms'] += segundos * 1000
+        if fin: self._terminar(cursor)
+
+    def _terminar(self, cursor):
+        """ La sentencia del cursor ya no va a leer más: si fue lenta, al log con su plan """
+        registro = cursor._registro
+        if registro is None: return
+        cursor._registro = None
+        if registro['ms'] < self.umbral_lento_ms: return
+        with self._candado: self.lentas += 1
+        plan = self._plan(cursor.connection, cursor._sql_original, cursor._parametros)
+        self._escribir_lenta(registro, plan)
+
+    def _plan(self, conn, sql, parametros):
+        primera = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if primera not in ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE") or parametros is None:
+            return []
+        self._local.explicando = True
+        try:
+            # Con la clase base: el EXPLAIN no se mide ni se registra
+            filas = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+            return [fila[3] for fila in filas]
+        except sqlite3.Error as e:
+            return [f"(sin plan: {e})"]
+        finally:
+            self._local.explicando = False
+
+    def _escribir_lenta(self, registro, plan):
+        if not self.log_lentas.handlers:
+            try:
+                os.makedirs(self.carpeta, exist_ok=True)
+                manejador = RotatingFileHandler(self._ruta_log, maxBytes=self._max_bytes,
+                                                backupCount=self._respaldos, encoding="utf-8")
+                manejador.setFormatter(logging.Formatter("%(message)s"))
+                self.log_lentas.addHandler(manejador)
+            except OSError:
+                return
+        self.log_lentas.warning(
+            f"[{registro['momento']}] {registro['ms']:.1f} ms, {registro['filas']} filas, "
+            f"método={registro['metodo']}, acción={registro['accion']}, hilo={registro['hilo']}\n"
+            f"    {registro['sql']}\n" + "".join(f"    PLAN: {p}\n" for p in plan)
+        )
+
+    # --- Consultar lo medido ---
+    def ultimas(self, n=50):
+        with self._candado: return list(self.registros)[-n:]
+
+    def resumen(self, top=3):
+        """ Por acción y por método: cuántas consultas, cuánto tiempo y qué sentencia se repite más """
+        with self._candado:
+            acciones = {
+                nombre: {
+                    'veces': a['veces'], 'consultas': a['consultas'],
+                    'consultas_por_vez': round(a['consultas'] / a['veces'], 1) if a['veces'] else 0,
+                    'max_consultas': a['max_consultas'], 'ms_por_vez': round(a['ms'] / a['veces'], 2) if a['veces'] else 0,
+                    'repetidas': a['repetidas'].most_common(top),
+                } for nombre, a in self.acciones.items()
+            }
+            metodos = {
+                nombre: {
+                    'llamadas': m['llamadas'], 'consultas_por_llamada': round(m['consultas'] / m['llamadas'], 1),
+                    'ms_promedio': round(m['ms'] / m['llamadas'], 2), 'max_ms': round(m['max_ms'], 2),
+                } for nombre, m in self.metodos.items()
+            }
+            return {'acciones': acciones, 'metodos': metodos, 'lentas': self.lentas,
+                    'umbral_lento_ms': self.umbral_lento_ms}
+
+    def guardar_resumen(self, ruta=None):
+        """ Escribe el resumen en DIAGNOSTICO/ (se llama al cerrar la BD) """
+        ruta = ruta or os.path.join(self.carpeta, f"consultas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        try:
+            os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump({'resumen': self.resumen(), 'ultimas': self.ultimas(200)}, f, ensure_ascii=False, indent=2)
+            return ruta
+        except OSError:
+            return None
+
+    def cerrar(self):
+        for manejador in list(self.log_lentas.handlers):
+            manejador.close(); self.log_lentas.removeHandler(manejador)
@@ -5,7 +5,11 @@ import traceback
 import sqlite3
 import ctypes
 import time
+import heapq
+import threading
+import functools
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import os
@@ -17,15 +21,21 @@ from PyQt6.QtWidgets import (
     QPushButton, QListWidgetItem, QDialog, QTableWidgetItem, 
     QComboBox, QDateEdit, QMessageBox, QFrame, QHeaderView,
     QLCDNumber, QStackedWidget, QSplashScreen, QFormLayout, QDialogButtonBox, QTableWidget,
-    QScrollArea, QTextEdit,QInputDialog, QCheckBox, QMenu
+    QScrollArea, QTextEdit,QInputDialog, QCheckBox, QMenu, QProgressBar, QTableView, QCompleter, QToolTip
+)
+from PyQt6.QtCore import (
+    Qt, QSize, QDate, QSharedMemory, QTimer, QTime, QThread, pyqtSignal, QObject, QRunnable, QThreadPool,
+    QAbstractTableModel, QModelIndex, QStringListModel, QEvent
 )
-from PyQt6.QtCore import Qt, QSize, QDate, QSharedMemory, QTimer, QTime
 from PyQt6.QtGui import QFont, QColor, QPixmap, QPainter, QBrush, QIcon, QPen, QCursor, QAction
 
 # === IMPORTS DE LIBRERÍAS GRÁFICAS Y REPORTE ===
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from gestor_db import GestorBaseDatos
+from gestor_db import GestorBaseDatos, respaldo_diario
+import trazas
+from trazas import trazar, tramo
+from perfilador import AplicacionPerfilable, crear_aplicacion
 from reportes import GeneradorPDF
 
 # ==========================================
@@ -48,6 +58,17 @@ def ruta_recurso(relativo):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relativo)
 
+def accion_bd(nombre):
+    """ Marca un método de la ventana como acción: con la instrumentación de SQL encendida
+    se cuentan juntas todas las consultas que dispara (ver instrumentacion.py) """
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envuelto(self, *args, **kwargs):
+            with self.db.accion(nombre):
+                return metodo(self, *args, **kwargs)
+        return envuelto
+    return decorador
+
 # ==========================================
 # 2. CLASES AUXILIARES (GRÁFICOS E ITEMS)
 # ==========================================
@@ -62,6 +83,7 @@ class LienzoGrafico(FigureCanvas):
         self.setParent(parent)
         self.setSizePolicy(self.sizePolicy().Policy.Expanding, self.sizePolicy().Policy.Expanding)
 
+    @trazar("ui")
     def actualizar_grafico(self, etiquetas, valores, tipo="dinero"):
         self.axes.clear()
         self.axes.set_facecolor(self.color_fondo)
@@ -86,8 +108,474 @@ class LienzoGrafico(FigureCanvas):
             self.axes.spines['left'].set_visible(False)
             self.axes.spines['bottom'].set_color('#334155')
 
-        self.fig.tight_layout()
-        self.draw()
+        with tramo("matplotlib.draw", "grafica", tipo=tipo):
+            self.fig.tight_layout()
+            self.draw()
+
+class CacheFichas:
+    """
+    Íconos de ficha ya dibujados, compartidos por todas las vistas que muestran unidades.
+    Llave: (numero, color, color_texto, tamaño, DPI). Al llenarse se tira el menos usado (LRU).
+    """
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self._iconos = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, numero, color_hex, texto_negro=False, size=85, dpr=None):
+        if dpr is None:
+            pantalla = QApplication.primaryScreen()
+            dpr = pantalla.devicePixelRatio() if pantalla else 1.0
+        llave = (str(numero), color_hex, "black" if texto_negro else "white", size, dpr)
+        icono = self._iconos.get(llave)
+        if icono is not None:
+            self._iconos.move_to_end(llave)
+            self.aciertos += 1
+            return icono
+
+        self.fallos += 1
+        icono = self._dibujar(llave)
+        self._iconos[llave] = icono
+        if len(self._iconos) > self.capacidad:
+            self._iconos.popitem(last=False)
+        return icono
+
+    def _dibujar(self, llave):
+        numero, color_hex, color_texto, size, dpr = llave
+        pixmap = QPixmap(int(size * dpr), int(size * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Fondo
+        color = QColor(color_hex)
+        painter.setBrush(QBrush(color))
+        painter.setPen(QPen(QColor("rgba(0,0,0,0.15)"), 1))
+        painter.drawRoundedRect(2, 2, size-4, size-4, 14, 14)
+        # Número
+        painter.setPen(QColor(color_texto))
+        font = QFont("Segoe UI", 22, QFont.Weight.Bold)
+        painter.setFont(font)
+        painter.drawText(0, 0, size, size, Qt.AlignmentFlag.AlignCenter, numero)
+        painter.end()
+        return QIcon(pixmap)
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {'iconos': len(self._iconos), 'aciertos': self.aciertos, 'fallos': self.fallos,
+                'tasa_aciertos': (self.aciertos / total) if total else 0.0}
+
+    def limpiar(self):
+        self._iconos.clear()
+
+CACHE_FICHAS = CacheFichas()
+
+class ProgramadorSemaforo:
+    """
+    Cola de prioridad con el PRÓXIMO cambio de color de cada taxi.
+    Reprogramar un taxi invalida su entrada anterior (se descarta al salir del montículo).
+    """
+    def __init__(self):
+        self._monticulo = [] # (vence, secuencia, taxi_id)
+        self._vigente = {}   # taxi_id -> secuencia de su única entrada válida
+        self._secuencia = 0
+
+    def programar(self, taxi_id, vence):
+        """ vence: datetime del próximo cambio, o None si el taxi ya no cambia de color """
+        self._secuencia += 1
+        if vence is None:
+            self._vigente.pop(taxi_id, None)
+            return
+        self._vigente[taxi_id] = self._secuencia
+        heapq.heappush(self._monticulo, (vence, self._secuencia, taxi_id))
+
+    def quitar(self, taxi_id):
+        self._vigente.pop(taxi_id, None)
+
+    def limpiar(self):
+        self._monticulo.clear(); self._vigente.clear()
+
+    def _depurar(self):
+        while self._monticulo and self._vigente.get(self._monticulo[0][2]) != self._monticulo[0][1]:
+            heapq.heappop(self._monticulo)
+
+    def proximo(self):
+        """ datetime del siguiente cambio pendiente (o None) """
+        self._depurar()
+        return self._monticulo[0][0] if self._monticulo else None
+
+    def vencidos(self, ahora):
+        """ Saca y devuelve los taxis cuyo cambio ya llegó """
+        listos = []
+        self._depurar()
+        while self._monticulo and self._monticulo[0][0] <= ahora:
+            _, _, taxi_id = heapq.heappop(self._monticulo)
+            del self._vigente[taxi_id]
+            listos.append(taxi_id)
+            self._depurar()
+        return listos
+
+class TrabajoMantenimiento(QThread):
+    """
+    Escrituras de mantenimiento fuera del hilo de la interfaz (el tablero solo lee).
+    Hoy: descansos vencidos -> Fuera de Servicio, con cierre de turno.
+    """
+    descansos_cerrados = pyqtSignal(list)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+
+    def run(self):
+        try:
+            movidos = self.db.cerrar_descansos_vencidos()
+        except Exception as e:
+            print(f"Error en mantenimiento: {e}")
+            return
+        if movidos: self.descansos_cerrados.emit(movidos)
+
+class _SenalesTarea(QObject):
+    # (canal, boleto, resultado) / (canal, boleto, error)
+    listo = pyqtSignal(str, int, object)
+    error = pyqtSignal(str, int, str)
+
+class _TareaConsulta(QRunnable):
+    def __init__(self, servicio, canal, boleto, funcion, args, kwargs):
+        super().__init__()
+        self.servicio = servicio
+        self.canal, self.boleto = canal, boleto
+        self.funcion, self.args, self.kwargs = funcion, args, kwargs
+        self.senales = _SenalesTarea()
+
+    def run(self):
+        # Si ya la reemplazó una más nueva ni siquiera empezamos
+        if not self.servicio.vigente(self.canal, self.boleto): return
+        self.servicio._registrar_hilo(self.canal, self.boleto)
+        try:
+            with self.servicio.db.accion(self.canal), tramo(f"consulta:{self.canal}", "hilo"):
+                resultado = self.funcion(*self.args, **self.kwargs)
+            self.senales.listo.emit(self.canal, self.boleto, resultado)
+        except Exception as e:
+            self.senales.error.emit(self.canal, self.boleto, str(e))
+        finally:
+            self.servicio._soltar_hilo(self.canal, self.boleto)
+
+class ServicioConsultas(QObject):
+    """
+    Corre consultas pesadas (reportes, historial, auditoría) en un pool de hilos.
+    Cada hilo usa su propia conexión de lectura (GestorConexiones.lector) y el resultado
+    regresa al hilo de la interfaz por señal. Por 'canal' solo vale la última petición:
+    las anteriores se descartan y, si siguen en SQLite, se interrumpen.
+    """
+    ocupado = pyqtSignal(bool)
+
+    def __init__(self, db, parent=None, hilos=2):
+        super().__init__(parent)
+        self.db = db
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(hilos)
+        self.pool.setExpiryTimeout(-1)  # Hilos fijos: cada hilo tiene su conexión de lectura (ver GestorConexiones.lector)
+        self._boletos = {}     # canal -> último boleto emitido
+        self._callbacks = {}   # (canal, boleto) -> (al_terminar, al_fallar)
+        self._en_sqlite = {}   # (canal, boleto) -> conexión de lectura del hilo
+        self._candado = threading.Lock()
+        self._contador = 0
+
+    def ejecutar(self, canal, funcion, *args, al_terminar=None, al_fallar=None, **kwargs):
+        with self._candado:
+            self._contador += 1
+            boleto = self._contador
+            self._boletos[canal] = boleto
+        self.cancelar(canal, conservar=boleto)
+        self._callbacks[(canal, boleto)] = (al_terminar, al_fallar)
+
+        tarea = _TareaConsulta(self, canal, boleto, funcion, args, kwargs)
+        tarea.senales.listo.connect(self._al_listo)
+        tarea.senales.error.connect(self._al_error)
+        self.pool.start(tarea)
+        self.ocupado.emit(True)
+        return boleto
+
+    def cancelar(self, canal, conservar=None):
+        """ Descarta las peticiones del canal (menos 'conservar') e interrumpe su consulta en curso """
+        for llave in [k for k in self._callbacks if k[0] == canal and k[1] != conservar]:
+            del self._callbacks[llave]
+        if conservar is None:
+            with self._candado: self._boletos.pop(canal, None)
+        with self._candado:
+            for (c, b), conn in self._en_sqlite.items():
+                if c == canal and b != conservar: conn.interrupt()
+        self._avisar_ocupado()
+
+    def vigente(self, canal, boleto):
+        with self._candado: return self._boletos.get(canal) == boleto
+
+    def _registrar_hilo(self, canal, boleto):
+        with self._candado: self._en_sqlite[(canal, boleto)] = self.db.conexiones.lector()
+
+    def _soltar_hilo(self, canal, boleto):
+        with self._candado: self._en_sqlite.pop((canal, boleto), None)
+
+    def _al_listo(self, canal, boleto, resultado):
+        callbacks = self._callbacks.pop((canal, boleto), None)
+        self._avisar_ocupado()
+        if callbacks and callbacks[0] and self.vigente(canal, boleto): callbacks[0](resultado)
+
+    def _al_error(self, canal, boleto, error):
+        callbacks = self._callbacks.pop((canal, boleto), None)
+        self._avisar_ocupado()
+        if not callbacks or not self.vigente(canal, boleto): return # Cancelada: el error es la interrupción
+        if callbacks[1]: callbacks[1](error)
+        else: print(f"Error en consulta '{canal}': {error}")
+
+    def _avisar_ocupado(self):
+        self.ocupado.emit(bool(self._callbacks))
+
+    def esperar(self, msegs=-1):
+        return self.pool.waitForDone(msegs)
+
+    def en_curso(self):
+        """ True mientras alguna petición vigente no haya entregado su resultado """
+        return bool(self._callbacks)
+
+class ModeloHistorial(QAbstractTableModel):
+    """
+    Historial de viajes para un QTableView, cargado por páginas conforme se hace scroll
+    (paginación por llave en la BD). El orden lo resuelve SQLite y las ediciones van directo a la BD.
+    """
+    COLUMNAS = ["ID","FECHA","HORA","UNIDAD","CONCEPTO","BASE","DESTINO","COSTO"]
+    ORDEN_COLUMNA = ["id", "fecha", "hora", "unidad", "concepto", "base", "destino", "precio"]
+    EDITABLES = {6: "destino", 7: "precio"}
+    SERVICIOS = {1:"Viaje Base", 2:"Tel Base", 3:"Tel Unidad", 4:"Aéreo"}
+
+    def __init__(self, db, consultas=None, tam_pagina=200, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.consultas = consultas
+        self.tam_pagina = tam_pagina
+        self.filtro = None
+        self.busqueda = None # Unidad exacta o palabras del destino (lo filtra SQLite)
+        self.orden = "id"
+        self.descendente = True
+        self._filas = []  # tuplas (clave_orden, id, fecha, hora, unidad, concepto, base, destino, precio)
+        self._fin = True
+
+    # --- Carga ---
+    def _convertir(self, d):
+        # Formato de Fecha y Hora
+        fh = str(d['fecha_hora_inicio']).split(" ")
+        f_date = fh[0]
+        h_time = fh[1][:5] if len(fh)>1 else ""
+        # Nombre de base o "////" si no tiene
+        nom_b = d['nombre_base'] if d['nombre_base'] else "////"
+        return (d['clave_orden'], d['id'], f_date, h_time, str(d['numero_economico']),
+                self.SERVICIOS.get(d['tipo_servicio_id'], "-"), str(nom_b or ""), str(d['destino'] or ""), d['precio'])
+
+    def _pedir_pagina(self, despues_de):
+        return self.db.obtener_pagina_historial(self.filtro, despues_de, self.tam_pagina, self.orden, self.descendente,
+                                                busqueda=self.busqueda)
+
+    def buscar(self, texto):
+        texto = (texto or "").strip()
+        if texto == (self.busqueda or ""): return
+        self.busqueda = texto or None
+        self.recargar()
+
+    def recargar(self, filtro=None):
+        """ Vuelve a la primera página (en segundo plano si hay ServicioConsultas) """
+        if filtro is not None: self.filtro = filtro
+        if self.filtro is None: return
+        self._fin = True # Nada de fetchMore mientras llega la primera página
+        if self.consultas:
+            self.consultas.ejecutar("historial", self._pedir_pagina, None, al_terminar=self._poner_primera_pagina)
+        else:
+            self._poner_primera_pagina(self._pedir_pagina(None))
+
+    def _poner_primera_pagina(self, filas):
+        self.beginResetModel()
+        self._filas = [self._convertir(d) for d in filas]
+        self._fin = len(filas) < self.tam_pagina
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._fin
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._fin or not self._filas: return
+        ultima = self._filas[-1]
+        filas = self._pedir_pagina((ultima[0], ultima[1]))
+        self._fin = len(filas) < self.tam_pagina
+        if not filas: return
+        inicio = len(self._filas)
+        self.beginInsertRows(QModelIndex(), inicio, inicio + len(filas) - 1)
+        self._filas.extend(self._convertir(d) for d in filas)
+        self.endInsertRows()
+
+    def sort(self, columna, orden=Qt.SortOrder.AscendingOrder):
+        self.orden = self.ORDEN_COLUMNA[columna]
+        self.descendente = (orden == Qt.SortOrder.DescendingOrder)
+        self.recargar()
+
+    # --- Lectura ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._filas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNAS)
+
+    def headerData(self, seccion, orientacion, rol=Qt.ItemDataRole.DisplayRole):
+        if rol == Qt.ItemDataRole.DisplayRole and orientacion == Qt.Orientation.Horizontal:
+            return self.COLUMNAS[seccion]
+        return None
+
+    def texto(self, fila, columna):
+        valor = self._filas[fila][columna + 1]
+        return str(valor)
+
+    def data(self, indice, rol=Qt.ItemDataRole.DisplayRole):
+        if not indice.isValid(): return None
+        if rol in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.texto(indice.row(), indice.column())
+        return None
+
+    def id_viaje(self, fila):
+        return self._filas[fila][1]
+
+    # --- Edición ---
+    def flags(self, indice):
+        banderas = super().flags(indice)
+        if indice.column() in self.EDITABLES: banderas |= Qt.ItemFlag.ItemIsEditable
+        return banderas
+
+    def setData(self, indice, valor, rol=Qt.ItemDataRole.EditRole):
+        if rol != Qt.ItemDataRole.EditRole or indice.column() not in self.EDITABLES: return False
+        columna = self.EDITABLES[indice.column()]
+        if not self.db.actualizar_viaje(self.id_viaje(indice.row()), columna, valor): return False
+        fila = list(self._filas[indice.row()])
+        fila[indice.column() + 1] = float(valor) if columna == "precio" else str(valor)
+        self._filas[indice.row()] = tuple(fila)
+        self.dataChanged.emit(indice, indice)
+        return True
+
+    def quitar_fila(self, fila):
+        self.beginRemoveRows(QModelIndex(), fila, fila)
+        del self._filas[fila]
+        self.endRemoveRows()
+
+class IndicePrefijos:
+    """ Trie en memoria: texto -> conjunto de valores. Búsqueda exacta o por prefijo en O(largo del texto) """
+    def __init__(self):
+        self._raiz = {}
+
+    def agregar(self, texto, valor):
+        nodo = self._raiz
+        for letra in texto.lower():
+            nodo = nodo.setdefault(letra, {})
+        nodo.setdefault(None, set()).add(valor)
+
+    def _nodo(self, texto):
+        nodo = self._raiz
+        for letra in texto.lower():
+            nodo = nodo.get(letra)
+            if nodo is None: return None
+        return nodo
+
+    def exacto(self, texto):
+        nodo = self._nodo(texto)
+        return set(nodo.get(None, ())) if nodo else set()
+
+    def con_prefijo(self, texto, limite=None):
+        nodo = self._nodo(texto)
+        encontrados = set()
+        pendientes = [nodo] if nodo else []
+        while pendientes:
+            actual = pendientes.pop()
+            for letra, hijo in actual.items():
+                if letra is None:
+                    encontrados |= hijo
+                    if limite and len(encontrados) >= limite: return encontrados
+                else:
+                    pendientes.append(hijo)
+        return encontrados
+
+    def limpiar(self):
+        self._raiz = {}
+
+class CompletadorPalabra(QCompleter):
+    """ Autocompletado que reemplaza solo la palabra que se está escribiendo, no todo el texto """
+    def pathFromIndex(self, indice):
+        sugerencia = super().pathFromIndex(indice)
+        texto = self.widget().text() if self.widget() else ""
+        if texto and not texto[-1].isspace():
+            texto = texto[:len(texto) - len(texto.split()[-1])]
+        return texto + sugerencia
+
+    def splitPath(self, ruta):
+        palabras = ruta.split()
+        return [palabras[-1] if palabras else ""]
+
+class ServicioBusqueda(QObject):
+    """
+    Buscador del encabezado: espera a que el usuario deje de teclear (debounce) y resuelve
+    con índices en memoria: número económico -> taxi_id y palabras de destinos recientes -> destino.
+    """
+    texto_listo = pyqtSignal(str)
+
+    def __init__(self, db, espera_ms=150, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.unidades = IndicePrefijos()
+        self.destinos = IndicePrefijos()
+        self._numeros = {}  # taxi_id -> número económico (para sugerir)
+        self._pendiente = ""
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(espera_ms)
+        self._timer.timeout.connect(lambda: self.texto_listo.emit(self._pendiente))
+
+    def escribir(self, texto):
+        """ Conectar a textChanged: reinicia la espera """
+        self._pendiente = texto
+        self._timer.start()
+
+    def indexar_unidades(self, flota):
+        """ Solo unidades ACTIVAS: son las que pueden aparecer en el tablero """
+        self.unidades.limpiar()
+        self._numeros = {}
+        for t in flota:
+            if t['estado_sistema'] != 'ACTIVO': continue
+            self.unidades.agregar(str(t['numero_economico']), t['id'])
+            self._numeros[t['id']] = str(t['numero_economico'])
+
+    def agregar_destino(self, destino):
+        for palabra in (destino or "").split():
+            self.destinos.agregar(palabra, destino)
+
+    def indexar_destinos_recientes(self, limite=300):
+        self.destinos.limpiar()
+        for destino in self.db.obtener_destinos_recientes(limite):
+            self.agregar_destino(destino)
+
+    def taxis_que_coinciden(self, texto):
+        """ ids con número económico EXACTO ("35" no trae al "350"); None = sin filtro """
+        texto = (texto or "").strip()
+        if not texto: return None
+        return self.unidades.exacto(texto)
+
+    def sugerir_unidades(self, texto, limite=10):
+        """ Números económicos que empiezan con la última palabra escrita (sin el que ya está completo) """
+        palabras = (texto or "").split()
+        if not palabras: return []
+        numeros = {self._numeros[i] for i in self.unidades.con_prefijo(palabras[-1]) if i in self._numeros}
+        numeros.discard(palabras[-1])
+        return sorted(numeros, key=lambda n: (len(n), n))[:limite]
+
+    def sugerir_destinos(self, texto, limite=10):
+        """ Destinos recientes que tienen una palabra que empieza con la última palabra escrita """
+        palabras = (texto or "").split()
+        if not palabras: return []
+        return sorted(self.destinos.con_prefijo(palabras[-1], limite))[:limite]
 
 class TaxiItem(QListWidgetItem):
     def __lt__(self, other):
@@ -197,7 +685,7 @@ class PanelBitacora(QWidget):
 # ==========================================
 
 class VentanaPrincipal(QMainWindow):
-    def __init__(self):
+    def __init__(self, ruta_db="taxis.db"):
         super().__init__()
         self.setWindowTitle("Taxis El Zorro")
         ruta_ico = ruta_recurso("IconoElZorropng.ico")
@@ -206,9 +694,25 @@ class VentanaPrincipal(QMainWindow):
         self.bases_ocultas = set()
         self.cargando_datos = False
         
-        self.db = GestorBaseDatos("taxis.db")
+        self.db = GestorBaseDatos(ruta_db)
         self.listas_bases = {}
 
+        # Consultas pesadas fuera del hilo de la interfaz + indicador de "trabajando"
+        self.consultas = ServicioConsultas(self.db, self)
+        self.barra_ocupado = QProgressBar(); self.barra_ocupado.setRange(0, 0)
+        self.barra_ocupado.setFixedWidth(160); self.barra_ocupado.setMaximumHeight(14); self.barra_ocupado.setTextVisible(False)
+        self.barra_ocupado.setToolTip("Consultando base de datos...")
+        self.barra_ocupado.hide()
+        self.statusBar().addPermanentWidget(self.barra_ocupado)
+        self.statusBar().setStyleSheet("QStatusBar { background-color: #0F172A; color: #94A3B8; }")
+        self.consultas.ocupado.connect(self.barra_ocupado.setVisible)
+
+        # Buscador del encabezado: debounce + índices en memoria (unidades y destinos recientes)
+        self.busqueda = ServicioBusqueda(self.db, parent=self)
+        self.busqueda.indexar_unidades(self.db.obtener_toda_la_flota())
+        self.busqueda.indexar_destinos_recientes()
+        self.busqueda.texto_listo.connect(self.busqueda_unificada)
+
         # === ESTILOS COMPLETOS (Aquí estaba el error de los "...") ===
         self.setStyleSheet("""
             QMainWindow, QWidget { background-color: #0F172A; color: #E2E8F0; font-family: 'Segoe UI', sans-serif; }
@@ -234,15 +738,32 @@ class VentanaPrincipal(QMainWindow):
         self.tabs.addTab(self.tab_bitacora, "📝 BITÁCORA Y PENDIENTES")
         
         # 3. Administración
-        tab_admin = QWidget()
+        self.tab_admin = tab_admin = QWidget()
         self.init_admin(tab_admin)
         self.tabs.addTab(tab_admin, "ADMINISTRACIÓN")
         
         # Iniciar datos
-        self.cargar_datos_en_tablero()
+        # Semáforo por eventos: un solo timer que despierta en el próximo cambio de color
+        self.semaforo = ProgramadorSemaforo()
+        self.fichas_semaforo = {} # taxi_id -> (numero, id_base, fecha_movimiento)
         self.timer_semaforo = QTimer(self)
-        self.timer_semaforo.timeout.connect(self.cargar_datos_en_tablero)
-        self.timer_semaforo.start(60000)
+        self.timer_semaforo.setSingleShot(True)
+        self.timer_semaforo.timeout.connect(self.atender_semaforo)
+
+        # Mantenimiento en segundo plano (descansos vencidos); avisa al tablero al terminar
+        self.trabajo_mantenimiento = TrabajoMantenimiento(self.db, self)
+        self.trabajo_mantenimiento.descansos_cerrados.connect(lambda ids: self.cargar_datos_en_tablero())
+        self.timer_mantenimiento = QTimer(self)
+        self.timer_mantenimiento.timeout.connect(self.lanzar_mantenimiento)
+        self.timer_mantenimiento.start(60000)
+
+        self.cargar_datos_en_tablero()
+        self.lanzar_mantenimiento()
+
+        # Red de seguridad: cambios hechos fuera de esta ventana (el refresco es incremental)
+        self.timer_refresco = QTimer(self)
+        self.timer_refresco.timeout.connect(self.cargar_datos_en_tablero)
+        self.timer_refresco.start(300000)
         
 
     def init_tablero(self, tab):
@@ -261,7 +782,12 @@ class VentanaPrincipal(QMainWindow):
         self.txt_buscar_taxi.setPlaceholderText("🔍 Buscar unidad...")
         self.txt_buscar_taxi.setFixedWidth(200)
         self.txt_buscar_taxi.setStyleSheet("background-color: #1E293B; border: 2px solid #00D1FF; border-radius: 8px; color: white; font-weight: bold;")
-        self.txt_buscar_taxi.textChanged.connect(self.busqueda_unificada)
+        self.txt_buscar_taxi.textChanged.connect(self.busqueda.escribir)
+        # Autocompletado: unidades en el tablero, destinos recientes en el historial (ver actualizar_sugerencias)
+        self.modelo_sugerencias = QStringListModel(self)
+        self.completador_destinos = CompletadorPalabra(self.modelo_sugerencias, self)
+        self.completador_destinos.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.txt_buscar_taxi.setCompleter(self.completador_destinos)
         lc.addWidget(self.txt_buscar_taxi)
         
         self.tabs.setCornerWidget(container_buscador, Qt.Corner.TopRightCorner)
@@ -308,6 +834,7 @@ class VentanaPrincipal(QMainWindow):
             
             lista.model().rowsInserted.connect(lambda p, f, l, w=lista: self.detectar_cambio_base(w, f))
             lista.dropEvent = lambda event, l=lista: self.evento_drop_especial(event, l)
+            lista.viewport().installEventFilter(self)  # Tooltip con los minutos al momento (ver eventFilter)
             self.listas_bases[id_bd] = lista
             l.addWidget(lbl); l.addWidget(lista)
             layout_derecha_grid.addWidget(caja, fila, col, 1, span)
@@ -480,6 +1007,8 @@ class VentanaPrincipal(QMainWindow):
     # LÓGICA DE TABLERO: FICHAS Y MOVIMIENTO
     # ==========================================
 
+    @trazar("ui")
+    @accion_bd("generar_bases_fisicas")
     def generar_bases_fisicas(self):
         # 1. LIMPIEZA PROFUNDA (Esto arregla el crash)
         # Primero borramos los widgets de la pantalla
@@ -542,6 +1071,7 @@ class VentanaPrincipal(QMainWindow):
             """)
 
             # Registramos la nueva lista viva
+            lista.viewport().installEventFilter(self)  # Tooltip con los minutos al momento (ver eventFilter)
             self.listas_bases[id_base] = lista
             l.addWidget(lista)
             self.grid_bases.addWidget(caja, fila, columna)
@@ -551,111 +1081,265 @@ class VentanaPrincipal(QMainWindow):
                 columna = 0; fila += 1
 
 
+    # --- FABRICANTE DE FICHAS ---
+    def crear_chip_visual(self, numero, color_hex, texto_negro=False):
+        # Se dibuja una sola vez por combinación (ver CacheFichas)
+        return CACHE_FICHAS.obtener(numero, color_hex, texto_negro)
+
+    def leer_limites_semaforo(self):
+        try:
+            limites = self.db.obtener_tiempos_limite()
+            return limites['local'], limites['foraneo']   # Ej: 20, 45
+        except:
+            return 20, 45 # Default de emergencia
+
+    def minutos_en_base(self, taxi, ahora):
+        if taxi['fecha_movimiento']:
+            try:
+                dt_mov = datetime.strptime(taxi['fecha_movimiento'], "%Y-%m-%d %H:%M:%S")
+                return (ahora - dt_mov).total_seconds() / 60
+            except: pass
+        return 0
+
+    def color_semaforo(self, bid, minutos, LIMITE_LOCAL, LIMITE_FORANEO):
+        """ (color_hex, texto_negro, tooltip) de la ficha según la base y los minutos en ella """
+        # Configuración por defecto (Amarillo Taxi)
+        color_hex = "#FACC15" 
+        texto_negro = True    
+        tooltip_txt = "En tiempo"
+
+        # A) LOCAL (Usamos LIMITE_LOCAL)
+        if bid == 93: # Local
+            if minutos > (LIMITE_LOCAL + 10): # Rojo si pasa 10 min del límite
+                color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "⚠️ DEMORA CRÍTICA"
+            elif minutos > LIMITE_LOCAL:      # Naranja si llegó al límite
+                color_hex = "#F97316"; texto_negro = True; tooltip_txt = "⏳ Retraso Leve"
+
+        # B) FORÁNEO (Usamos LIMITE_FORANEO)
+        elif bid == 92: # Foráneo
+            if minutos > (LIMITE_FORANEO + 15): # Rojo si pasa 15 min del límite
+                color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "⚠️ URGENTE SALIDA"
+            elif minutos > LIMITE_FORANEO:      # Naranja
+                color_hex = "#F97316"; texto_negro = True; tooltip_txt = "⏳ Retraso Leve"
+
+        # C) DESCANSO (Reglas fijas o puedes crear config para esto también)
+        elif bid == 91: 
+            if minutos > 90:
+                color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "Exceso Descanso"
+            elif minutos > 60:
+                color_hex = "#F97316"; texto_negro = True; tooltip_txt = "Tiempo Límite Descanso"
+
+        return color_hex, texto_negro, tooltip_txt
+
+    def umbrales_semaforo(self, bid, LIMITE_LOCAL, LIMITE_FORANEO):
+        """ Minutos en base donde cambia el color (mismas reglas que color_semaforo; 180 = auto-cierre de descanso) """
+        if bid == 93: return [LIMITE_LOCAL, LIMITE_LOCAL + 10]
+        if bid == 92: return [LIMITE_FORANEO, LIMITE_FORANEO + 15]
+        if bid == 91: return [60, 90, 180]
+        return []
+
+    def proximo_cambio_semaforo(self, bid, minutos, fecha_movimiento, limites):
+        """ datetime exacto del siguiente cambio de color de la ficha (None si ya no cambia) """
+        if not fecha_movimiento: return None
+        try: dt_mov = datetime.strptime(fecha_movimiento, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError): return None
+        for umbral in self.umbrales_semaforo(bid, *limites):
+            if minutos <= umbral:
+                # Un segundo después del umbral: las reglas usan 'minutos > límite'
+                return dt_mov + timedelta(minutes=umbral, seconds=1)
+        return None
+
+    def seguir_ficha(self, taxi, bid, minutos, limites):
+        """ Registra la ficha en el semáforo y agenda su próximo cambio """
+        self.fichas_semaforo[taxi['id']] = (taxi['numero_economico'], bid, taxi['fecha_movimiento'])
+        self.semaforo.programar(taxi['id'], self.proximo_cambio_semaforo(bid, minutos, taxi['fecha_movimiento'], limites))
+
+    def reprogramar_timer_semaforo(self):
+        proximo = self.semaforo.proximo()
+        if proximo is None:
+            self.timer_semaforo.stop(); return
+        espera = (proximo - datetime.now()).total_seconds()
+        # Tope de una hora: QTimer usa int en milisegundos
+        self.timer_semaforo.start(int(min(max(espera, 0), 3600) * 1000))
+
+    def lanzar_mantenimiento(self):
+        if not self.trabajo_mantenimiento.isRunning():
+            self.trabajo_mantenimiento.start()
+
+    @trazar("ui")
+    @accion_bd("semaforo")
+    def atender_semaforo(self):
+        """ Despertó el timer: repinta solo las fichas cuyo color acaba de cambiar """
+        ahora = datetime.now()
+        vencidos = self.semaforo.vencidos(ahora)
+        if not vencidos:
+            self.reprogramar_timer_semaforo(); return
+
+        limites = self.leer_limites_semaforo()
+        items = {}
+        for lista in self.listas_bases.values():
+            for i in range(lista.count()):
+                it = lista.item(i)
+                items[it.data(Qt.ItemDataRole.UserRole)] = it
+
+        for taxi_id in vencidos:
+            datos = self.fichas_semaforo.get(taxi_id)
+            item = items.get(taxi_id)
+            if not datos or item is None: continue
+            numero, bid, fecha_mov = datos
+            taxi = {'id': taxi_id, 'numero_economico': numero, 'fecha_movimiento': fecha_mov}
+            minutos = self.minutos_en_base(taxi, ahora)
+
+            # Auto-cierre por descanso excesivo: lo hace el trabajo de mantenimiento
+            if bid == 91 and minutos > 180:
+                self.lanzar_mantenimiento(); continue
+
+            self.cargando_datos = True
+            self.pintar_ficha(item, taxi, bid, minutos, limites)
+            self.cargando_datos = False
+            self.seguir_ficha(taxi, bid, minutos, limites)
+
+        self.reprogramar_timer_semaforo()
+
+    def pintar_ficha(self, item, taxi, bid, minutos, limites):
+        """
+        Aplica ícono, tooltip y datos de un taxi a un item (nuevo o ya existente).
+        El item guarda lo último que se le pintó (UserRole + 1), así solo se redibuja si cambió el color.
+        """
+        num_taxi = str(taxi['numero_economico'])
+        color_hex, texto_negro, tooltip_txt = self.color_semaforo(bid, minutos, *limites)
+        huella = f"{num_taxi}|{color_hex}|{int(texto_negro)}"
+        if item.data(Qt.ItemDataRole.UserRole + 1) != huella:
+            item.setIcon(self.crear_chip_visual(num_taxi, color_hex, texto_negro))
+            item.setData(Qt.ItemDataRole.UserRole, taxi['id'])
+            item.setData(Qt.ItemDataRole.UserRole + 1, huella)
+            item.setText(num_taxi); item.setForeground(QColor("transparent"))
+            item.setSizeHint(QSize(90, 90))
+        tooltip = self.texto_tooltip_ficha(num_taxi, tooltip_txt, minutos)
+        if item.toolTip() != tooltip: item.setToolTip(tooltip)
+
+    @staticmethod
+    def texto_tooltip_ficha(num_taxi, estado, minutos):
+        return f"Unidad {num_taxi}\n{estado}\n⏱️ {int(minutos)} min en base"
+
+    def eventFilter(self, objeto, evento):
+        """
+        Tooltips de las fichas: los minutos se calculan al mostrarse (el repintado solo ocurre
+        cuando cambia el color, así que el texto guardado en la ficha puede estar atrasado).
+        """
+        if evento.type() == QEvent.Type.ToolTip:
+            lista = objeto.parent()
+            if isinstance(lista, QListWidget) and lista.viewport() is objeto:
+                item = lista.itemAt(evento.pos())
+                datos = self.fichas_semaforo.get(item.data(Qt.ItemDataRole.UserRole)) if item else None
+                if datos:
+                    numero, bid, fecha_mov = datos
+                    minutos = self.minutos_en_base({'fecha_movimiento': fecha_mov}, datetime.now())
+                    _, _, estado = self.color_semaforo(bid, minutos, *self.leer_limites_semaforo())
+                    QToolTip.showText(evento.globalPos(), self.texto_tooltip_ficha(numero, estado, minutos), objeto)
+                    return True
+        return super().eventFilter(objeto, evento)
+
+    @staticmethod
+    def _clave_numerica_ficha(item):
+        try: return (0, int(item.text()), "")
+        except ValueError: return (1, 0, item.text())
+
+    def _ordenar_lista_tablero(self, lista, items):
+        """ Deja 'lista' con exactamente 'items' en ese orden, moviendo solo los que están fuera de lugar """
+        for pos, item in enumerate(items):
+            fila = lista.row(item)
+            if fila == pos: continue
+            if fila >= 0: lista.takeItem(fila)
+            lista.insertItem(pos, item)
+        while lista.count() > len(items):
+            lista.takeItem(lista.count() - 1)
+
+    def _ordenar_por_numero(self, lista):
+        """ Orden numérico de una caja especial. No usa sortItems: el item que suelta Qt es un QListWidgetItem y compara como texto """
+        items = sorted((lista.item(i) for i in range(lista.count())), key=self._clave_numerica_ficha)
+        self.cargando_datos = True
+        self._ordenar_lista_tablero(lista, items)
+        self.cargando_datos = False
+
+    @trazar("ui")
+    @accion_bd("refresco_tablero")
     def cargar_datos_en_tablero(self):
+        """
+        Refresco INCREMENTAL del tablero: compara lo que hay en pantalla contra la BD
+        y solo mueve, repinta, agrega o quita las fichas que cambiaron.
+        """
         self.cargando_datos = True
 
-        # --- FABRICANTE DE FICHAS (Función interna) ---
-        def crear_chip_visual(numero, color_hex, texto_negro=False):
-            size = 85
-            pixmap = QPixmap(size, size)
-            pixmap.fill(Qt.GlobalColor.transparent)
-            painter = QPainter(pixmap)
-            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            # Fondo
-            color = QColor(color_hex)
-            painter.setBrush(QBrush(color))
-            painter.setPen(QPen(QColor("rgba(0,0,0,0.15)"), 1))
-            painter.drawRoundedRect(2, 2, size-4, size-4, 14, 14)
-            # Número
-            painter.setPen(QColor("black") if texto_negro else QColor("white"))
-            font = QFont("Segoe UI", 22, QFont.Weight.Bold)
-            painter.setFont(font)
-            painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, str(numero))
-            painter.end()
-            return QIcon(pixmap)
-
-        # 1. LIMPIEZA VISUAL
+        # 1. LO QUE HAY EN PANTALLA (la verdad son las listas: un drop de Qt crea items nuevos)
+        en_pantalla = {} # taxi_id -> (id_base, item)
         for id_base, lista in self.listas_bases.items():
-            lista.clear()
-            lista.setStyleSheet("QListWidget { background: transparent; border: none; }")
-            lista.setIconSize(QSize(85, 85)); lista.setSpacing(4)
+            if not lista.property("tablero_listo"):
+                lista.setStyleSheet("QListWidget { background: transparent; border: none; }")
+                lista.setIconSize(QSize(85, 85)); lista.setSpacing(4)
+                lista.setProperty("tablero_listo", True)
+            for i in reversed(range(lista.count())):
+                item = lista.item(i)
+                taxi_id = item.data(Qt.ItemDataRole.UserRole)
+                if taxi_id is None or taxi_id in en_pantalla:
+                    lista.takeItem(i) # Ficha huérfana o duplicada
+                else:
+                    en_pantalla[taxi_id] = (id_base, item)
 
         # 2. OBTENER DATOS (Aquí está el cambio 1: Leemos la configuración)
         taxis = self.db.obtener_taxis_activos()
         
         # === NUEVO: LEER TIEMPOS CONFIGURADOS ===
-        try:
-            limites = self.db.obtener_tiempos_limite()
-            LIMITE_LOCAL = limites['local']       # Ej: 20
-            LIMITE_FORANEO = limites['foraneo']   # Ej: 45
-        except:
-            LIMITE_LOCAL = 20; LIMITE_FORANEO = 45 # Default de emergencia
+        limites = self.leer_limites_semaforo()
         # ========================================
 
         # Ordenar por antigüedad (el más viejo primero)
         taxis.sort(key=lambda x: x['fecha_movimiento'] if x['fecha_movimiento'] else "9999-99-99")
         ahora = datetime.now()
 
-        # 3. CONSTRUIR FICHAS
+        # 3. ESTADO DESEADO POR LISTA
+        deseado = {id_base: [] for id_base in self.listas_bases}
         for taxi in taxis:
             bid = taxi['base_actual_id']
             if bid in self.listas_bases:
-                num_taxi = str(taxi['numero_economico'])
-                
-                # Configuración por defecto (Amarillo Taxi)
-                color_hex = "#FACC15" 
-                texto_negro = True    
-                tooltip_txt = "En tiempo"
-
-                # Calcular minutos en base
-                minutos = 0
-                if taxi['fecha_movimiento']:
-                    try:
-                        dt_mov = datetime.strptime(taxi['fecha_movimiento'], "%Y-%m-%d %H:%M:%S")
-                        minutos = (ahora - dt_mov).total_seconds() / 60
-                    except: pass
-
-                # --- SEMÁFORO INTELIGENTE (Aquí está el cambio 2) ---
-
-                # A) LOCAL (Usamos LIMITE_LOCAL)
-                if bid == 93: # Local
-                    if minutos > (LIMITE_LOCAL + 10): # Rojo si pasa 10 min del límite
-                        color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "⚠️ DEMORA CRÍTICA"
-                    elif minutos > LIMITE_LOCAL:      # Naranja si llegó al límite
-                        color_hex = "#F97316"; texto_negro = True; tooltip_txt = "⏳ Retraso Leve"
-
-                # B) FORÁNEO (Usamos LIMITE_FORANEO)
-                elif bid == 92: # Foráneo
-                    if minutos > (LIMITE_FORANEO + 15): # Rojo si pasa 15 min del límite
-                        color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "⚠️ URGENTE SALIDA"
-                    elif minutos > LIMITE_FORANEO:      # Naranja
-                        color_hex = "#F97316"; texto_negro = True; tooltip_txt = "⏳ Retraso Leve"
-
-                # C) DESCANSO (Reglas fijas o puedes crear config para esto también)
-                elif bid == 91: 
-                    if minutos > 180: # Auto-cierre de turno por inactividad extrema (3h)
-                        self.db.actualizar_taxi_base(taxi['id'], 12) # Mover a Fuera de Servicio
-                        continue
-                    if minutos > 90:
-                        color_hex = "#EF4444"; texto_negro = False; tooltip_txt = "Exceso Descanso"
-                    elif minutos > 60:
-                        color_hex = "#F97316"; texto_negro = True; tooltip_txt = "Tiempo Límite Descanso"
-
-                # 4. CREAR Y AGREGAR FICHA
-                icon_chip = crear_chip_visual(num_taxi, color_hex, texto_negro)
-                item = TaxiItem("")
-                item.setIcon(icon_chip)
-                item.setToolTip(f"Unidad {num_taxi}\n{tooltip_txt}\n⏱️ {int(minutos)} min en base")
-                item.setData(Qt.ItemDataRole.UserRole, taxi['id'])
-                item.setText(num_taxi); item.setForeground(QColor("transparent"))
-                item.setSizeHint(QSize(90, 90))
-                self.listas_bases[bid].addItem(item)
-
-        # Re-ordenar listas numéricas especiales (Taller, Descanso, etc) para limpieza visual
+                minutos = self.minutos_en_base(taxi, ahora)
+
+                # (El auto-cierre de DESCANSO > 3h lo hace TrabajoMantenimiento: aquí solo se lee)
+
+                # 4. REUSAR LA FICHA (o crearla si la unidad es nueva en el tablero)
+                bid_actual, item = en_pantalla.pop(taxi['id'], (None, None))
+                if item is None:
+                    item = TaxiItem("")
+                elif bid_actual != bid:
+                    lista_vieja = self.listas_bases[bid_actual]
+                    lista_vieja.takeItem(lista_vieja.row(item))
+                self.pintar_ficha(item, taxi, bid, minutos, limites)
+                self.seguir_ficha(taxi, bid, minutos, limites)
+                deseado[bid].append(item)
+
+        # 5. QUITAR LAS QUE YA NO VAN (bajas, inactivas, bases ocultas)
+        for taxi_id, (bid_actual, item) in en_pantalla.items():
+            lista_vieja = self.listas_bases[bid_actual]
+            lista_vieja.takeItem(lista_vieja.row(item))
+        vigentes = {item.data(Qt.ItemDataRole.UserRole) for items in deseado.values() for item in items}
+        for taxi_id in list(self.fichas_semaforo):
+            if taxi_id not in vigentes:
+                del self.fichas_semaforo[taxi_id]; self.semaforo.quitar(taxi_id)
+        self.reprogramar_timer_semaforo()
+
+        # Las listas numéricas especiales (Taller, Descanso, etc) van por número para limpieza visual;
+        # las bases físicas quedan por antigüedad
         ids_ordenar_numerico = [12, 90, 91, 92, 93]
-        for bid in ids_ordenar_numerico:
-            if bid in self.listas_bases:
-                self.listas_bases[bid].sortItems(Qt.SortOrder.AscendingOrder)
+        for bid, items in deseado.items():
+            if bid in ids_ordenar_numerico: items.sort(key=self._clave_numerica_ficha)
+            self._ordenar_lista_tablero(self.listas_bases[bid], items)
+
+        # El buscador sigue al tablero: altas/bajas fuera de esta ventana no deben quedar en el índice
+        self.busqueda.indexar_unidades(taxis)
+        # Respetar la búsqueda activa en las fichas nuevas o movidas
+        if self.txt_buscar_taxi.text().strip():
+            self.filtrar_taxis_tablero(self.txt_buscar_taxi.text())
+            self.actualizar_sugerencias()
 
         self.cargando_datos = False
         
@@ -674,17 +1358,13 @@ class VentanaPrincipal(QMainWindow):
         QTimer.singleShot(50, lambda: self._procesar_y_refrescar(lista_destino, indice))
 
     def _procesar_y_refrescar(self, lista_destino, indice_item):
-        """ Función auxiliar que guarda el cambio y PINTA DE NUEVO EL TABLERO """
-        
-        # 1. EJECUTAR LA LÓGICA DE BASE DE DATOS (Lo que ya tenías)
+        """ Función auxiliar que guarda el cambio; la ficha movida se repinta sola (ver _ejecutar_actualizacion_bd) """
         self._ejecutar_actualizacion_bd(lista_destino, indice_item)
-        
-        # 2. ¡EL SECRETO! FORZAR RE-PINTADO INMEDIATO
-        # Esto hará que el taxi evalúe su nuevo estado (Base/Fuera) y se ponga Amarillo/Gris al instante.
-        self.cargar_datos_en_tablero()
 
 
 
+    @trazar("ui")
+    @accion_bd("mover_ficha")
     def _ejecutar_actualizacion_bd(self, lista_destino, indice_item):
         item = lista_destino.item(indice_item)
         if not item: return
@@ -698,49 +1378,46 @@ class VentanaPrincipal(QMainWindow):
             if w == lista_destino: id_base_nueva = id_b; break
         
         if id_base_nueva and taxi_id_bd:
-            conn, cur = self.db._conectar()
-            cur.execute("SELECT base_actual_id FROM taxis WHERE id=?", (taxi_id_bd,))
-            res = cur.fetchone()
-            conn.close()
-            id_ant = res['base_actual_id'] if res else 12 
-            
-            inactivos = [12, 90, 91]
-            if id_ant in inactivos and id_base_nueva not in inactivos:
-                self.db.abrir_turno(taxi_id_bd)
-            elif id_ant not in inactivos and id_base_nueva in inactivos:
-                self.db.cerrar_turno(taxi_id_bd)
-                self.db.registrar_fin_viaje(taxi_id_bd)
-
             # --- MANEJO DE VIAJES ---
+            # Primero se piden los datos del viaje; la BD se toca una sola vez al final
+            datos_viaje = None
             if id_base_nueva in [92, 93]: 
-                # Abrimos la ventana
-                resultado = self.abrir_ventana_nuevo_viaje(taxi_id_bd, taxi_num, id_ant)
+                res = self.db.obtener_taxi(taxi_id_bd)
+                id_ant = res['base_actual_id'] if res else 12 
+                datos_viaje = self.abrir_ventana_nuevo_viaje(taxi_id_bd, taxi_num, id_ant)
                 
                 # Si canceló, nos salimos y no movemos nada
-                if resultado == False: 
+                if datos_viaje is None: 
                     return 
-            
-            else:
-                 if id_ant in [92, 93]: self.db.registrar_fin_viaje(taxi_id_bd)
 
-            # === CORRECCIÓN AQUÍ ===
-            # Quitamos el 'else' gigante que había antes.
-            # SIEMPRE ejecutamos esto al final para asegurar que el taxi 
-            # termine visualmente en la caja donde lo soltaste (92, 93, Taller, etc.)
-            # aunque el diálogo lo haya puesto momentáneamente en "13".
-            self.db.actualizar_taxi_base(taxi_id_bd, id_base_nueva)
+            # Turno, viaje y base en UNA transacción. SIEMPRE termina en la caja
+            # donde lo soltaste (92, 93, Taller, etc.)
+            estado = self.db.mover_taxi(taxi_id_bd, id_base_nueva, datos_viaje)
+            if datos_viaje: self.busqueda.agregar_destino(datos_viaje['destino'])
+
+            # Repintamos solo esta ficha (acaba de moverse: semáforo en cero) y agendamos su próximo cambio
+            if estado:
+                limites = self.leer_limites_semaforo()
+                self.pintar_ficha(item, estado, id_base_nueva, 0, limites)
+                self.seguir_ficha(estado, id_base_nueva, 0, limites)
+                self.reprogramar_timer_semaforo()
 
         # Lógica de ordenamiento
         ids_especiales = [12, 90, 91, 92, 93]
         if id_base_nueva in ids_especiales:
-            lista_destino.sortItems(Qt.SortOrder.AscendingOrder)
+            self._ordenar_por_numero(lista_destino)
+        elif id_base_nueva and lista_destino.row(item) >= 0:
+            # En base física el recién llegado va al final de la fila
+            self.cargando_datos = True
+            lista_destino.addItem(lista_destino.takeItem(lista_destino.row(item)))
+            self.cargando_datos = False
 
 
     def evento_drop_viajes(self, event):
         QListWidget.dropEvent(self.lista_viajes, event)
         f = self.lista_viajes.currentRow()
         self.detectar_cambio_base(self.lista_viajes, f)
-        self.lista_viajes.sortItems(Qt.SortOrder.AscendingOrder)
+        self._ordenar_por_numero(self.lista_viajes)
 
     def abrir_ventana_nuevo_viaje(self, taxi_id, taxi_num, id_origen):
         d = QDialog(self)
@@ -790,34 +1467,50 @@ class VentanaPrincipal(QMainWindow):
             try: cost = float(self.txt_costo.text().replace(',', '.'))
             except: cost = 0.0
             
-            self.db.registrar_viaje(taxi_id, st, orig, dest, cost)
-            self.db.actualizar_taxi_base(taxi_id, 13) # Lo mandamos a "En Viaje"
-            return True # <--- CAMBIO IMPORTANTE: Avisamos que SI se hizo
+            # Se devuelven los datos: el registro lo hace db.mover_taxi junto con el movimiento
+            return {'tipo_servicio': st, 'base_salida': orig, 'destino': dest, 'precio': cost}
         else:
             self.cargar_datos_en_tablero() # Recargamos para devolver el taxi a su lugar
-            return False # <--- CAMBIO IMPORTANTE: Avisamos que NO se hizo
+            return None # Avisamos que NO se hizo
         
     # ==========================================
     # LÓGICA DE BÚSQUEDA Y FILTROS
     # ==========================================
 
 
+    @trazar("ui")
     def busqueda_unificada(self, texto):
-        idx = self.tabs.currentIndex()
+        """ Llega ya con debounce (ServicioBusqueda); solo se tocan filas/fichas cuyo estado cambia """
+        en_admin = self.tabs.currentWidget() is self.tab_admin
         texto = texto.lower().strip()
         
         # 1. TABLERO
-        if idx == 0: 
+        if self.tabs.currentIndex() == 0: 
             self.filtrar_taxis_tablero(texto)
+            self.actualizar_sugerencias(texto, mostrar=True)
             
         # 2. ADMIN > HISTORIAL
-        elif idx == 1 and self.paginas_admin.currentIndex() == 0:
+        elif en_admin and self.paginas_admin.currentIndex() == 0:
             self.filtrar_tabla_historial(texto)
+            self.actualizar_sugerencias(texto, mostrar=True)
             
         # 3. ADMIN > REPORTES/INCIDENCIAS (Nueva Lógica)
-        elif idx == 1 and self.paginas_admin.currentIndex() == 4:
+        elif en_admin and self.paginas_admin.currentIndex() == 4:
             self.filtrar_tablas_reportes(texto)
 
+    def actualizar_sugerencias(self, texto=None, mostrar=False):
+        """ Rehace la lista del autocompletado con el índice vigente (se llama también al refrescar el tablero) """
+        if texto is None: texto = self.txt_buscar_taxi.text()
+        en_historial = self.tabs.currentWidget() is self.tab_admin and self.paginas_admin.currentIndex() == 0
+        if en_historial: sugerencias = self.busqueda.sugerir_destinos(texto)
+        elif self.tabs.currentIndex() == 0: sugerencias = self.busqueda.sugerir_unidades(texto)
+        else: sugerencias = []
+        self.modelo_sugerencias.setStringList(sugerencias)
+        if not sugerencias:
+            self.completador_destinos.popup().hide()
+        elif mostrar and self.txt_buscar_taxi.hasFocus():
+            self.completador_destinos.complete()
+
     def filtrar_tablas_reportes(self, texto):
         texto = texto.lower()
         
@@ -833,47 +1526,23 @@ class VentanaPrincipal(QMainWindow):
                 tipo = item_tipo.text().lower() if item_tipo else ""
                 
                 # Mostramos si el texto coincide con el taxi o el tipo de reporte
-                visible = (texto in taxi) or (texto in tipo)
-                tabla.setRowHidden(r, not visible)
+                oculto = not ((texto in taxi) or (texto in tipo))
+                if tabla.isRowHidden(r) != oculto: tabla.setRowHidden(r, oculto)
 
 
     def filtrar_taxis_tablero(self, texto):
-        busq = texto.lower().strip()
+        # BÚSQUEDA EXACTA: "35" debe ser igual a "35"
+        # Si escribes "3", el "35" se oculta (hasta que completes el número)
+        ids = self.busqueda.taxis_que_coinciden(texto) # None = mostrar todo
         for lista in self.listas_bases.values():
             for i in range(lista.count()):
                 it = lista.item(i)
-                # PROTECCIÓN ANTI-ERROR:
-                if not busq:
-                    it.setHidden(False) # Si está vacío, mostrar todo
-                else:
-                    # BÚSQUEDA EXACTA: "35" debe ser igual a "35"
-                    # Si escribes "3", el "35" se oculta (hasta que completes el número)
-                    es_igual = (it.text().lower() == busq)
-                    it.setHidden(not es_igual)
+                oculto = ids is not None and it.data(Qt.ItemDataRole.UserRole) not in ids
+                if it.isHidden() != oculto: it.setHidden(oculto)
 
     def filtrar_tabla_historial(self, texto):
-        busq = texto.lower().strip()
-        for r in range(self.tabla_reportes.rowCount()):
-            it_unidad = self.tabla_reportes.item(r, 3) # Columna Unidad
-            it_destino = self.tabla_reportes.item(r, 6) # Columna Destino
-            
-            if not it_unidad: continue
-
-            if not busq:
-                self.tabla_reportes.setRowHidden(r, False)
-            else:
-                txt_unidad = it_unidad.text().lower()
-                txt_destino = it_destino.text().lower() if it_destino else ""
-
-                # LOGICA MIXTA INTELIGENTE:
-                # 1. Si es Unidad -> Búsqueda EXACTA (para evitar el problema del 35 vs 350)
-                match_unidad = (txt_unidad == busq)
-                
-                # 2. Si es Destino -> Búsqueda PARCIAL (para encontrar "Tepeaca" escribiendo "tepea")
-                match_destino = (busq in txt_destino)
-
-                # Si coincide con alguno de los dos, se muestra. Si no, se oculta.
-                self.tabla_reportes.setRowHidden(r, not (match_unidad or match_destino))
+        # El filtro lo hace la BD (unidad exacta o destino por índice de texto), no la tabla fila por fila
+        self.modelo_historial.buscar(texto)
 
     # ==========================================
     # CONSTRUCTORES DE PÁGINAS (ADMIN)
@@ -890,9 +1559,9 @@ class VentanaPrincipal(QMainWindow):
         self.cmb_filtro_historial.addItems(["HOY", "MES", "AÑO", "SIEMPRE"])
         self.cmb_filtro_historial.setFixedWidth(120)
         self.cmb_filtro_historial.setStyleSheet("QComboBox { background-color: #0F172A; color: white; padding: 5px; border: 1px solid #475569; }")
-        self.cmb_filtro_historial.currentIndexChanged.connect(self.cargar_historial_en_tabla)
+        self.cmb_filtro_historial.currentIndexChanged.connect(lambda *_: self.cargar_historial_en_tabla())  # Con @trazar la señal pasaría su argumento
         
-        btn_r = QPushButton("🔄 Actualizar"); btn_r.clicked.connect(self.cargar_historial_en_tabla)
+        btn_r = QPushButton("🔄 Actualizar"); btn_r.clicked.connect(lambda *_: self.cargar_historial_en_tabla())
         btn_r.setStyleSheet("color: white; border: 1px solid #475569; padding: 5px; background-color: #334155;")
         
         btn_d = QPushButton("🗑️ Eliminar"); btn_d.clicked.connect(self.eliminar_viaje_seleccionado)
@@ -900,69 +1569,30 @@ class VentanaPrincipal(QMainWindow):
         
         lb.addWidget(lbl); lb.addWidget(self.cmb_filtro_historial); lb.addSpacing(10); lb.addWidget(btn_r); lb.addStretch(); lb.addWidget(btn_d)
         
-        self.tabla_reportes = QTableWidget()
-        self.tabla_reportes.setColumnCount(8)
-        self.tabla_reportes.setHorizontalHeaderLabels(["ID","FECHA","HORA","UNIDAD","CONCEPTO","BASE","DESTINO","COSTO"])
+        # Modelo/vista: las filas se piden a SQLite por páginas conforme se hace scroll
+        self.modelo_historial = ModeloHistorial(self.db, self.consultas, parent=self)
+        self.tabla_reportes = QTableView()
+        self.tabla_reportes.setModel(self.modelo_historial)
         self.tabla_reportes.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.tabla_reportes.horizontalHeader().setSortIndicator(0, Qt.SortOrder.DescendingOrder)
+        self.tabla_reportes.setSortingEnabled(True)
         self.tabla_reportes.setColumnHidden(0, True)
-        self.tabla_reportes.setStyleSheet("QTableWidget { background-color: #1E293B; color: white; border: none; } QHeaderView::section { background-color: #0F172A; color: #FACC15; padding: 5px; } QTableWidget::item:selected { background-color: #334155; }")
-        self.tabla_reportes.cellChanged.connect(self.guardar_edicion_tabla)
+        self.tabla_reportes.verticalHeader().setVisible(False)
+        self.tabla_reportes.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.tabla_reportes.setStyleSheet("QTableView { background-color: #1E293B; color: white; border: none; } QHeaderView::section { background-color: #0F172A; color: #FACC15; padding: 5px; } QTableView::item:selected { background-color: #334155; }")
         
         l.addWidget(bar); l.addWidget(self.tabla_reportes)
 
+    @trazar("ui")
     def cargar_historial_en_tabla(self):
-        # Desconectamos señal para evitar bucles al limpiar
-        try: self.tabla_reportes.cellChanged.disconnect()
-        except: pass
-        
-        self.tabla_reportes.setRowCount(0)
-        f = self.cmb_filtro_historial.currentText()
-        viajes = self.db.obtener_historial_viajes(f)
-        
-        # Diccionario para traducir IDs a texto
-        servs = {1:"Viaje Base", 2:"Tel Base", 3:"Tel Unidad", 4:"Aéreo"}
-        
-        for d in viajes:
-            r = self.tabla_reportes.rowCount()
-            self.tabla_reportes.insertRow(r)
-            
-            # --- CORRECCIÓN DEL ERROR ---
-            # Usamos acceso directo [] en lugar de .get()
-            # La columna 'tipo_servicio_id' SIEMPRE viene de la BD
-            ids = d['tipo_servicio_id']
-            
-            # Lógica para mostrar nombre de base solo si es 'Viaje en Base' (ID 1)
-            nom_b = d['nombre_base'] if d['nombre_base'] else "////"
-            
-            # Formato de Fecha y Hora
-            fh = str(d['fecha_hora_inicio']).split(" ")
-            f_date = fh[0]
-            h_time = fh[1][:5] if len(fh)>1 else ""
-            
-            # Llenado de columnas (Protegemos con str() por si algo es None)
-            self.tabla_reportes.setItem(r, 0, QTableWidgetItem(str(d['id'])))
-            self.tabla_reportes.setItem(r, 1, QTableWidgetItem(f_date))
-            self.tabla_reportes.setItem(r, 2, QTableWidgetItem(h_time))
-            self.tabla_reportes.setItem(r, 3, QTableWidgetItem(str(d['numero_economico'])))
-            self.tabla_reportes.setItem(r, 4, QTableWidgetItem(servs.get(ids, "-"))) # servs es dict normal, aquí si sirve .get
-            self.tabla_reportes.setItem(r, 5, QTableWidgetItem(str(nom_b or "")))
-            self.tabla_reportes.setItem(r, 6, QTableWidgetItem(str(d['destino'] or "")))
-            self.tabla_reportes.setItem(r, 7, QTableWidgetItem(str(d['precio'])))
-            
-        # Reconectamos la señal de edición
-        self.tabla_reportes.cellChanged.connect(self.guardar_edicion_tabla)
-        
-    def guardar_edicion_tabla(self, r, c):
-        vid = self.tabla_reportes.item(r,0).text()
-        val = self.tabla_reportes.item(r,c).text()
-        col = "destino" if c==6 else "precio" if c==7 else None
-        if col: self.db.actualizar_viaje(vid, col, val)
+        # Primera página en segundo plano; las demás llegan solas al hacer scroll (ModeloHistorial)
+        self.modelo_historial.recargar(self.cmb_filtro_historial.currentText())
 
     def eliminar_viaje_seleccionado(self):
-        r = self.tabla_reportes.currentRow()
+        r = self.tabla_reportes.currentIndex().row()
         if r >= 0:
-            vid = self.tabla_reportes.item(r,0).text()
-            if self.db.eliminar_viaje(vid): self.tabla_reportes.removeRow(r)
+            vid = self.modelo_historial.id_viaje(r)
+            if self.db.eliminar_viaje(vid): self.modelo_historial.quitar_fila(r)
 
     def al_cambiar_pestana_principal(self, i):
         if i == 1: self.cargar_historial_en_tabla()
@@ -1054,9 +1684,12 @@ class VentanaPrincipal(QMainWindow):
         self.actualizar_formato_fecha_unit()
 
 
+    @trazar("ui")
+    @accion_bd("tabla_flota")
     def cargar_tabla_flota(self):
         self.tabla_flota.setRowCount(0)
         flota = self.db.obtener_toda_la_flota()
+        self.busqueda.indexar_unidades(flota) # Altas/bajas: al día el índice del buscador
         try: flota.sort(key=lambda x: int(x['numero_economico']))
         except: pass
         
@@ -1098,6 +1731,7 @@ class VentanaPrincipal(QMainWindow):
         
         # 1. LIMPIEZA: Si no hay número escrito...
         if not num:
+            self.consultas.cancelar("stats")
             self.lbl_stat_dinero.setText("$0.00")
             self.lbl_stat_viajes.setText("0")
             self.lbl_stat_horas.setText("0.0 h")
@@ -1122,21 +1756,8 @@ class VentanaPrincipal(QMainWindow):
                             it.setForeground(QColor("white"))
             return
         
-        # 2. BÚSQUEDA DE DATOS (BD)
-        tid = self.db.obtener_id_por_numero(num)
-        if tid:
-            stats = self.db.obtener_estadisticas_unidad(tid, per, fecha_ref=fstr)
-            self.lbl_stat_dinero.setText(f"${stats['ganancia']:,.2f}")
-            self.lbl_stat_viajes.setText(str(stats['viajes']))
-            self.lbl_stat_horas.setText(f"{stats['horas']:.1f} h")
-            
-            pg = "AÑO" if per=="SIEMPRE" else per
-            d = self.db.obtener_datos_tres_graficas(tid, pg, fecha_ref=fstr)
-            self.grafico_dinero.actualizar_grafico(d["etiquetas"], d["dinero"], "dinero")
-            self.grafico_viajes.actualizar_grafico(d["etiquetas"], d["viajes"], "viajes")
-            self.grafico_horas.actualizar_grafico(d["etiquetas"], d["horas"], "horas")
-        else:
-             self.lbl_stat_dinero.setText("ERROR")
+        # 2. BÚSQUEDA DE DATOS (BD) en segundo plano; se pinta en _pintar_stats
+        self.consultas.ejecutar("stats", self._consultar_stats, num, per, fstr, al_terminar=self._pintar_stats)
 
         # 3. RESALTADO VISUAL EN LA TABLA (NUEVA LÓGICA)
         for r in range(self.tabla_flota.rowCount()):
@@ -1168,6 +1789,27 @@ class VentanaPrincipal(QMainWindow):
                             cell.setForeground(QColor("white"))
 
 
+    def _consultar_stats(self, num, per, fstr):
+        """ Corre en un hilo del pool: SOLO base de datos, nada de widgets """
+        tid = self.db.obtener_id_por_numero(num)
+        if not tid: return None
+        stats = self.db.obtener_estadisticas_unidad(tid, per, fecha_ref=fstr)
+        pg = "AÑO" if per=="SIEMPRE" else per
+        d = self.db.obtener_datos_tres_graficas(tid, pg, fecha_ref=fstr)
+        return stats, d
+
+    @trazar("ui")
+    def _pintar_stats(self, resultado):
+        if resultado is None:
+            self.lbl_stat_dinero.setText("ERROR"); return
+        stats, d = resultado
+        self.lbl_stat_dinero.setText(f"${stats['ganancia']:,.2f}")
+        self.lbl_stat_viajes.setText(str(stats['viajes']))
+        self.lbl_stat_horas.setText(f"{stats['horas']:.1f} h")
+        self.grafico_dinero.actualizar_grafico(d["etiquetas"], d["dinero"], "dinero")
+        self.grafico_viajes.actualizar_grafico(d["etiquetas"], d["viajes"], "viajes")
+        self.grafico_horas.actualizar_grafico(d["etiquetas"], d["horas"], "horas")
+
     def registrar_nuevo_taxi_ui(self):
         n = self.txt_nuevo_taxi.text().strip()
         if not n: return
@@ -1555,6 +2197,48 @@ class VentanaPrincipal(QMainWindow):
 
         btn.clicked.connect(guardar)
         l.addWidget(btn)
+
+        # 3. Diagnóstico (oculto: solo aparece si se abre el menú con Shift presionado)
+        if QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
+            d.setFixedSize(400, 410)
+            btn_traza = QPushButton()
+            btn_traza.setStyleSheet("background-color: #334155; padding: 8px; border-radius: 5px;")
+            def pintar_boton_traza():
+                btn_traza.setText("⏹️ DETENER Y GUARDAR TRAZA" if trazas.esta_activo() else "🔬 GRABAR TRAZA DE TIEMPOS")
+            def alternar_traza():
+                if trazas.esta_activo():
+                    trazas.desactivar()
+                    ruta = trazas.guardar()
+                    if ruta: QMessageBox.information(d, "Traza", f"Traza guardada en:\n{os.path.abspath(ruta)}\n\nÁbrala en chrome://tracing")
+                    else: QMessageBox.information(d, "Traza", "No se grabó nada.")
+                else:
+                    trazas.activar()
+                    QMessageBox.information(d, "Traza", "Grabando. Repita la acción lenta y vuelva aquí para guardar.")
+                pintar_boton_traza()
+            pintar_boton_traza()
+            btn_traza.clicked.connect(alternar_traza)
+            l.addWidget(btn_traza)
+
+            # Perfil con cProfile de los próximos clics lentos (solo si se abrió con TAXIS_PERFILAR, ver perfilador.py)
+            app = QApplication.instance()
+            if isinstance(app, AplicacionPerfilable):
+                d.setFixedSize(400, 460)
+                btn_perfil = QPushButton()
+                btn_perfil.setStyleSheet("background-color: #334155; padding: 8px; border-radius: 5px;")
+                def pintar_boton_perfil():
+                    btn_perfil.setText(f"⏹️ CANCELAR PERFILADO (faltan {app.restantes()})" if app.restantes() else "⏱️ PERFILAR PRÓXIMAS 5 ACCIONES")
+                def alternar_perfil():
+                    if app.restantes():
+                        app.desactivar()
+                    else:
+                        app.activar(5)
+                        QMessageBox.information(d, "Perfilado", f"Se perfilarán las próximas 5 acciones que tarden más de {app.umbral_ms:g} ms.\n\n"
+                                                                f"Los archivos .prof quedan en:\n{os.path.abspath(app.carpeta)}")
+                    pintar_boton_perfil()
+                pintar_boton_perfil()
+                btn_perfil.clicked.connect(alternar_perfil)
+                l.addWidget(btn_perfil)
+
         d.exec()
 
     def cambiar_costo_banderola(self):
@@ -1802,6 +2486,8 @@ class VentanaPrincipal(QMainWindow):
             else:
                 QMessageBox.warning(self, "Error", "No se pudo guardar.")
 
+    @trazar("ui")
+    @accion_bd("tabla_deudas")
     def cargar_tabla_deudas(self):
         # Limpiar todas
         self.tabla_piso.setRowCount(0)
@@ -1905,8 +2591,10 @@ class VentanaPrincipal(QMainWindow):
             return
         # -----------------------------------------------
         fecha = self.date_auditoria.date().toString("yyyy-MM-dd")
-        candidatos = self.db.auditoria_inteligente(fecha)
-        
+        self.consultas.ejecutar("auditoria", self.db.auditoria_inteligente, fecha, al_terminar=self._mostrar_resultado_auditoria)
+
+    @trazar("ui")
+    def _mostrar_resultado_auditoria(self, candidatos):
         if not candidatos:
             QMessageBox.information(self, "Excelente", "¡Todos cumplieron sus horas ese día!")
             return
@@ -1926,13 +2614,8 @@ class VentanaPrincipal(QMainWindow):
         msg_box.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if msg_box.exec() == QMessageBox.StandardButton.Yes:
-            # Procesar Multas (Cobro)
-            for m in multas:
-                self.db.registrar_incidencia(m['taxi_id'], "🛑 Multa Horas", m['motivo'], m['monto'], "SISTEMA")
-            
-            # Procesar Ausencias (Solo reporte)
-            for a in ausentes:
-                self.db.registrar_incidencia(a['taxi_id'], "🚫 Ausencia", a['motivo'], 0.0, "SISTEMA")
+            # Multas (cobro) y ausencias (solo reporte) en una sola transacción
+            self.db.aplicar_auditoria(candidatos)
                 
             self.cargar_tabla_deudas()
             QMessageBox.information(self, "Aplicado", "Se han generado todos los cargos y reportes.")
@@ -2170,33 +2853,28 @@ class VentanaPrincipal(QMainWindow):
             # tendrá la misma contraseña que acabas de escribir.
             password_pdf = pwd 
 
-        # 2. OBTENER DATOS
-        datos_gral = self.db.obtener_datos_reporte_global(periodo, fecha_str)# Obtenemos el ranking de TODOS los taxis para hacer la sábana
-        # Obtenemos la lista real de la base de datos para la sábana
-        datos_gral['incidencias_lista'] = self.db.obtener_incidencias_globales_periodo(fecha_str, fecha_str) 
-        # ==========================
-        # Reusamos la función 'obtener_top_taxis_admin' porque esa ya calcula viajes y dinero de todos
-        datos_todos = self.db.obtener_top_taxis_admin(periodo, fecha_str)
-        
-        # Inyectamos esta lista en los datos generales para que el reporte la vea
-        if datos_todos:
-            # Usamos la lista 'top_viajes' que trae a todos los taxis ordenados
-            datos_gral['detalle_flota'] = datos_todos['top_viajes']
-        # =================================================================
-
-        datos_admin = None
-        if tipo == "ADMIN":
-            datos_admin = datos_todos # Para el admin pasamos todo el objeto completo con gráficas
+        # 2 y 3. DATOS + PDF en segundo plano: el tablero sigue funcionando mientras tanto
+        self.consultas.ejecutar(f"reporte_{tipo}", self._construir_reporte_global, tipo, periodo, fecha_str, password_pdf,
+                                al_terminar=lambda ruta: self._reporte_global_listo(ruta, password_pdf),
+                                al_fallar=lambda e: QMessageBox.critical(self, "Error", f"No se pudo crear el reporte: {e}"))
+
+    @trazar("ui")
+    def _construir_reporte_global(self, tipo, periodo, fecha_str, password_pdf):
+        """ Corre en un hilo del pool: consultas + PDF, sin tocar widgets. Devuelve la ruta del PDF """
+        # 2. OBTENER DATOS (sábana de toda la flota; el admin además recibe rankings y gráficas)
+        datos_gral, datos_admin = self.db.obtener_datos_reporte_dual(tipo, periodo, fecha_str)
 
         # 3. GENERAR PDF
         nombre_pdf = f"Reporte_{tipo}_{periodo}_{datetime.now().strftime('%H%M')}.pdf"
         texto_fecha = fecha_str 
 
+        gen = GeneradorPDF(nombre_pdf)
+        # Pasamos la contraseña (que ya validamos que es la real)
+        return gen.generar_reporte_dual(tipo, periodo, texto_fecha, datos_gral, datos_admin, password_pdf)
+
+    @trazar("ui")
+    def _reporte_global_listo(self, ruta, password_pdf):
         try:
-            gen = GeneradorPDF(nombre_pdf)
-            # Pasamos la contraseña (que ya validamos que es la real)
-            ruta = gen.generar_reporte_dual(tipo, periodo, texto_fecha, datos_gral, datos_admin, password_pdf)
-            
             # Mensaje de éxito
             msg = f"Reporte generado exitosamente.\nUbicación: {ruta}"
             if password_pdf:
@@ -2209,11 +2887,13 @@ class VentanaPrincipal(QMainWindow):
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo crear el reporte: {e}")
+
     def actualizar_formato_global(self):
         p = self.cmb_periodo_global.currentText()
         self.date_global.setEnabled(p != "SIEMPRE")
         self.date_global.setDisplayFormat("dd/MM/yyyy" if p=="DIA" else "MM/yyyy" if p=="MES" else "yyyy" if p=="AÑO" else "---")
 
+    @trazar("ui")
     def generar_pdf_corporativo(self):
         periodo = self.cmb_periodo_global.currentText()
         qdate = self.date_global.date()
@@ -2267,117 +2947,30 @@ class VentanaPrincipal(QMainWindow):
 # ==========================================
 
 def verificar_y_crear_db():
-    nombre_db = "taxis.db"
-    
-    # 1. CONEXIÓN (O CREACIÓN SI NO EXISTE)
+    """ Crea la BD o aplica las migraciones pendientes (ver MIGRACIONES en gestor_db) """
     try:
-        conn = sqlite3.connect(nombre_db)
-        c = conn.cursor()
-        c.execute("PRAGMA foreign_keys = ON;")
-        
-        # 2. CREAR TABLAS (Solo si no existen)
-        c.execute("CREATE TABLE IF NOT EXISTS cat_tipos_servicio (id INTEGER PRIMARY KEY AUTOINCREMENT, descripcion TEXT UNIQUE NOT NULL)")
-        c.execute("CREATE TABLE IF NOT EXISTS cat_bases (id INTEGER PRIMARY KEY AUTOINCREMENT, nombre_base TEXT UNIQUE NOT NULL)")
-        
-        # Nota: Aquí definimos la estructura ideal
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS taxis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, 
-                numero_economico TEXT NOT NULL UNIQUE, 
-                estado_sistema TEXT DEFAULT 'ACTIVO', 
-                fecha_alta TEXT, 
-                fecha_baja TEXT, 
-                base_actual_id INTEGER DEFAULT 12, 
-                fecha_movimiento TEXT,
-                FOREIGN KEY(base_actual_id) REFERENCES cat_bases(id)
-            )
-        """)
-        
-        c.execute("CREATE TABLE IF NOT EXISTS viajes (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER NOT NULL, tipo_servicio_id INTEGER NOT NULL, base_salida_id INTEGER, destino TEXT, precio REAL DEFAULT 0.0, fecha_hora_inicio TEXT, fecha_hora_fin TEXT, FOREIGN KEY(taxi_id) REFERENCES taxis(id))")
-        c.execute("CREATE TABLE IF NOT EXISTS incidencias (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER, tipo TEXT, descripcion TEXT, monto REAL DEFAULT 0.0, fecha_registro TEXT, resuelto TEXT DEFAULT 'PENDIENTE', operador_id TEXT DEFAULT 'SISTEMA')")
-        c.execute("CREATE TABLE IF NOT EXISTS turnos (id INTEGER PRIMARY KEY AUTOINCREMENT, taxi_id INTEGER, fecha_inicio TEXT, fecha_fin TEXT)")
-
-        # 3. DATOS INICIALES (Solo si está vacío)
-        c.executemany("INSERT OR IGNORE INTO cat_tipos_servicio (id, descripcion) VALUES (?, ?)", [(1,'Viaje en base'),(2,'Telefono base'),(3,'Telefono unidad'),(4,'Viaje aereo')])
-        c.executemany("INSERT OR IGNORE INTO cat_bases (id, nombre_base) VALUES (?, ?)", [(1,'Cessa'),(2,'Licuor'),(3,'Santiagito'),(4,'Aurrera'),(5,'Mercado'),(6,'Caros'),(7,'Survi'),(8,'Capulin'),(9,'Zocalo'),(10,'16 de septiembre'),(11,'Parada principal'),(12,'Fuera de Servicio'),(13,'En Viaje'), (90, 'Taller'), (91, 'Descanso'), (92, 'Foráneo'), (93, 'Local')])
-
-        fecha_hoy = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        for i in range(35, 101):
-            num_taxi = str(i)
-            # INSERT OR IGNORE evita errores si el taxi ya existe
-            c.execute("""
-                INSERT OR IGNORE INTO taxis 
-                (numero_economico, estado_sistema, base_actual_id, fecha_alta, fecha_movimiento) 
-                VALUES (?, 'ACTIVO', 12, ?, ?)
-            """, (num_taxi, fecha_hoy, fecha_hoy))
-        
-        # 4. === AUTO-REPARACIÓN (MIGRACIÓN) ===
-        # Revisamos qué columnas tiene la tabla 'taxis' actualmente
-        c.execute("PRAGMA table_info(taxis)")
-        columnas = [info[1] for info in c.fetchall()]
-        
-        # Si falta 'fecha_alta', la agregamos
-        if 'fecha_alta' not in columnas:
-            print("🔧 Actualizando BD: Agregando columna fecha_alta...")
-            c.execute("ALTER TABLE taxis ADD COLUMN fecha_alta TEXT")
-            
-        # Si falta 'fecha_baja', la agregamos
-        if 'fecha_baja' not in columnas:
-            print("🔧 Actualizando BD: Agregando columna fecha_baja...")
-            c.execute("ALTER TABLE taxis ADD COLUMN fecha_baja TEXT")
-
-        # Si falta 'fecha_movimiento', la agregamos (por si acaso)
-        if 'fecha_movimiento' not in columnas:
-            print("🔧 Actualizando BD: Agregando columna fecha_movimiento...")
-            c.execute("ALTER TABLE taxis ADD COLUMN fecha_movimiento TEXT")
-
-        conn.commit()
-        conn.close()
-        
-        # Hacer visible el archivo en Windows
-        try: ctypes.windll.kernel32.SetFileAttributesW(nombre_db, 0x80) 
-        except: pass
-        
+        GestorBaseDatos("taxis.db").cerrar()
         return True
-        
     except Exception as e:
         QMessageBox.critical(None, "Error BD", f"No se pudo verificar/actualizar la base de datos:\n{e}")
         return False
     
 
 def realizar_respaldo_seguridad():
-    """ Crea una copia de la base de datos en la carpeta /RESPALDOS al iniciar """
-    if os.path.exists("taxis.db"):
-        carpeta = "RESPALDOS_AUTO"
-        if not os.path.exists(carpeta):
-            os.makedirs(carpeta)
-            # Ocultar carpeta en Windows para que no la borren por error
-            try: ctypes.windll.kernel32.SetFileAttributesW(carpeta, 0x02) 
-            except: pass
-
-        # Nombre del archivo con fecha: taxis_backup_2026-01-25.db
-        fecha = datetime.now().strftime("%Y-%m-%d")
-        destino = os.path.join(carpeta, f"taxis_backup_{fecha}.db")
-        
-        # Solo copiamos si no existe ya el respaldo de hoy (para no alentar el inicio)
-        if not os.path.exists(destino):
-            try:
-                import shutil
-                shutil.copy2("taxis.db", destino)
-                print(f"✅ Respaldo de seguridad creado: {destino}")
-            except Exception as e:
-                print(f"⚠️ No se pudo crear respaldo: {e}")
-
-
+    """ Crea una copia de la base de datos en la carpeta /RESPALDOS_AUTO al iniciar (una por día) """
+    try:
+        # API de respaldo de SQLite: incluye lo que aún esté en el WAL
+        destino = respaldo_diario("taxis.db", "RESPALDOS_AUTO")
+        if destino: print(f"✅ Respaldo de seguridad creado: {destino}")
+    except Exception as e:
+        print(f"⚠️ No se pudo crear respaldo: {e}")
 
-    
 
-    
 # ==========================================
 # 4. INICIALIZACIÓN BD Y MAIN
 # ==========================================
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    app = crear_aplicacion(sys.argv)  # QApplication; con TAXIS_PERFILAR, una que puede perfilar acciones
     
     # 1. Anti-doble instancia (Esto está bien, déjalo)
     mem = QSharedMemory("SistemaTaxisZorro_Unique_Key_v1")
@@ -2404,4 +2997,8 @@ if __name__ == "__main__":
     v.showMaximized()
     
     if splash: splash.finish(v)
-    sys.exit(app.exec())
\ No newline at end of file
+    codigo = app.exec()
+    v.consultas.esperar()
+    v.trabajo_mantenimiento.wait()
+    v.db.cerrar()
+    sys.exit(codigo)
\ No newline at end of file
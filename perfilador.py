@@ -0,0 +1,171 @@
+"""
+Perfilado con cProfile de las próximas N acciones de la interfaz: clics, teclas, arrastres,
+timers y resultados de consultas en segundo plano. Sirve para que la operadora nos mande
+el perfil exacto del clic que se sintió lento.
+
+    set TAXIS_PERFILAR=5        # perfila las próximas 5 acciones lentas desde el arranque
+    python interfaz.py
+
+Con TAXIS_PERFILAR=0 arranca sin perfilar, listo para activarse desde Configuración con Shift
+presionado ("Perfilar próximas acciones"). Sin la variable se usa un QApplication normal:
+ningún evento pasa por Python de más.
+Cada acción queda en DIAGNOSTICO/perfil_<fecha>_<tipo>_<accion>.prof y se lee con
+    python -m pstats DIAGNOSTICO/perfil_....prof      (o con snakeviz)
+
+Solo cuentan las acciones que tardan más de TAXIS_PERFIL_MIN_MS (default 100): así los
+timers que no hacen nada no se gastan el cupo. Las acciones que abren un diálogo modal se
+descartan (medirían lo que la operadora tarda en cerrarlo) y no se perfila nada mientras haya
+un diálogo abierto. cProfile ve solo el hilo de la interfaz; lo que pasa en los hilos de
+consultas se ve con trazas.py.
+"""
+import cProfile
+import glob
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+
+from PyQt6.QtCore import QEvent
+from PyQt6.QtWidgets import QAbstractButton, QApplication, QWidget
+
+from instrumentacion import CARPETA_DIAGNOSTICO
+
+
+MAX_ARCHIVOS = 30                 # Rotación: se borran los perfiles más viejos
+MAX_BYTES = 50 * 1024 * 1024      # Tope de espacio para todos los perfiles juntos
+
+# Eventos que terminan en un slot de la aplicación -> prefijo del archivo
+EVENTOS = {
+    QEvent.Type.MouseButtonRelease: "clic",
+    QEvent.Type.MouseButtonDblClick: "doble_clic",
+    QEvent.Type.KeyPress: "tecla",
+    QEvent.Type.Drop: "drop",
+    QEvent.Type.Timer: "timer",
+    QEvent.Type.MetaCall: "senal",  # Señales encoladas (p.ej. resultados de ServicioConsultas)
+}
+# Estos llegan primero a la ventana nativa y luego al widget: se perfila en el widget
+EVENTOS_DE_WIDGET = ("clic", "doble_clic", "tecla", "drop")
+
+# Envoltorios de decoradores (trazas, accion_bd, instrumentación): no sirven como nombre de acción
+_ENVOLTORIOS = {"envuelto", "medido", "<lambda>", "notify"}
+
+
+def _limpiar(texto):
+    return re.sub(r"[^\w]+", "_", texto, flags=re.ASCII).strip("_")[:40]
+
+def _describir(receptor, tipo):
+    """ Nombre de lo que recibió el evento: texto del botón, objectName o la clase """
+    objeto = receptor
+    if tipo == "drop" and receptor.parent() is not None:
+        objeto = receptor.parent()  # El drop llega al viewport; interesa la lista
+    nombre = ""
+    if isinstance(objeto, QAbstractButton): nombre = _limpiar(objeto.text())
+    return nombre or _limpiar(objeto.objectName()) or type(objeto).__name__
+
+def _slot_principal(perfil):
+    """ La función de Python con más tiempo acumulado: casi siempre es el slot que se disparó """
+    mejor, tiempo = None, -1.0
+    for (archivo, _, funcion), (_, _, _, acumulado, _) in pstats.Stats(perfil).stats.items():
+        if archivo == "~" or funcion in _ENVOLTORIOS or archivo.endswith("perfilador.py"): continue
+        if acumulado > tiempo: mejor, tiempo = funcion, acumulado
+    return mejor
+
+
+# ==========================================
+# APLICACIÓN PERFILABLE
+# ==========================================
+def crear_aplicacion(argv):
+    """ AplicacionPerfilable solo si existe TAXIS_PERFILAR; si no, un QApplication normal (sin costo por evento) """
+    if "TAXIS_PERFILAR" in os.environ:
+        return AplicacionPerfilable(argv)
+    return QApplication(argv)
+
+class AplicacionPerfilable(QApplication):
+    """ QApplication que, cuando se le pide, pasa sus próximas acciones por cProfile """
+    def __init__(self, argv):
+        super().__init__(argv)
+        self._restantes = 0
+        self._en_accion = False
+        self._hubo_modal = False
+        self.umbral_ms = float(os.environ.get("TAXIS_PERFIL_MIN_MS", "100"))
+        self.carpeta = CARPETA_DIAGNOSTICO
+        self.guardados = []
+        try: acciones = int(os.environ.get("TAXIS_PERFILAR", "0"))
+        except ValueError: acciones = 0
+        if acciones > 0: self.activar(acciones)
+
+    def activar(self, acciones=5, umbral_ms=None):
+        self._restantes = acciones
+        if umbral_ms is not None: self.umbral_ms = umbral_ms
+        print(f"⏱️ Perfilando las próximas {acciones} acciones de más de {self.umbral_ms:g} ms")
+
+    def desactivar(self):
+        self._restantes = 0
+
+    def restantes(self):
+        return self._restantes
+
+    def notify(self, receptor, evento):
+        # Camino rápido: apagado o ya dentro de una acción perfilada (propagación, eventos anidados)
+        if not self._restantes:
+            return super().notify(receptor, evento)
+        if self._en_accion:
+            if not self._hubo_modal and QApplication.activeModalWidget() is not None:
+                self._hubo_modal = True  # La acción abrió un diálogo: su tiempo ya no es de la app
+            return super().notify(receptor, evento)
+        tipo = EVENTOS.get(evento.type())
+        if tipo is None or (tipo in EVENTOS_DE_WIDGET and not isinstance(receptor, QWidget)):
+            return super().notify(receptor, evento)
+        if QApplication.activeModalWidget() is not None:
+            return super().notify(receptor, evento)  # Clics dentro de un diálogo: no son la lentitud buscada
+
+        etiqueta = _describir(receptor, tipo)  # Antes de entregar: el receptor puede borrarse en el slot
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:  # Ya hay otro perfilador activo (depurador, etc.)
+            return super().notify(receptor, evento)
+        self._en_accion = True
+        self._hubo_modal = False
+        inicio = time.perf_counter()
+        try:
+            return super().notify(receptor, evento)
+        finally:
+            perfil.disable()
+            self._en_accion = False
+            ms = (time.perf_counter() - inicio) * 1000
+            if self._hubo_modal:
+                if ms >= self.umbral_ms: print(f"⏱️ Se descartó un {tipo} en '{etiqueta}': abrió un diálogo ({ms:.0f} ms con el diálogo abierto)")
+            elif ms >= self.umbral_ms and self._restantes:
+                self._restantes -= 1
+                self._guardar(perfil, tipo, etiqueta, ms)
+
+    # ==========================================
+    # ARCHIVOS
+    # ==========================================
+    def _guardar(self, perfil, tipo, etiqueta, ms):
+        accion = _slot_principal(perfil) or etiqueta
+        nombre = f"perfil_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')[:-3]}_{tipo}_{_limpiar(accion) or 'accion'}.prof"
+        ruta = os.path.join(self.carpeta, nombre)
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            perfil.dump_stats(ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el perfil: {e}")
+            return
+        self.guardados.append(ruta)
+        print(f"⏱️ Perfil de {tipo} '{accion}' ({ms:.0f} ms) guardado en {ruta}. Quedan {self._restantes}.")
+        self._rotar()
+
+    def _rotar(self):
+        """ Deja como máximo MAX_ARCHIVOS perfiles y MAX_BYTES en total, borrando los más viejos """
+        archivos = sorted(glob.glob(os.path.join(self.carpeta, "perfil_*.prof")), key=os.path.getmtime)
+        total = sum(os.path.getsize(a) for a in archivos)
+        while archivos and (len(archivos) > MAX_ARCHIVOS or total > MAX_BYTES):
+            viejo = archivos.pop(0)
+            try:
+                total -= os.path.getsize(viejo)
+                os.remove(viejo)
+            except OSError:
+                pass
@@ -1,97 +1,289 @@
-import sqlite3
+"""
+Generador de datos de prueba (viajes, turnos, incidencias y bitácora).
+Sirve para ver el sistema "con vida" y para pruebas de carga con años de historial:
+
+    python rellenar_bd_datos_prueba.py                                   # demo: 66 taxis, 60 días
+    python rellenar_bd_datos_prueba.py --flota 300 --anios 10 --viajes-dia 12 --semilla 7
+
+Todo se inserta con executemany en lotes grandes (una transacción por lote).
+Con la misma semilla, los mismos parámetros y la misma --ancla (el "ahora" del generador)
+sale exactamente la misma base, sin importar el día en que se corra:
+
+    python rellenar_bd_datos_prueba.py --dias 365 --semilla 7 --ancla 2026-01-31
+"""
+import argparse
 import random
+import sqlite3
+import time
 from datetime import datetime, timedelta
 
-def popular_base_datos_completa():
-    db_path = "taxis.db"
-    print(f"🔌 Conectando a {db_path}...")
-    
+from gestor_db import GestorBaseDatos
+
+
+# ==========================================
+# CATÁLOGOS DEL GENERADOR
+# ==========================================
+DESTINOS_LOCALES = [
+    "Centro", "CAPU", "Plaza Dorada", "Angelópolis", "Hospital General", "Estadio",
+    "C.U.", "Periplaza", "Héroes", "Amalucan", "Mercado Hidalgo", "Central de Abasto",
+]
+DESTINOS_FORANEOS = ["Cholula", "Amozoc Centro", "Tepeaca", "Acajete", "Atlixco", "Tlaxcala"]
+DESTINO_AEREO = "Aeropuerto Hermanos Serdán"
+
+# tipo_servicio_id: 1 base, 2 teléfono base, 3 teléfono unidad, 4 aéreo (más probabilidad de Base)
+TIPOS_SERVICIO = [1, 1, 1, 2, 2, 3, 4]
+
+# (hora de entrada, horas de trabajo) de cada patrón de turno
+PATRONES_TURNO = {
+    "MATUTINO": (6, 9),
+    "VESPERTINO": (14, 9),
+    "NOCTURNO": (21, 9),
+}
+# En MIXTO cada unidad tiene SU patrón fijo, repartidos con estos pesos
+PESOS_MIXTO = {"MATUTINO": 50, "VESPERTINO": 35, "NOCTURNO": 15}
+
+# (tipo, montos posibles, peso)
+TIPOS_INCIDENCIA = [
+    ("🛑 Multa Horas", (50, 100), 30),
+    ("🚫 Ausencia", (0,), 30),
+    ("🚩 Falta Banderolas", (0,), 15),
+    ("⚠️ Reporte Disciplina", (0,), 15),
+    ("💸 Deuda", (200, 500, 1000), 10),
+]
+NOTAS_BITACORA = [
+    "Revisar llantas de la unidad {n}", "La unidad {n} pidió cambio de turno",
+    "Cliente olvidó objeto en la unidad {n}", "Pagar recibo de luz de la base",
+    "Junta de operadores el sábado", "La unidad {n} reporta falla en el radio",
+    "Renovar tarjetón de la unidad {n}", "Llamar al taller por la unidad {n}",
+]
+
+SEGUNDOS_DIA = 86400
+# "HH:MM:SS" de cada segundo del día: formatear con índices es mucho más rápido que strftime
+HORAS_TEXTO = [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(SEGUNDOS_DIA)]
+
+
+# ==========================================
+# CARGA MASIVA
+# ==========================================
+SQL_VIAJE = """INSERT INTO viajes (taxi_id, tipo_servicio_id, base_salida_id, destino, precio, fecha_hora_inicio, fecha_hora_fin)
+               VALUES (?, ?, ?, ?, ?, ?, ?)"""
+SQL_TURNO = "INSERT INTO turnos (taxi_id, fecha_inicio, fecha_fin) VALUES (?, ?, ?)"
+SQL_INCIDENCIA = """INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)"""
+SQL_BITACORA = "INSERT INTO bitacora (fecha, mensaje, estado, prioridad) VALUES (?, ?, ?, ?)"
+
+TABLAS_CARGA = ("viajes", "turnos", "incidencias")
+
+
+class CargaMasiva:
+    """
+    Acumula renglones por tabla y los manda con executemany cada 'lote' renglones (un commit por lote).
+    Mientras dura la carga quita índices y triggers FTS de las tablas grandes y al final
+    los vuelve a crear tal cual estaban (sqlite_master) y reconstruye el índice FTS de una vez.
+    """
+    def __init__(self, conn, lote=100_000):
+        self.conn = conn
+        self.lote = lote
+        self.pendientes = {SQL_VIAJE: [], SQL_TURNO: [], SQL_INCIDENCIA: [], SQL_BITACORA: []}
+        self.totales = {SQL_VIAJE: 0, SQL_TURNO: 0, SQL_INCIDENCIA: 0, SQL_BITACORA: 0}
+        self._esquema_quitado = []
+
+    def __enter__(self):
+        marcas = ",".join("?" * len(TABLAS_CARGA))
+        self._esquema_quitado = self.conn.execute(f"""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND sql IS NOT NULL AND tbl_name IN ({marcas})
+        """, TABLAS_CARGA).fetchall()
+        for tipo, nombre, _ in self._esquema_quitado:
+            self.conn.execute(f'DROP {tipo.upper()} IF EXISTS "{nombre}"')
+        self.conn.commit()
+        return self
+
+    def agregar(self, sql, fila):
+        pendientes = self.pendientes[sql]
+        pendientes.append(fila)
+        if len(pendientes) >= self.lote:
+            self.vaciar()
+
+    def vaciar(self):
+        for sql, filas in self.pendientes.items():
+            if filas:
+                self.conn.executemany(sql, filas)
+                self.totales[sql] += len(filas)
+                filas.clear()
+        self.conn.commit()
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.vaciar()
+        else:
+            self.conn.rollback()
+        # Índices y triggers vuelven SIEMPRE, aunque la carga haya fallado
+        print("🗂️  Reconstruyendo índices...")
+        for _, _, sql in self._esquema_quitado:
+            self.conn.execute(sql)
+        for tabla_fts in ("viajes_fts", "incidencias_fts"):
+            try: self.conn.execute(f"INSERT INTO {tabla_fts}({tabla_fts}) VALUES ('rebuild')")
+            except sqlite3.OperationalError: pass  # Sin FTS5
+        self.conn.commit()
+        return False
+
+
+# ==========================================
+# GENERADORES POR DÍA
+# ==========================================
+def _texto(dias_texto, segundo):
+    """ Segundo absoluto (desde el primer día) -> 'AAAA-MM-DD HH:MM:SS' """
+    return f"{dias_texto[segundo // SEGUNDOS_DIA]} {HORAS_TEXTO[segundo % SEGUNDOS_DIA]}"
+
+def _viajes_del_turno(azar, carga, dias_texto, taxi_id, inicio, fin, cantidad):
+    """ Reparte 'cantidad' viajes sin encimarse dentro del turno [inicio, fin) """
+    cantidad = min(cantidad, (fin - inicio) // 1200)  # Mínimo 20 min por viaje
+    if cantidad <= 0: return
+    hueco = (fin - inicio) // cantidad
+    for k in range(cantidad):
+        salida = inicio + k * hueco + azar.randrange(hueco // 2)
+        servicio = azar.choice(TIPOS_SERVICIO)
+        if servicio == 4:
+            destino, precio, minutos = DESTINO_AEREO, 5 * azar.randint(90, 140), azar.randint(40, 70)
+        elif azar.random() < 0.15:
+            destino, precio, minutos = azar.choice(DESTINOS_FORANEOS), 5 * azar.randint(30, 90), azar.randint(35, 80)
+        else:
+            destino, precio, minutos = azar.choice(DESTINOS_LOCALES), 5 * azar.randint(8, 24), azar.randint(10, 35)
+        llegada = min(salida + minutos * 60, inicio + (k + 1) * hueco - 1)
+        base = azar.randint(1, 11) if servicio in (1, 2) else None
+        carga.agregar(SQL_VIAJE, (taxi_id, servicio, base, destino, float(precio),
+                                  _texto(dias_texto, salida), _texto(dias_texto, llegada)))
+
+def _incidencia(azar, dias_texto, taxi_id, numero, segundo, antigua):
+    tipo, montos, _ = azar.choices(TIPOS_INCIDENCIA, weights=[t[2] for t in TIPOS_INCIDENCIA])[0]
+    monto = float(azar.choice(montos))
+    if monto > 0:
+        resuelto = azar.choice(("PAGADO", "PAGADO", "PAGADO", "PENDIENTE")) if antigua else "PENDIENTE"
+    else:
+        resuelto = "RESUELTO" if antigua and azar.random() < 0.8 else "INFORMATIVO"
+    operador = "SISTEMA" if tipo in ("🛑 Multa Horas", "🚫 Ausencia") else "ADMIN"
+    return (taxi_id, tipo, f"Reporte de prueba unidad {numero}", monto, _texto(dias_texto, segundo), resuelto, operador)
+
+
+# ==========================================
+# PROGRAMA PRINCIPAL
+# ==========================================
+def leer_ancla(texto):
+    """ "AAAA-MM-DD" (medianoche) o "AAAA-MM-DD HH:MM[:SS]" -> datetime """
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try: return datetime.strptime(texto, formato)
+        except ValueError: pass
+    raise ValueError(f"Fecha de ancla no válida: {texto!r}")
+
+def popular_base_datos_completa(db_path="taxis.db", flota=66, anios=None, dias=60, viajes_por_dia=8,
+                                patron_turnos="MIXTO", descanso=0.15, prob_incidencia=0.02,
+                                notas_por_dia=2, cuota_piso=150.0, semilla=None, lote=100_000, ancla=None):
+    """
+    Llena 'db_path' con historial sintético. 'anios' (si se da) manda sobre 'dias'.
+    viajes_por_dia: promedio por unidad y día trabajado. descanso: probabilidad de no trabajar un día.
+    patron_turnos: MATUTINO, VESPERTINO, NOCTURNO o MIXTO (cada unidad con su patrón).
+    ancla: el "ahora" de los datos (datetime o texto, ver leer_ancla). Todo sale de aquí: el historial
+    llega hasta el día anterior y el semáforo se pinta contra esta hora. None = la hora real.
+    """
+    azar = random.Random(semilla)
+    if isinstance(ancla, str): ancla = leer_ancla(ancla)
+    ahora = ancla or datetime.now()
+    dias = int(anios * 365) if anios else int(dias)
+    inicio_reloj = time.perf_counter()
+
+    # 1. ESQUEMA: GestorBaseDatos crea/migra lo que falte
+    print(f"🔌 Preparando {db_path}...")
+    db = GestorBaseDatos(db_path)
+    db.cerrar()
+
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 1. VERIFICAR FLOTA (No creamos nada raro, solo aseguramos que existan los normales)
-    cursor.execute("SELECT id, numero_economico FROM taxis")
-    flota = cursor.fetchall()
-    
-    if not flota:
-        print("⚠️ No hay taxis. Creando flota estándar (35-100)...")
-        for n in range(35, 101):
-            cursor.execute("INSERT INTO taxis (numero_economico, base_actual_id, estado_sistema) VALUES (?, 12, 'ACTIVO')", (str(n),))
-        conn.commit()
-        cursor.execute("SELECT id, numero_economico FROM taxis")
-        flota = cursor.fetchall()
-    
-    taxi_ids = [t[0] for t in flota]
-    print(f"✅ Flota detectada: {len(taxi_ids)} unidades.")
-
-    # 2. GENERADOR DE VIAJES (HISTORIAL)
-    print("🚖 Generando 500 viajes históricos...")
-    
-    destinos_comunes = [
-        "Centro", "CAPU", "Plaza Dorada", "Angelópolis", "Cholula", 
-        "Amozoc Centro", "Tepeaca", "Acajete", "Hospital General", 
-        "Estadio", "C.U.", "Periplaza", "Héroes", "Amalucan"
-    ]
-    
-    # Generamos viajes distribuidos en los últimos 60 días
-    for _ in range(500):
-        taxi_id = random.choice(taxi_ids)
-        tipo_servicio = random.choice([1, 1, 1, 2, 2, 3, 4]) # Más probabilidad de Base(1)
-        base_salida = random.randint(1, 11)
-        destino = random.choice(destinos_comunes)
-        
-        # Precio aleatorio pero realista ($40 - $350)
-        precio = round(random.uniform(40.0, 350.0) / 5) * 5 # Redondear a múltiplos de 5
-        
-        # Fecha aleatoria
-        dias_atras = random.randint(0, 60)
-        horas = random.randint(6, 23) # Horario laboral
-        minutos = random.randint(0, 59)
-        
-        inicio = datetime.now() - timedelta(days=dias_atras, hours=horas, minutes=minutos)
-        fin = inicio + timedelta(minutes=random.randint(20, 90))
-        
-        cursor.execute("""
-            INSERT INTO viajes (taxi_id, tipo_servicio_id, base_salida_id, destino, precio, fecha_hora_inicio, fecha_hora_fin) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (taxi_id, tipo_servicio, base_salida, destino, precio, 
-              inicio.strftime("%Y-%m-%d %H:%M:%S"), 
-              fin.strftime("%Y-%m-%d %H:%M:%S")))
-
-    # 3. GENERADOR DE INCIDENCIAS (REPORTES)
-    print("👮 Generando 40 reportes administrativos...")
-    
-    tipos = ["Multa Horas", "Multa Horas", "Ausencia", "Ausencia", "Falta Banderolas", "Deuda"]
-    
-    for _ in range(40):
-        taxi_id = random.choice(taxi_ids)
-        tipo = random.choice(tipos)
-        
-        monto = 0
-        resuelto = 'INFORMATIVO'
-        
-        if tipo == "Multa Horas":
-            monto = random.choice([50, 100])
-            resuelto = 'PENDIENTE'
-        elif tipo == "Deuda":
-            monto = random.choice([200, 500, 1000])
-            resuelto = 'PENDIENTE'
-            
-        fecha_inc = (datetime.now() - timedelta(days=random.randint(0, 45))).strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute("""
-            INSERT INTO incidencias (taxi_id, tipo, descripcion, monto, fecha_registro, resuelto, operador_id) 
-            VALUES (?, ?, ?, ?, ?, ?, 'SISTEMA PRUEBAS')
-        """, (taxi_id, tipo, "Reporte generado automáticamente", monto, fecha_inc, resuelto))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")      # Datos de prueba: velocidad sobre durabilidad
+    conn.execute("PRAGMA cache_size=-200000")   # ~200 MB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    # 2. FLOTA: unidades 35, 36, ... hasta completar 'flota'
+    hoy = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+    primer_dia = hoy - timedelta(days=dias)
+    alta = primer_dia.strftime("%Y-%m-%d %H:%M:%S")
+    numeros = [str(n) for n in range(35, 35 + flota)]
+    conn.executemany("""
+        INSERT OR IGNORE INTO taxis (numero_economico, estado_sistema, base_actual_id, fecha_alta, fecha_movimiento)
+        VALUES (?, 'ACTIVO', 12, ?, ?)
+""", [(n, alta, alta) for n in numeros])
+    # La flota inicial que crea GestorBaseDatos trae la hora real: con un ancla pasada quedaría "en el futuro"
+    conn.execute("UPDATE taxis SET fecha_alta = ?, fecha_movimiento = ? WHERE fecha_alta > ?",
+                 (alta, alta, ahora.strftime("%Y-%m-%d %H:%M:%S")))
+    conn.commit()
+    marcas = ",".join("?" * len(numeros))
+    unidades = conn.execute(f"SELECT id, numero_economico FROM taxis WHERE numero_economico IN ({marcas}) ORDER BY id", numeros).fetchall()
+    print(f"✅ Flota: {len(unidades)} unidades, {dias} días de historial hasta {ahora:%Y-%m-%d %H:%M}, semilla {semilla}.")
+
+    if patron_turnos == "MIXTO":
+        nombres, pesos = list(PESOS_MIXTO), list(PESOS_MIXTO.values())
+        patron_de = {taxi_id: PATRONES_TURNO[azar.choices(nombres, weights=pesos)[0]] for taxi_id, _ in unidades}
+    else:
+        patron_de = {taxi_id: PATRONES_TURNO[patron_turnos] for taxi_id, _ in unidades}
+
+    # Un día de más: los turnos nocturnos del último día terminan al día siguiente
+    dias_texto = [(primer_dia + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(dias + 1)]
+    ultimo_mes = dias - 30
+    ahora_seg = int((ahora - primer_dia).total_seconds())
+
+    # 3. HISTORIAL DÍA POR DÍA (del más viejo a ayer)
+    print(f"🚖 Generando historial ({viajes_por_dia} viajes/día por unidad, turnos {patron_turnos})...")
+    with CargaMasiva(conn, lote) as carga:
+        for d in range(dias):
+            base_dia = d * SEGUNDOS_DIA
+            antigua = d < ultimo_mes
+
+            for taxi_id, numero in unidades:
+                if azar.random() < descanso:
+                    continue
+                hora_entrada, horas = patron_de[taxi_id]
+                entrada = base_dia + hora_entrada * 3600 + azar.randint(-45, 45) * 60
+                salida = entrada + horas * 3600 + azar.randint(-60, 60) * 60
+                entrada, salida = max(entrada, 0), min(salida, ahora_seg)  # Nada en el futuro
+                carga.agregar(SQL_TURNO, (taxi_id, _texto(dias_texto, entrada), _texto(dias_texto, salida)))
+
+                cantidad = max(0, round(azar.gauss(viajes_por_dia, viajes_por_dia * 0.3)))
+                _viajes_del_turno(azar, carga, dias_texto, taxi_id, entrada, salida, cantidad)
+
+                if azar.random() < prob_incidencia:
+                    segundo = entrada + azar.randrange(max(1, salida - entrada))
+                    carga.agregar(SQL_INCIDENCIA, _incidencia(azar, dias_texto, taxi_id, numero, segundo, antigua))
+
+            # Cobro de piso cada lunes a toda la flota
+            if cuota_piso and (primer_dia + timedelta(days=d)).weekday() == 0:
+                momento = _texto(dias_texto, base_dia + 8 * 3600)
+                for taxi_id, _ in unidades:
+                    pagado = antigua or azar.random() < 0.5
+                    carga.agregar(SQL_INCIDENCIA, (taxi_id, "💰 Derecho de Piso", "Cuota operativa", float(cuota_piso),
+                                                   momento, "PAGADO" if pagado else "PENDIENTE", "SISTEMA"))
+
+            for _ in range(azar.randint(0, notas_por_dia * 2) if notas_por_dia else 0):
+                numero = azar.choice(unidades)[1]
+                momento = _texto(dias_texto, base_dia + azar.randint(7 * 3600, 22 * 3600))[:16]
+                carga.agregar(SQL_BITACORA, (momento, azar.choice(NOTAS_BITACORA).format(n=numero),
+                                             "HECHO" if antigua or azar.random() < 0.6 else "PENDIENTE",
+                                             "URGENTE" if azar.random() < 0.1 else "NORMAL"))
+
+            if d % 30 == 29:
+                print(f"   ... {d + 1}/{dias} días ({carga.totales[SQL_VIAJE] + len(carga.pendientes[SQL_VIAJE]):,} viajes)")
+
+    totales = carga.totales
+    print(f"✅ Insertados: {totales[SQL_VIAJE]:,} viajes, {totales[SQL_TURNO]:,} turnos, "
+          f"{totales[SQL_INCIDENCIA]:,} incidencias, {totales[SQL_BITACORA]:,} notas.")
 
     # 4. CONFIGURACIÓN VISUAL (SEMÁFORO EN VIVO)
     print("🎨 Pintando tablero (Semáforo)...")
-    
+
     # Función para "trucar" el reloj
     def mover_taxi(num, base_id, minutos_hace):
-        t_mov = (datetime.now() - timedelta(minutes=minutos_hace)).strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("UPDATE taxis SET base_actual_id=?, fecha_movimiento=? WHERE numero_economico=?", 
-                       (base_id, t_mov, str(num)))
+        t_mov = (ahora - timedelta(minutes=minutos_hace)).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("UPDATE taxis SET base_actual_id=?, fecha_movimiento=? WHERE numero_economico=?",
+                     (base_id, t_mov, str(num)))
 
     # --- ESCENARIOS VISUALES ---
     # Taxis en LOCAL (Base 93)
@@ -106,17 +298,48 @@ def popular_base_datos_completa():
     # Taxis en DESCANSO (Base 91)
     mover_taxi(40, 91, 5)   # Morado (5 min) - Comiendo a gusto
     mover_taxi(41, 91, 70)  # Naranja (70 min) - Se está tardando
-    
+
     # Taxis en TALLER (Base 90)
     mover_taxi(42, 90, 500) # Café
 
     # Taxis TRABAJANDO NORMAL (Varios en Local)
     for t in range(43, 50):
-        mover_taxi(t, 93, random.randint(1, 20)) # Todos ok
+        mover_taxi(t, 93, azar.randint(1, 20)) # Todos ok
 
     conn.commit()
     conn.close()
-    print("✨ ¡LISTO! Base de datos inyectada con éxito.")
+
+    # 5. Los viajes y turnos se insertaron directo: recalculamos los acumulados de reportes
+    db = GestorBaseDatos(db_path)
+    db.reconstruir_horas_trabajadas()
+    db.reconstruir_resumen_diario()
+    db.cerrar()
+    print(f"✨ ¡LISTO! Base de datos inyectada con éxito en {time.perf_counter() - inicio_reloj:.1f} s.")
+    return totales[SQL_VIAJE], totales[SQL_TURNO], totales[SQL_INCIDENCIA], totales[SQL_BITACORA]
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Llena la base de datos con historial de prueba")
+    parser.add_argument("--db", default="taxis.db", help="Ruta de la base de datos (default: taxis.db)")
+    parser.add_argument("--flota", type=int, default=66, help="Número de unidades (desde la 35)")
+    parser.add_argument("--anios", type=float, help="Años de historial (manda sobre --dias)")
+    parser.add_argument("--dias", type=int, default=60, help="Días de historial")
+    parser.add_argument("--viajes-dia", type=float, default=8, help="Viajes promedio por unidad y día trabajado")
+    parser.add_argument("--turnos", choices=["MIXTO"] + list(PATRONES_TURNO), default="MIXTO", help="Patrón de turnos")
+    parser.add_argument("--descanso", type=float, default=0.15, help="Probabilidad de que una unidad no trabaje un día")
+    parser.add_argument("--incidencias", type=float, default=0.02, help="Probabilidad de incidencia por unidad y día")
+    parser.add_argument("--notas-dia", type=int, default=2, help="Notas de bitácora promedio por día")
+    parser.add_argument("--cuota-piso", type=float, default=150.0, help="Cobro de piso semanal (0 = sin cobros)")
+    parser.add_argument("--semilla", type=int, help="Semilla para repetir exactamente los mismos datos")
+    parser.add_argument("--ancla", type=leer_ancla, help="'Ahora' de los datos, AAAA-MM-DD[ HH:MM] (default: la hora real)")
+    parser.add_argument("--lote", type=int, default=100_000, help="Renglones por executemany/commit")
+    return parser
+
 
 if __name__ == "__main__":
-    popular_base_datos_completa()
\ No newline at end of file
+    args = crear_parser().parse_args()
+    popular_base_datos_completa(args.db, flota=args.flota, anios=args.anios, dias=args.dias,
+                                viajes_por_dia=args.viajes_dia, patron_turnos=args.turnos,
+                                descanso=args.descanso, prob_incidencia=args.incidencias,
+                                notas_por_dia=args.notas_dia, cuota_piso=args.cuota_piso,
+                                semilla=args.semilla, lote=args.lote, ancla=args.ancla)
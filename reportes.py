@@ -11,6 +11,8 @@ from datetime import datetime
 import os
 import sys
 
+from trazas import trazar, tramo
+
 def ruta_recurso(relativo):
     try:
         base_path = sys._MEIPASS
@@ -49,7 +51,9 @@ class GeneradorPDF:
 
     def _finalizar_reporte(self):
         try:
-            self.doc.build(self.elementos)
+            # Maquetado de reportlab: suele ser lo más tardado del reporte
+            with tramo("reportlab.doc.build", "pdf", elementos=len(self.elementos)):
+                self.doc.build(self.elementos)
             return self.nombre_archivo
         except Exception as e:
             print(f"Error al generar PDF: {e}")
@@ -93,6 +97,7 @@ class GeneradorPDF:
         self.elementos.append(Paragraph(f"Generado el: {fecha_gen}", self.estilo_fecha_gen))
         self.elementos.append(Spacer(1, 15))
 
+    @trazar("pdf")
     def generar_reporte_dual(self, tipo_reporte, periodo, fecha_texto, datos_generales, datos_admin=None, password=None):
         if password and tipo_reporte == "ADMIN":
             self.doc.encrypt = StandardEncryption(password, canPrint=1, canCopy=0, canModify=0)
@@ -276,6 +281,7 @@ class GeneradorPDF:
     
     # --- REPORTE INDIVIDUAL (ESTILOS ARREGLADOS) ---
     # Nota: Agregamos el nuevo parámetro 'lista_incidencias=None' al final
+    @trazar("pdf")
     def generar_reporte_unidad(self, numero, texto_fecha, stats, lista_viajes, lista_incidencias=None):
         # 1. LOGO
         nombre_logo = ruta_recurso("LogoElZorropng.png")
@@ -419,6 +425,7 @@ class GeneradorPDF:
     
 
     
+    @trazar("pdf")
     def generar_ticket_incidencia(self, taxi, tipo, descripcion, monto, operadora, fecha_personalizada=None):
         if fecha_personalizada: fecha_texto = fecha_personalizada; titulo = f"COPIA REPORTE - TAXI {taxi}"
         else: fecha_texto = datetime.now().strftime('%d/%m/%Y %H:%M'); titulo = f"INCIDENCIA - TAXI {taxi}"
@@ -0,0 +1,39 @@
+"""
+Prueba del pool de consultas: muchas tareas en segundo plano NO deben abrir una conexión por tarea.
+
+    python -m pytest -q test_consultas.py
+"""
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Antes de importar Qt
+
+import contextlib
+import io
+import sys
+
+from PyQt6.QtWidgets import QApplication
+
+from gestor_db import GestorBaseDatos
+from interfaz import ServicioConsultas
+
+
+def test_pool_reutiliza_conexiones_de_lectura(tmp_path):
+    app = QApplication.instance() or QApplication(sys.argv)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = GestorBaseDatos(str(tmp_path / "pool.db"), instrumentar=False)
+    hilos = 2
+    servicio = ServicioConsultas(db, hilos=hilos)
+    resultados = []
+    try:
+        db.obtener_config()  # Abre escritor/vigía/lector del hilo principal antes de contar
+        antes = len(db.conexiones._todas)
+        for i in range(50):
+            # Canales distintos: ninguna se cancela, todas corren en el pool
+            servicio.ejecutar(f"canal_{i}", db.obtener_toda_la_flota, al_terminar=resultados.append)
+        servicio.esperar()
+        app.processEvents()
+
+        assert len(resultados) == 50
+        assert len(db.conexiones._todas) <= antes + hilos
+    finally:
+        servicio.esperar()
+        db.cerrar()
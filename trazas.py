@@ -0,0 +1,117 @@
+"""
+Trazas de tiempo (tramos) en formato Chrome trace-event: el JSON se abre en chrome://tracing
+o en https://ui.perfetto.dev y se ve, hilo por hilo, en qué se fueron los segundos de un clic.
+
+Se enciende con TAXIS_TRAZAS=1 (se guarda sola al salir) o desde el menú de Configuración
+(con Shift presionado aparece "Grabar traza"). Apagada, cada tramo cuesta una comparación.
+
+    @trazar("bd")                          # decorador: el nombre es Clase.metodo
+    def obtener_datos_reporte_global(...)
+
+    with tramo("reportlab.build", "pdf"):  # bloque suelto
+        self.doc.build(self.elementos)
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from instrumentacion import CARPETA_DIAGNOSTICO
+
+
+MAX_EVENTOS = 500_000  # Tope de memoria: si se deja grabando, se conservan los más recientes
+
+_activo = False
+_eventos = deque(maxlen=MAX_EVENTOS)
+_hilos = {}    # tid -> nombre (metadatos para que Chrome muestre el nombre del hilo)
+_candado = threading.Lock()
+_pid = os.getpid()
+
+
+def activar():
+    global _activo
+    _activo = True
+
+def desactivar():
+    global _activo
+    _activo = False
+
+def esta_activo():
+    return _activo
+
+def _registrar(nombre, categoria, inicio, fin, args):
+    hilo = threading.current_thread()
+    evento = {"name": nombre, "cat": categoria, "ph": "X", "pid": _pid, "tid": hilo.ident,
+              "ts": inicio / 1000, "dur": (fin - inicio) / 1000}
+    if args: evento["args"] = {k: str(v) for k, v in args.items()}
+    with _candado:
+        _eventos.append(evento)
+        if hilo.ident not in _hilos: _hilos[hilo.ident] = hilo.name
+
+
+# ==========================================
+# TRAMOS
+# ==========================================
+@contextmanager
+def tramo(nombre, categoria="app", **args):
+    """ Mide el bloque como un tramo. Los 'args' salen en el panel de detalles de Chrome """
+    if not _activo:
+        yield; return
+    inicio = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _registrar(nombre, categoria, inicio, time.perf_counter_ns(), args)
+
+def trazar(categoria="app", nombre=None):
+    """ Decorador: cada llamada es un tramo con el nombre Clase.metodo (o 'nombre') """
+    def decorador(funcion):
+        etiqueta = nombre or funcion.__qualname__
+        @wraps(funcion)
+        def envuelto(*a, **k):
+            if not _activo: return funcion(*a, **k)
+            inicio = time.perf_counter_ns()
+            try:
+                return funcion(*a, **k)
+            finally:
+                _registrar(etiqueta, categoria, inicio, time.perf_counter_ns(), None)
+        return envuelto
+    return decorador
+
+
+# ==========================================
+# ARCHIVO
+# ==========================================
+def guardar(ruta=None, limpiar=True):
+    """ Escribe los tramos grabados en DIAGNOSTICO/traza_*.json. Devuelve la ruta o None si no hay nada """
+    with _candado:
+        eventos = list(_eventos)
+        hilos = dict(_hilos)
+        if limpiar: _eventos.clear()
+    if not eventos: return None
+    metadatos = [{"name": "thread_name", "ph": "M", "pid": _pid, "tid": tid, "args": {"name": nombre}}
+                 for tid, nombre in hilos.items()]
+    ruta = ruta or os.path.join(CARPETA_DIAGNOSTICO, f"traza_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadatos + eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        return ruta
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar la traza: {e}")
+        return None
+
+def _guardar_al_salir():
+    if _activo:
+        ruta = guardar()
+        if ruta: print(f"🔬 Traza guardada en {ruta}")
+
+
+if os.environ.get("TAXIS_TRAZAS", "").strip().lower() in ("1", "si", "sí", "true"):
+    activar()
+atexit.register(_guardar_al_salir)